@@ -0,0 +1,77 @@
+"""
+Micro-benchmark: per-request overhead of a fresh AsyncOpenAI client per call
+versus the pooled client returned by `get_client`.
+
+Runs against the bundled mock server on localhost, so the numbers isolate the
+client-side cost (client construction, connection setup). Against a remote
+HTTPS endpoint the gap is larger because every fresh client also pays a TLS
+handshake.
+
+Usage:
+    python benchmarks/bench_client_pool.py [--requests 200] [--concurrency 1]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from openai import AsyncOpenAI
+from llm_benchmark.mock_server import start_mock_server
+from llm_benchmark.utils import get_client, close_clients
+
+MESSAGES = [{"role": "user", "content": "Question: 1 + 1 = ?\nAnswer:"}]
+
+async def fresh_client_call(model_config):
+    # The pre-pooling behaviour of call_api: a new client (and connection pool) per request.
+    client = AsyncOpenAI(api_key=model_config['api_key'], base_url=model_config['api_base'])
+    response = await client.chat.completions.create(
+        model=model_config['model_name'], messages=MESSAGES, max_tokens=8, temperature=0.0
+    )
+    return response.choices[0].message.content
+
+async def pooled_client_call(model_config):
+    client = get_client(model_config)
+    response = await client.chat.completions.create(
+        model=model_config['model_name'], messages=MESSAGES, max_tokens=8, temperature=0.0
+    )
+    return response.choices[0].message.content
+
+async def measure(call, model_config, num_requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await call(model_config)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(num_requests)))
+    return time.perf_counter() - start
+
+async def main(num_requests, concurrency):
+    runner, api_base = await start_mock_server()
+    model_config = {"name": "mock", "api_key": "sk-mock", "api_base": api_base, "model_name": "mock"}
+    try:
+        # Warm up the server and the import paths once.
+        await pooled_client_call(model_config)
+
+        fresh = await measure(fresh_client_call, model_config, num_requests, concurrency)
+        pooled = await measure(pooled_client_call, model_config, num_requests, concurrency)
+    finally:
+        await close_clients()
+        await runner.cleanup()
+
+    print(f"requests={num_requests} concurrency={concurrency}")
+    print(f"{'mode':<10} {'total (s)':>10} {'per request (ms)':>18}")
+    for mode, elapsed in (("fresh", fresh), ("pooled", pooled)):
+        print(f"{mode:<10} {elapsed:>10.3f} {1000 * elapsed / num_requests:>18.3f}")
+    print(f"speedup: {fresh / pooled:.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,140 @@
+"""
+Memory/time benchmark: materializing datasets with list() versus keeping them
+Arrow-backed and drawing rows lazily by index.
+
+Each mode runs in a fresh subprocess and reports wall-clock time to the first
+`--samples` formatted prompts and the process's peak RSS.
+
+Sources:
+    mmlu, gsm8k, math  -- the real evaluators' load_data() (needs the HF datasets)
+    synthetic          -- an on-disk, memory-mapped Arrow dataset shaped like
+                          MMLU's auxiliary_train split (works offline)
+
+Usage:
+    python benchmarks/bench_dataset_loading.py --source synthetic [--rows 100000] [--samples 200]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+def peak_rss_mb():
+    # VmHWM is reset on exec; ru_maxrss can carry over the parent's peak on Linux.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def build_synthetic(path, rows):
+    from datasets import Dataset
+    rng = random.Random(0)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+
+    def text(n):
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    for split, size in (("auxiliary_train", rows), ("test", rows // 7)):
+        Dataset.from_dict({
+            "question": [text(60) for _ in range(size)],
+            "choices": [[text(8) for _ in range(4)] for _ in range(size)],
+            "answer": [rng.randrange(4) for _ in range(size)],
+        }).save_to_disk(os.path.join(path, split))
+
+def eager_synthetic(path, samples, k_shot):
+    # The previous MMLUEvaluator.load_data/format_prompt behaviour.
+    from datasets import load_from_disk
+    few_shot_data = list(load_from_disk(os.path.join(path, "auxiliary_train")))
+    test = random.Random(42).sample(list(load_from_disk(os.path.join(path, "test"))), samples)
+    return [random.sample(few_shot_data, k_shot) for _ in test]
+
+def lazy_synthetic(path, samples, k_shot):
+    from datasets import load_from_disk
+    from llm_benchmark.benchmark import BenchmarkEvaluator
+    few_shot_data = load_from_disk(os.path.join(path, "auxiliary_train"))
+    test_split = load_from_disk(os.path.join(path, "test"))
+    rng = random.Random(42)
+    test = test_split.select(rng.sample(range(len(test_split)), samples))
+    return [BenchmarkEvaluator.sample_few_shot(few_shot_data, k_shot) for _ in test]
+
+def eager_real(source, samples):
+    # The previous load_data implementations, which converted whole splits to lists.
+    from datasets import load_dataset
+    if source == "mmlu":
+        few_shot_data = list(load_dataset("cais/mmlu", "all", split="auxiliary_train"))
+        test = random.sample(list(load_dataset("cais/mmlu", "all", split="test")), 200)
+    elif source == "gsm8k":
+        dataset = load_dataset("gsm8k", "main")
+        few_shot_data = list(dataset['train'])
+        test = list(dataset['test'])
+    else:
+        shuffled = load_dataset("nlile/hendrycks-MATH-benchmark", split="train").shuffle(seed=42)
+        few_shot_data = list(shuffled.select(range(500, len(shuffled))))
+        test = list(shuffled.select(range(500)))
+    return [random.sample(few_shot_data, 4) for _ in test[:samples]]
+
+def lazy_real(source, samples):
+    from main import get_evaluator_class
+    evaluator = get_evaluator_class(source)({"name": "bench", "api_key": "", "api_base": "", "model_name": ""}, {})
+    dataset = evaluator.load_data()
+    prompts = []
+    for index, sample in enumerate(dataset):
+        if index == samples:
+            break
+        prompts.append(evaluator.format_prompt(sample))
+    return prompts
+
+def worker(args):
+    start = time.perf_counter()
+    if args.source == "synthetic":
+        fn = eager_synthetic if args.mode == "eager" else lazy_synthetic
+        fn(args.data_dir, args.samples, 5)
+    else:
+        fn = eager_real if args.mode == "eager" else lazy_real
+        fn(args.source, args.samples)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"mode": args.mode, "seconds": elapsed, "peak_rss_mb": peak_rss_mb()}))
+
+def main(args):
+    with tempfile.TemporaryDirectory() as data_dir:
+        if args.source == "synthetic":
+            build_synthetic(data_dir, args.rows)
+        results = []
+        for mode in ("eager", "lazy"):
+            command = [
+                sys.executable, __file__, "--worker", "--mode", mode, "--source", args.source,
+                "--samples", str(args.samples), "--data-dir", data_dir,
+            ]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"source={args.source} samples={args.samples}" + (f" rows={args.rows}" if args.source == "synthetic" else ""))
+    print(f"{'mode':<8} {'time (s)':>10} {'peak RSS (MB)':>15}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['seconds']:>10.3f} {r['peak_rss_mb']:>15.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["synthetic", "mmlu", "gsm8k", "math"], default="synthetic")
+    parser.add_argument("--rows", type=int, default=100_000, help="Few-shot pool size for the synthetic source.")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=["eager", "lazy"], help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args)
+    else:
+        main(args)
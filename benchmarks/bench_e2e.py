@@ -0,0 +1,251 @@
+"""
+End-to-end benchmark of the harness's own overhead: `main.run_model_evaluation`
+for each evaluator against the bundled mock server, with synthetic datasets
+shaped like the real ones so that nothing is downloaded.
+
+The mock server runs in a subprocess, so CPU time and memory are the harness's
+alone: prompt formatting, token counting, the async client, answer parsing,
+checkpoints, the Parquet results store and report generation. For each case
+pytest-benchmark times whole runs; samples/sec, CPU ms per sample (including
+HumanEval's sandbox processes) and peak Python heap are added to its report and
+checked against the stored baselines in baselines/e2e.json.
+
+Usage:
+    pip install -r requirements-dev.txt
+    python -m pytest benchmarks/bench_e2e.py
+    python -m pytest benchmarks/bench_e2e.py -k gsm8k --benchmark-autosave
+
+Environment:
+    BENCH_UPDATE_BASELINES=1  rewrite baselines/e2e.json from this run
+    BENCH_TOLERANCE=0.5       allowed relative regression before a case fails
+    BENCH_ROUNDS=3            timed rounds per case
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import resource
+import tracemalloc
+import subprocess
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from datasets import Dataset, DatasetDict
+
+import main
+from llm_benchmark.benchmark import clear_shared_data
+from llm_benchmark.ratelimit import reset_limiters
+from llm_benchmark.results_store import find_results, stored_accuracy
+from llm_benchmark.utils import close_clients
+from llm_benchmark.evaluators import mmlu, gsm8k, math, humaneval
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines", "e2e.json")
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "0.5"))
+ROUNDS = int(os.environ.get("BENCH_ROUNDS", "3"))
+UPDATE_BASELINES = os.environ.get("BENCH_UPDATE_BASELINES") == "1"
+
+# Well-formed replies per benchmark, chosen by the mock server from the prompt text.
+ANSWER_RULES = [
+    ("multiple choice questions", " B"),
+    ("grade school math", "She has 3 + 4 = 7 apples.\n#### 7"),
+    ("challenging math problems", "Adding gives $\\boxed{\\frac{1}{2}}$."),
+    ("def solve_", "    return x + 1\n"),
+]
+
+# name -> (benchmarks, mock server options)
+CASES = {
+    "mmlu": (["mmlu"], []),
+    "gsm8k": (["gsm8k"], []),
+    "math": (["math"], []),
+    "humaneval": (["humaneval"], []),
+    # Retries and backoff under a lossy endpoint with a long-tailed latency.
+    "gsm8k_faults": (["gsm8k"], [
+        "--latency", "0.01", "--latency-distribution", "lognormal",
+        "--error-rate-429", "0.02", "--error-rate-500", "0.01",
+    ]),
+}
+
+# --- Synthetic datasets --------------------------------------------------------
+
+def _words(rng, n):
+    return " ".join(rng.choice(["alpha", "beta", "gamma", "delta", "sigma", "omega"]) for _ in range(n))
+
+def _mmlu_split(rng, rows):
+    subjects = sorted(mmlu.SUBJECT_CATEGORY)
+    return Dataset.from_dict({
+        "question": [f"{_words(rng, 30)}?" for _ in range(rows)],
+        "choices": [[_words(rng, 4) for _ in range(4)] for _ in range(rows)],
+        "answer": [rng.randrange(4) for _ in range(rows)],
+        "subject": [subjects[i % len(subjects)] for i in range(rows)],
+    })
+
+def _gsm8k_split(rng, rows):
+    return Dataset.from_dict({
+        "question": [f"{_words(rng, 40)}. How many apples?" for _ in range(rows)],
+        "answer": [f"{_words(rng, 60)}\n#### {rng.randrange(20)}" for _ in range(rows)],
+    })
+
+def _math_split(rng, rows):
+    return Dataset.from_dict({
+        "problem": [f"Compute {_words(rng, 30)}." for _ in range(rows)],
+        "solution": [f"{_words(rng, 80)} so the answer is $\\boxed{{{rng.choice(['1/2', '0.5', '7'])}}}$." for _ in range(rows)],
+    })
+
+def _humaneval_split(rows):
+    return Dataset.from_dict({
+        "task_id": [f"Synthetic/{i}" for i in range(rows)],
+        "prompt": [f"def solve_{i}(x):\n    \"\"\"Returns x plus one.\"\"\"\n" for i in range(rows)],
+        "entry_point": [f"solve_{i}" for i in range(rows)],
+        "test": ["def check(candidate):\n    assert candidate(1) == 2\n"] * rows,
+    })
+
+def synthetic_load_dataset(path, name=None, split=None, **kwargs):
+    """Stands in for datasets.load_dataset with data the size of each real split."""
+    rng = random.Random(f"{path}:{name}:{split}")
+    if path == "cais/mmlu":
+        return _mmlu_split(rng, {"test": 14042, "dev": 285, "auxiliary_train": 2000}[split])
+    if path == "gsm8k":
+        return DatasetDict({"train": _gsm8k_split(rng, 7473), "test": _gsm8k_split(rng, 1319)})
+    if path == "openai_humaneval":
+        return _humaneval_split(164)
+    return _math_split(rng, 7500)
+
+@pytest.fixture(autouse=True)
+def synthetic_datasets(monkeypatch):
+    for module in (mmlu, gsm8k, math, humaneval):
+        monkeypatch.setattr(module, "load_dataset", synthetic_load_dataset)
+    # Stands in for the Hub's latest commit, so the synthetic data is snapshotted under its own key.
+    monkeypatch.setattr("llm_benchmark.benchmark.resolve_dataset_commit", lambda path: "synthetic")
+
+# --- Mock endpoint and runs --------------------------------------------------------
+
+def start_mock_endpoint(extra_args):
+    """Starts the mock server in a subprocess; returns (process, api_base)."""
+    command = [sys.executable, "-m", "llm_benchmark.mock_server", "--port", "0", "--seed", "0"]
+    for pattern, answer in ANSWER_RULES:
+        command += ["--answer-rule", f"{pattern}={answer}"]
+    process = subprocess.Popen(
+        command + extra_args,
+        cwd=os.path.join(os.path.dirname(__file__), os.pardir),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    api_base = process.stdout.readline().strip()
+    if not api_base:
+        process.kill()
+        raise RuntimeError("The mock server did not start.")
+    return process, api_base
+
+@pytest.fixture(scope="module")
+def event_loop_for_runs():
+    # One loop for all rounds: pooled clients and limiters stay bound to it.
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(close_clients())
+    loop.close()
+
+def evaluation_config(benchmarks, workdir, run_id):
+    return {
+        "benchmarks": benchmarks,
+        "cache": {"enabled": False},
+        "checkpoint": {"enabled": True, "dir": os.path.join(workdir, "checkpoints"), "run_id": run_id},
+        "results_store": {"enabled": True, "dir": os.path.join(workdir, "samples")},
+        "few_shot": {"mode": "fixed", "seed": 1234},
+        "humaneval": {"pool_size": 4, "timeout": 10.0},
+    }
+
+def run_once(loop, model_config, benchmarks, workdir, run_id):
+    """One full evaluation; returns the number of samples evaluated."""
+    clear_shared_data()
+    reset_limiters()
+    loop.run_until_complete(main.run_model_evaluation(model_config, evaluation_config(benchmarks, workdir, run_id)))
+    paths = find_results(os.path.join(workdir, "samples"), run_id)
+    return sum(stored_accuracy(path)[1] for path in paths)
+
+def cpu_seconds():
+    """CPU time of this process and of its reaped children (HumanEval sandboxes)."""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+def load_baselines():
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_baseline(case, measured):
+    baselines = load_baselines()
+    baselines[case] = {key: round(value, 3) for key, value in measured.items()}
+    os.makedirs(os.path.dirname(BASELINES_PATH), exist_ok=True)
+    with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+def regressions(measured, baseline):
+    """Metrics worse than their baseline by more than TOLERANCE."""
+    failures = []
+    if baseline.get("samples_per_sec") and measured["samples_per_sec"] < baseline["samples_per_sec"] * (1 - TOLERANCE):
+        failures.append(f"samples/sec {measured['samples_per_sec']:.1f} < baseline {baseline['samples_per_sec']:.1f}")
+    for key, label in (("cpu_ms_per_sample", "CPU ms/sample"), ("peak_python_mb", "peak Python MB")):
+        if baseline.get(key) and measured[key] > baseline[key] * (1 + TOLERANCE):
+            failures.append(f"{label} {measured[key]:.2f} > baseline {baseline[key]:.2f}")
+    return failures
+
+@pytest.mark.parametrize("case", list(CASES))
+def test_end_to_end(case, benchmark, tmp_path, monkeypatch, event_loop_for_runs):
+    benchmarks, server_args = CASES[case]
+    monkeypatch.chdir(tmp_path)  # reports are written to ./results
+    logging.getLogger().setLevel(logging.WARNING)
+    process, api_base = start_mock_endpoint(server_args)
+    model_config = {
+        "name": f"bench-{case}",
+        "api_key": "mock",
+        "api_base": api_base,
+        "model_name": "mock-model",
+        "concurrency": 32,
+        "connection": {"timeout": 5.0},
+    }
+    rounds = {"count": 0}
+    samples = {"total": 0, "cpu": 0.0}
+
+    def one_round():
+        rounds["count"] += 1
+        started = cpu_seconds()
+        samples["total"] += run_once(event_loop_for_runs, model_config, benchmarks, str(tmp_path), f"round{rounds['count']}")
+        samples["cpu"] += cpu_seconds() - started
+
+    try:
+        # Warm-up: imports, tokenizer loading and the first connections are not timed.
+        run_once(event_loop_for_runs, model_config, benchmarks, str(tmp_path), "warmup")
+        benchmark.pedantic(one_round, rounds=ROUNDS, iterations=1)
+
+        # Heap tracking slows Python down, so peak memory comes from a separate round.
+        tracemalloc.start()
+        run_once(event_loop_for_runs, model_config, benchmarks, str(tmp_path), "memory")
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        process.terminate()
+        process.wait()
+
+    measured = {
+        "samples_per_sec": samples["total"] / (benchmark.stats.stats.mean * ROUNDS),
+        "cpu_ms_per_sample": 1000 * samples["cpu"] / samples["total"],
+        "peak_python_mb": peak_bytes / (1024 * 1024),
+    }
+    benchmark.extra_info.update(measured)
+    benchmark.extra_info["samples_per_round"] = samples["total"] // ROUNDS
+
+    if UPDATE_BASELINES:
+        save_baseline(case, measured)
+        return
+    baseline = load_baselines().get(case)
+    if baseline is None:
+        pytest.skip(f"No stored baseline for {case}; run with BENCH_UPDATE_BASELINES=1 to record one.")
+    failures = regressions(measured, baseline)
+    assert not failures, f"{case} regressed: " + "; ".join(failures)
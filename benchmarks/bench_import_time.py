@@ -0,0 +1,98 @@
+"""
+Import-time benchmark: how long `import main` and each bundled evaluator module
+take to import, measured with `python -X importtime` in fresh interpreters.
+
+Heavy dependencies (datasets/pyarrow/pandas, openai, jinja2, tqdm) must only be
+imported on the code paths that use them, so none of them may appear in these
+imports, and each import must stay within its time budget. Exits with status 1
+on a violation; also collected by pytest.
+
+Usage:
+    python benchmarks/bench_import_time.py [--budget-ms 300] [--runs 5]
+    python -m pytest benchmarks/bench_import_time.py
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Imports measured, and the time budget of each (milliseconds, cumulative).
+TARGETS = {
+    "main": 300,
+    "llm_benchmark.evaluators.mmlu": 200,
+    "llm_benchmark.evaluators.gsm8k": 200,
+    "llm_benchmark.evaluators.math": 200,
+    "llm_benchmark.evaluators.humaneval": 200,
+}
+
+# Packages that must not be imported by the targets.
+FORBIDDEN = ("datasets", "pyarrow", "pandas", "openai", "jinja2", "tqdm", "tiktoken", "sympy")
+
+def measure(module):
+    """
+    Imports `module` in a fresh interpreter with -X importtime.
+
+    Returns:
+        (cumulative microseconds for `module`, {top-level package: cumulative microseconds})
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = None
+    packages = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(cumulative)
+        except ValueError:
+            continue  # the header line
+        # Nesting is shown by indentation; top-level entries carry their subtree's total.
+        if name.strip() == module:
+            total = cumulative
+        top = name.strip().split(".")[0]
+        packages[top] = max(packages.get(top, 0), cumulative)
+    return total, packages
+
+def check(module, budget_ms, runs):
+    """Returns a list of problems with importing `module` (empty if within budget)."""
+    best = None
+    packages = {}
+    for _ in range(runs):
+        total, packages = measure(module)
+        best = total if best is None else min(best, total)
+    problems = [f"{module} imports {name}" for name in FORBIDDEN if name in packages]
+    milliseconds = best / 1000
+    print(f"{module:40s} {milliseconds:8.1f} ms (budget {budget_ms} ms)")
+    if milliseconds > budget_ms:
+        slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:5]
+        detail = ", ".join(f"{name} {us / 1000:.0f} ms" for name, us in slowest)
+        problems.append(f"{module} took {milliseconds:.0f} ms > {budget_ms} ms ({detail})")
+    return problems
+
+def test_import_time_budget():
+    problems = [problem for module, budget in TARGETS.items() for problem in check(module, budget, runs=3)]
+    assert not problems, "; ".join(problems)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, help="Override the budget of every target.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per target; the fastest counts.")
+    args = parser.parse_args()
+
+    problems = []
+    for module, budget in TARGETS.items():
+        problems += check(module, args.budget_ms or budget, args.runs)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
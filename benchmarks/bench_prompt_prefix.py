@@ -0,0 +1,104 @@
+"""
+Benchmark: randomized few-shot prompts versus deterministic shared prefixes.
+
+For each few-shot mode, formats `--samples` MMLU-style prompts and reports the
+prompt-construction time and the share of prompt tokens that repeat an already
+sent prefix. With `--api-base`, the prompts are also sent to that endpoint and
+mean/median request latency is reported, which shows whether its prefix cache
+is being hit. The synthetic data keeps the benchmark offline.
+
+Usage:
+    python benchmarks/bench_prompt_prefix.py [--samples 500] [--k-shot 5]
+    python benchmarks/bench_prompt_prefix.py --api-base http://localhost:8000/v1 --model-name my-model
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from llm_benchmark.evaluators.mmlu import MMLUEvaluator
+from llm_benchmark.utils import call_api, close_clients
+
+SUBJECTS = ["anatomy", "astronomy", "virology", "marketing"]
+
+def synthetic_rows(count, seed):
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+
+    def text(n):
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    return [
+        {
+            "question": text(50),
+            "choices": [text(6) for _ in range(4)],
+            "answer": rng.randrange(4),
+            "subject": rng.choice(SUBJECTS),
+        }
+        for _ in range(count)
+    ]
+
+class SyntheticMMLU(MMLUEvaluator):
+    def load_data(self):
+        self.few_shot_data = synthetic_rows(5000, seed=1)
+        self.dev_data = synthetic_rows(5 * len(SUBJECTS), seed=2)
+        self._dev_by_subject = {}
+        for index, row in enumerate(self.dev_data):
+            self._dev_by_subject.setdefault(row['subject'], []).append(index)
+        return synthetic_rows(self.num_samples, seed=3)
+
+    def few_shot_pool(self, group=None):
+        if group is None:
+            return self.few_shot_data
+        return [self.dev_data[i] for i in self._dev_by_subject[group]]
+
+async def measure_latency(evaluator, prompts):
+    latencies = []
+    for messages in prompts:
+        start = time.perf_counter()
+        await call_api(evaluator.model_config, messages, max_tokens=1, temperature=0.0)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+async def main(args):
+    model_config = {
+        "name": "bench",
+        "api_key": args.api_key,
+        "api_base": args.api_base or "http://localhost",
+        "model_name": args.model_name,
+    }
+    print(f"samples={args.samples} k_shot={args.k_shot}")
+    print(f"{'mode':<12} {'format (ms)':>12} {'shared ratio':>13} {'latency mean (ms)':>18} {'p50 (ms)':>9}")
+    try:
+        for mode in ("random", "fixed", "per_subject"):
+            eval_config = {"mmlu": {"k_shot": args.k_shot, "few_shot": {"mode": mode, "seed": 1234}}}
+            evaluator = SyntheticMMLU(model_config, eval_config)
+            evaluator.num_samples = args.samples
+            dataset = evaluator.load_data()
+
+            start = time.perf_counter()
+            prompts = [evaluator.format_prompt(sample) for sample in dataset]
+            format_ms = 1000 * (time.perf_counter() - start)
+            ratio = evaluator.summary_metrics([])["Shared Prefix Ratio"]
+
+            latency = ""
+            if args.api_base:
+                latencies = await measure_latency(evaluator, prompts)
+                latency = f"{1000 * statistics.mean(latencies):>18.1f} {1000 * statistics.median(latencies):>9.1f}"
+            print(f"{mode:<12} {format_ms:>12.1f} {ratio:>13.2%} {latency}")
+    finally:
+        await close_clients()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--k-shot", type=int, default=5)
+    parser.add_argument("--api-base", help="Optional OpenAI-compatible endpoint to measure latency against.")
+    parser.add_argument("--api-key", default="sk-none")
+    parser.add_argument("--model-name", default="default")
+    asyncio.run(main(parser.parse_args()))
@@ -1,11 +1,39 @@
+import os
+import json
+import time
+import random
+import asyncio
 import logging
 from abc import ABC, abstractmethod
-from tqdm.asyncio import tqdm
-from datasets import load_dataset
-from .utils import call_api
+from .utils import call_api, call_api_n, estimate_message_tokens
+from .tokenizer import get_token_counter, TOKENS_PER_MESSAGE, TOKENS_PER_REPLY
+from .cache import get_response_cache
+from .checkpoint import Checkpoint, checkpoint_path, sample_key
+from .telemetry import summarize_telemetry
+from .sequential import SequentialMonitor, early_stopping_settings, load_baseline
+from .self_consistency import self_consistency_settings, majority_vote, draw_votes
+from .results_store import prompt_hash, result_row, results_path, write_results
+from .snapshots import (
+    snapshot_path,
+    load_snapshot,
+    save_snapshot,
+    resolve_dataset_commit,
+    record_dataset_commit,
+    recorded_dataset_commit,
+)
+from .run_index import run_index_settings, get_run_index, find_baseline, compare_entries, describe_flips
 
 logger = logging.getLogger(__name__)
 
+# Datasets, few-shot prefixes and formatted prompts, shared by every evaluator of
+# the same benchmark configuration so that evaluating several models loads and
+# formats each benchmark once per process.
+_shared_data = {}
+
+def clear_shared_data():
+    """Drops all shared datasets and prompts."""
+    _shared_data.clear()
+
 class BenchmarkEvaluator(ABC):
     """
     Abstract base class for a benchmark evaluator.
@@ -14,10 +42,63 @@ class BenchmarkEvaluator(ABC):
     must implement the abstract methods to provide benchmark-specific logic.
     """
 
+    # Bump when load_data() or preprocess() change what they produce, so that
+    # existing dataset snapshots are rebuilt.
+    data_version = 1
+
+    # The Hugging Face dataset load_data() reads. Without a pinned
+    # dataset_revision, its latest commit identifies the snapshot.
+    dataset_path = None
+
     def __init__(self, model_config, benchmark_config):
         self.model_config = model_config
         self.benchmark_config = benchmark_config
         self.api_params = self.benchmark_config.get('api_params', {})
+        self.response_cache = get_response_cache(self.benchmark_config.get('cache'))
+
+        # Few-shot prompt state: prefixes built once per (k_shot, group) in the
+        # deterministic modes, and counters for how much of each prompt was shared.
+        self._prompt_prefixes = {}
+        self._formatted_prompts = {}
+        self.prompt_stats = {
+            "prompts": 0,
+            "prompt_tokens": 0,
+            "shared_prefix_tokens": 0,
+            "trimmed_prompts": 0,
+            "over_budget_prompts": 0,
+        }
+        seed = self.few_shot_settings().get('seed')
+        self._few_shot_rng = random.Random(seed) if seed is not None else random
+
+        # Per-request telemetry (latency, TTFT, tokens, retries) for requests made by this evaluator.
+        self.telemetry_records = []
+        self._self_consistency = None
+
+        # The model's shared WorkQueue, set by run_model_evaluation when
+        # `evaluation.scheduler` is enabled; otherwise run() uses its own workers.
+        self.work_queue = None
+
+    @property
+    def token_counter(self):
+        """The model's shared TokenCounter, loaded on first use."""
+        return get_token_counter(self.model_config)
+
+    @property
+    def benchmark_params(self):
+        """The benchmark-specific section of the evaluation config (e.g. `mmlu:`)."""
+        params = self.benchmark_config.get(self.benchmark_name)
+        # Entries such as `humaneval: pass` parse to a string, not a mapping.
+        return params if isinstance(params, dict) else {}
+
+    def get_concurrency(self):
+        """
+        Returns how many requests this benchmark keeps in flight at once.
+
+        A `concurrency` value in the benchmark's own section takes precedence over
+        the model-level `concurrency`. Defaults to 1 (strictly sequential).
+        """
+        concurrency = self.benchmark_params.get('concurrency', self.model_config.get('concurrency', 1))
+        return max(1, int(concurrency))
 
     @property
     @abstractmethod
@@ -27,9 +108,24 @@ class BenchmarkEvaluator(ABC):
 
     @abstractmethod
     def load_data(self):
-        """Loads and returns the dataset for the benchmark."""
+        """
+        Loads and returns the dataset for the benchmark.
+
+        Any object supporting len() and iteration works; evaluators return the
+        Arrow-backed `datasets.Dataset` directly rather than a list, so rows are
+        only converted to dicts when a sample is actually evaluated.
+        """
         pass
 
+    @staticmethod
+    def sample_few_shot(pool, k, rng=random):
+        """
+        Draws `k` distinct examples from `pool` by index, so that only the drawn rows
+        are materialized. Works for lists and Arrow-backed datasets alike.
+        """
+        indices = rng.sample(range(len(pool)), k)
+        return [pool[i] for i in indices]
+
     @abstractmethod
     def format_prompt(self, sample):
         """Formats the prompt for a given sample from the dataset."""
@@ -40,45 +136,768 @@ class BenchmarkEvaluator(ABC):
         """Processes the model's response and returns the evaluation result."""
         pass
 
-    async def run(self):
+    def prompt_token_budget(self):
         """
-        Runs the full evaluation for this benchmark.
+        Returns the largest prompt, in tokens, that leaves room for `max_tokens` of
+        output within the model's `context_length`, or None if no context length is set.
         """
-        logger.info(f"Running benchmark: {self.benchmark_name} for model: {self.model_config['name']}")
-        dataset = self.load_data()
+        context_length = self.model_config.get('context_length')
+        if not context_length:
+            return None
+        return int(context_length) - int(self.api_params.get('max_tokens', 1024))
+
+    def shared_data_key(self):
+        """
+        Identifies the data this evaluator would load and the prompts it would
+        build. Evaluators with equal keys share both.
+        """
+        return json.dumps(
+            [type(self).__module__, type(self).__qualname__, self.benchmark_params, self.few_shot_settings()],
+            sort_keys=True,
+            default=str,
+        )
+
+    def prompt_sharing_key(self):
+        """
+        Identifies the prompts this evaluator builds from shared data. Prompts are
+        trimmed to the model's token budget, so only models with the same budget
+        and tokenizer share them.
+        """
+        return (self.prompt_token_budget(), self.token_counter.name)
+
+    def prepare_data(self):
+        """
+        Returns the dataset, calling load_data() only for the first evaluator of a
+        given configuration in this process. Later evaluators (other models) adopt
+        the attributes load_data() set (e.g. `few_shot_data`) and share the prefix
+        and formatted-prompt caches of models with the same prompt_sharing_key().
+        """
+        key = self.shared_data_key()
+        entry = _shared_data.get(key)
+        if entry is None:
+            attributes_before = set(vars(self))
+            dataset = self.load_prepared_data()
+            state = {name: value for name, value in vars(self).items() if name not in attributes_before}
+            entry = {"dataset": dataset, "state": state}
+            _shared_data[key] = entry
+        else:
+            vars(self).update(entry["state"])
+            logger.info(f"Reusing loaded {self.benchmark_name} data for model: {self.model_config['name']}")
+        # Prompts depend on the model only through its token budget, so their caches
+        # and statistics are shared by every model with the same budget.
+        prompt_set = entry.setdefault("prompt_sets", {}).setdefault(self.prompt_sharing_key(), {
+            "prefixes": self._prompt_prefixes,
+            "prompts": self._formatted_prompts,
+            "prompt_stats": self.prompt_stats,
+        })
+        self._prompt_prefixes = prompt_set["prefixes"]
+        self._formatted_prompts = prompt_set["prompts"]
+        self.prompt_stats = prompt_set["prompt_stats"]
+        return entry["dataset"]
+
+    @property
+    def dataset_revision(self):
+        """The dataset revision (`dataset_revision:` in the benchmark's section) passed to load_dataset, or None for the latest."""
+        return self.benchmark_params.get('dataset_revision')
+
+    def data_params(self):
+        """
+        The benchmark settings that change what load_data() returns (sample size,
+        seeds). Part of the dataset snapshot key; none by default.
+        """
+        return {}
+
+    def preprocess(self, dataset):
+        """
+        Derives columns once, before the dataset is snapshotted, e.g. ground-truth
+        answers parsed from their text. Returns the dataset unchanged by default.
+        """
+        return dataset
+
+    def snapshot_key(self, revision):
+        """Identifies the prepared data: evaluator, data_version, dataset `revision` and data_params()."""
+        return json.dumps(
+            [type(self).__module__, type(self).__qualname__, self.data_version, revision, self.data_params()],
+            sort_keys=True,
+            default=str,
+        )
+
+    def load_prepared_data(self):
+        """
+        Returns load_data() followed by preprocess(), served from a memory-mapped
+        snapshot under `evaluation.dataset_snapshots.dir` when one exists for
+        snapshot_key(). The first run writes the snapshot; later runs open it in
+        milliseconds. Attributes load_data() sets (few-shot pools) are restored with it.
+
+        Snapshots are keyed by the pinned `dataset_revision` or, without one, by
+        the latest commit of `dataset_path`, so an upstream update builds a new
+        snapshot. When that commit cannot be resolved (e.g. offline), the commit
+        the last snapshot of `dataset_path` was built from is used, and only an
+        existing snapshot is opened: data loaded offline may be of another revision.
+        """
+        settings = self.benchmark_config.get('dataset_snapshots')
+        if not isinstance(settings, dict):
+            settings = {}
+        if not settings.get('enabled', True):
+            return self.preprocess(self.load_data())
+
+        directory = settings.get('dir', os.path.join('cache', 'datasets'))
+        revision = self.dataset_revision or resolve_dataset_commit(self.dataset_path)
+        resolved = revision is not None
+        if not resolved:
+            revision = recorded_dataset_commit(directory, self.dataset_path)
+        if revision is None:
+            logger.info(f"No dataset_revision is pinned for {self.benchmark_name} and its latest revision is unknown; not using a dataset snapshot.")
+            return self.preprocess(self.load_data())
+        key = self.snapshot_key(revision)
+        path = snapshot_path(directory, self.benchmark_name, key)
+        snapshot = load_snapshot(path, key)
+        if snapshot is not None:
+            dataset, state = snapshot
+            vars(self).update(state)
+            logger.info(f"Opened {self.benchmark_name} dataset snapshot {path}")
+            if resolved and not self.dataset_revision:
+                self._record_dataset_commit(directory, revision)
+            return dataset
+        if not resolved:
+            logger.info(f"The latest revision of {self.dataset_path} is unknown and {self.benchmark_name} has no snapshot of its last known one; not using a dataset snapshot.")
+            return self.preprocess(self.load_data())
+
+        attributes_before = set(vars(self))
+        dataset = self.preprocess(self.load_data())
+        state = {name: value for name, value in vars(self).items() if name not in attributes_before}
+        try:
+            if save_snapshot(path, key, dataset, state):
+                logger.info(f"Wrote {self.benchmark_name} dataset snapshot {path}")
+                if not self.dataset_revision:
+                    self._record_dataset_commit(directory, revision)
+        except Exception as e:
+            logger.warning(f"Could not write dataset snapshot {path}: {e}")
+        return dataset
+
+    def _record_dataset_commit(self, directory, revision):
+        try:
+            record_dataset_commit(directory, self.dataset_path, revision)
+        except OSError as e:
+            logger.warning(f"Could not record the revision of {self.dataset_path} in {directory}: {e}")
+
+    def count_prompt_tokens(self, dataset):
+        """
+        Tokenizes the query of every sample not yet formatted in one batch, so the
+        per-prompt budget checks in build_prompt() are cache hits.
+        """
+        if len(self._formatted_prompts) >= len(dataset):
+            return
+        try:
+            queries = [self.format_query(dataset[index]) for index in range(len(dataset))]
+        except NotImplementedError:
+            # Not a few-shot evaluator; prompts are not trimmed.
+            return
+        self.token_counter.count_many(queries)
+
+    def get_prompt(self, sample, index=None):
+        """
+        Returns format_prompt(sample), formatting each dataset index only once
+        across all evaluators that share this evaluator's data.
+        """
+        if index is None:
+            return self.format_prompt(sample)
+        messages = self._formatted_prompts.get(index)
+        if messages is None:
+            messages = self.format_prompt(sample)
+            self._formatted_prompts[index] = messages
+        return messages
+
+    # --- Few-shot prompt construction ---------------------------------------
+    # Evaluators that prompt with worked examples implement few_shot_header(),
+    # format_example() and format_query(), and call build_prompt() from
+    # format_prompt().
+
+    def few_shot_settings(self):
+        """
+        Returns the few-shot selection settings: the evaluation-level `few_shot:`
+        section, overridden by a `few_shot:` section inside the benchmark's own.
+
+        Keys:
+            mode: 'random' (new examples for every prompt, the default), 'fixed'
+                  (one seeded set of examples shared by all prompts) or
+                  'per_subject' (one seeded set per prompt_group(), e.g. MMLU subject).
+            seed: Seed for the fixed/per-subject draw, and for the random mode if set.
+        """
+        settings = dict(self.benchmark_config.get('few_shot') or {})
+        settings.update(self.benchmark_params.get('few_shot') or {})
+        return settings
+
+    def few_shot_header(self):
+        """Instruction text placed before the examples."""
+        return ""
 
-        results = []
+    def format_example(self, example):
+        """Formats one solved few-shot example."""
+        raise NotImplementedError
 
-        # Using tqdm.asyncio for an async-compatible progress bar
-        for sample in tqdm(dataset, desc=f"Evaluating {self.benchmark_name}"):
-            prompt_messages = self.format_prompt(sample)
+    def format_query(self, sample):
+        """Formats the sample-specific suffix appended after the examples."""
+        raise NotImplementedError
 
-            response = await call_api(
+    def few_shot_pool(self, group=None):
+        """Returns the examples to draw from for `group` (None means all)."""
+        return self.few_shot_data
+
+    def prompt_group(self, sample):
+        """Returns the group whose prefix a sample uses in 'per_subject' mode."""
+        return None
+
+    def get_prompt_prefix(self, k_shot, group=None, shots=None):
+        """
+        Returns the header plus `k_shot` examples for `group`, building it on first
+        use from a draw seeded by (seed, group). The same string is reused for every
+        later prompt, so all prompts in the group share it as an exact prefix.
+
+        With `shots` < `k_shot`, only the first `shots` examples of the same draw
+        are kept, so a trimmed prefix is a prefix of the full one.
+        """
+        shots = k_shot if shots is None else shots
+        key = (k_shot, group, shots)
+        prefix = self._prompt_prefixes.get(key)
+        if prefix is None:
+            pool = self.few_shot_pool(group)
+            rng = random.Random(f"{self.few_shot_settings().get('seed', 0)}:{self.benchmark_name}:{group}")
+            examples = self.sample_few_shot(pool, min(k_shot, len(pool)), rng)[:shots]
+            prefix = self.few_shot_header() + "".join(self.format_example(ex) for ex in examples)
+            self._prompt_prefixes[key] = prefix
+        return prefix
+
+    def fit_shots(self, shots, query_tokens, prefix_tokens):
+        """
+        Returns the largest number of shots, at most `shots`, whose prompt fits
+        prompt_token_budget().
+
+        Args:
+            shots (int): The configured number of examples.
+            query_tokens (int): Tokens in the sample-specific query.
+            prefix_tokens (callable): Maps a number of shots to the tokens in that prefix.
+        """
+        budget = self.prompt_token_budget()
+        if budget is None:
+            return shots
+        overhead = TOKENS_PER_MESSAGE + TOKENS_PER_REPLY
+        fitted = shots
+        while fitted > 0 and prefix_tokens(fitted) + query_tokens + overhead > budget:
+            fitted -= 1
+        if fitted < shots:
+            self.prompt_stats["trimmed_prompts"] += 1
+        if prefix_tokens(fitted) + query_tokens + overhead > budget:
+            self.prompt_stats["over_budget_prompts"] += 1
+            logger.debug(f"A {self.benchmark_name} prompt exceeds the token budget ({budget}) even without examples.")
+        return fitted
+
+    def build_prompt(self, sample, k_shot):
+        """
+        Builds the chat messages for a sample: a few-shot prefix followed by the
+        sample-specific query.
+
+        The prefix comes first and is byte-identical across prompts in the
+        deterministic modes, so endpoints and local servers with prompt/prefix
+        caching can reuse its KV cache.
+
+        When the model has a `context_length`, trailing examples are dropped until
+        the prompt plus `max_tokens` fits in it.
+        """
+        mode = self.few_shot_settings().get('mode', 'random')
+        counter = self.token_counter
+        query = self.format_query(sample)
+        query_tokens = counter.count(query)
+        if mode == 'random':
+            examples = self.sample_few_shot(self.few_shot_pool(), k_shot, self._few_shot_rng)
+            parts = [self.few_shot_header()] + [self.format_example(ex) for ex in examples]
+            part_tokens = counter.count_many(parts)
+            shots = self.fit_shots(len(examples), query_tokens, lambda n: sum(part_tokens[:n + 1]))
+            prefix = "".join(parts[:shots + 1])
+            prefix_tokens = sum(part_tokens[:shots + 1])
+            reused = False
+        else:
+            group = self.prompt_group(sample) if mode == 'per_subject' else None
+            shots = self.fit_shots(k_shot, query_tokens, lambda n: counter.count(self.get_prompt_prefix(k_shot, group, n)))
+            reused = (k_shot, group, shots) in self._prompt_prefixes
+            prefix = self.get_prompt_prefix(k_shot, group, shots)
+            prefix_tokens = counter.count(prefix)
+
+        self.prompt_stats["prompts"] += 1
+        self.prompt_stats["prompt_tokens"] += prefix_tokens + query_tokens
+        if reused:
+            self.prompt_stats["shared_prefix_tokens"] += prefix_tokens
+        return [{"role": "user", "content": prefix + query}]
+
+    async def aprocess_response(self, response, sample):
+        """
+        Awaitable variant of process_response used by run(). Evaluators whose
+        scoring blocks (e.g. executing code) override this to stay off the event loop.
+        """
+        return self.process_response(response, sample)
+
+    def results_store_path(self):
+        """
+        Returns the Parquet file receiving this (run, model, benchmark)'s per-sample
+        results, or None when the store is disabled or no run id has been assigned.
+        """
+        settings = self.benchmark_config.get('results_store')
+        if not isinstance(settings, dict):
+            settings = {}
+        run_id = (self.benchmark_config.get('checkpoint') or {}).get('run_id')
+        if not settings.get('enabled', True) or not run_id:
+            return None
+        return results_path(settings.get('dir', os.path.join('results', 'samples')), run_id, self.model_config['name'], self.benchmark_name)
+
+    def write_results_store(self, dataset, results):
+        """Writes every sample's result, raw response and telemetry to the run's Parquet file."""
+        path = self.results_store_path()
+        if path is None:
+            return
+        # Samples skipped by early stopping have no result and no row.
+        rows = [
+            result_row(index, sample_key(dataset[index]), result)
+            for index, result in enumerate(results)
+            if result is not None
+        ]
+        metadata = {
+            "model": self.model_config['name'],
+            "benchmark": self.benchmark_name,
+            "run_id": self.benchmark_config['checkpoint']['run_id'],
+        }
+        try:
+            write_results(path, rows, metadata)
+            logger.info(f"Per-sample results written to {path}")
+        except Exception as e:
+            logger.error(f"Failed to write per-sample results to {path}: {e}")
+
+    def open_checkpoint(self):
+        """
+        Returns the Checkpoint for this (run, model, benchmark), or None when
+        checkpointing is disabled or no run id has been assigned.
+        """
+        settings = self.benchmark_config.get('checkpoint')
+        if not isinstance(settings, dict) or not settings.get('enabled', True) or not settings.get('run_id'):
+            return None
+        path = checkpoint_path(
+            settings.get('dir', 'checkpoints'), settings['run_id'], self.model_config['name'], self.benchmark_name
+        )
+        return Checkpoint(path, batch_size=settings.get('batch_size', 20))
+
+    async def evaluate_sample(self, sample, index=None):
+        """
+        Runs a single sample through format_prompt -> call_api -> process_response.
+        `index` is the sample's position in the dataset, used to share its prompt.
+        With self-consistency enabled, the sampled chains are drawn concurrently
+        with the greedy response and their majority vote is added to the result.
+        """
+        prompt_messages = self.get_prompt(sample, index)
+        if self.self_consistency_settings()['k'] == 1:
+            return await self.greedy_result(prompt_messages, sample)
+        result, votes = await asyncio.gather(
+            self.greedy_result(prompt_messages, sample),
+            self.self_consistency_result(prompt_messages, sample),
+        )
+        result.update(votes)
+        return result
+
+    async def greedy_result(self, prompt_messages, sample):
+        """Scores one completion drawn with the configured api_params."""
+        telemetry = {}
+        response = await call_api(
+            model_config=self.model_config,
+            messages=prompt_messages,
+            max_tokens=self.api_params.get('max_tokens', 1024),
+            temperature=self.api_params.get('temperature', 0.1),
+            cache=self.response_cache,
+            stats=telemetry,
+        )
+        self.telemetry_records.append(telemetry)
+
+        if response is None:
+            # Handle API call failure
+            result = {"correct": False, "error": "API call failed"}
+        else:
+            result = await self.aprocess_response(response, sample)
+            result["response"] = response
+        result["prompt_hash"] = prompt_hash(prompt_messages)
+        result["telemetry"] = telemetry
+        return result
+
+    def rescore_sample(self, stored, sample):
+        """
+        Re-scores a stored result from its raw response, without calling the API.
+        Results of failed API calls are returned unchanged; a stored majority vote
+        is recounted from the stored chains.
+        """
+        if stored.get("response") is None:
+            result = dict(stored)
+        else:
+            result = self.process_response(stored["response"], sample)
+        if "majority_correct" in stored:
+            completions = stored.get("responses") or []
+            keys = [self.answer_key(c, sample) for c in completions]
+            votes = self._majority_fields(completions, keys, stored.get("chains_requested", len(completions)))
+            majority_response = votes.pop("majority_response")
+            votes["majority_correct"] = majority_response is not None and self.process_response(majority_response, sample).get("correct", False)
+            votes["sampling_tokens"] = stored.get("sampling_tokens")
+            result.update(votes)
+        return result
+
+    def answer_key(self, response, sample):
+        """
+        Returns the final answer parsed from a response, as a hashable value on
+        which self-consistency chains vote, or None if there is none. Evaluators
+        supporting self-consistency override this.
+        """
+        return None
+
+    def self_consistency_settings(self):
+        """
+        Returns the benchmark's `self_consistency:` settings. `k` is 1 (disabled)
+        for evaluators that do not implement answer_key().
+        """
+        if self._self_consistency is None:
+            settings = self_consistency_settings(self.benchmark_params)
+            if settings['k'] > 1 and type(self).answer_key is BenchmarkEvaluator.answer_key:
+                logger.warning(f"{self.benchmark_name} does not support self-consistency; ignoring self_consistency.k.")
+                settings['k'] = 1
+            self._self_consistency = settings
+        return self._self_consistency
+
+    async def self_consistency_result(self, prompt_messages, sample):
+        """
+        Draws up to k sampled chains, stopping once the vote is decided, and
+        scores the majority answer.
+        """
+        settings = self.self_consistency_settings()
+        request_stats = []
+
+        async def draw(n, offset):
+            telemetry = {}
+            completions = await call_api_n(
                 model_config=self.model_config,
                 messages=prompt_messages,
-                max_tokens=self.api_params.get('max_tokens', 1024),
-                temperature=self.api_params.get('temperature', 0.1)
+                n=n,
+                max_tokens=settings['max_tokens'] or self.api_params.get('max_tokens', 1024),
+                temperature=settings['temperature'],
+                cache=self.response_cache,
+                stats=telemetry,
+                sample_offset=offset,
             )
+            self.telemetry_records.append(telemetry)
+            request_stats.append(telemetry)
+            return completions
+
+        completions, keys, requested = await draw_votes(
+            draw, lambda completion: self.answer_key(completion, sample), settings['k'], settings['early_stop']
+        )
+        result = self._majority_fields(completions, keys, requested)
+        majority_response = result.pop("majority_response")
+        result["majority_correct"] = majority_response is not None and (await self.aprocess_response(majority_response, sample)).get("correct", False)
+        result["sampling_tokens"] = sum(t.get('completion_tokens') or 0 for t in request_stats if not t.get('cached'))
+        return result
+
+    @staticmethod
+    def _majority_fields(completions, keys, requested):
+        """Result fields of a majority vote; 'majority_response' is a chain giving the winning answer."""
+        winner, votes = majority_vote(keys)
+        majority_response = None if winner is None else completions[keys.index(winner)]
+        return {
+            "responses": completions,
+            "majority_answer": None if winner is None else str(winner),
+            "majority_votes": votes,
+            "chains_requested": requested,
+            "majority_response": majority_response,
+        }
+
+    async def setup(self):
+        """
+        Starts what scoring needs beyond the event loop (e.g. sandbox worker
+        pools). Called before any sample is evaluated; nothing by default.
+        """
+        pass
+
+    async def teardown(self):
+        """Releases what setup() started."""
+        pass
 
-            if response is None:
-                # Handle API call failure
-                result = {"correct": False, "error": "API call failed"}
+    async def run(self):
+        """
+        Runs the full evaluation for this benchmark.
+
+        Samples are scheduled over a fixed number of workers so that up to
+        `get_concurrency()` requests are in flight at any time. Results are kept
+        in dataset order regardless of the order in which requests complete.
+        """
+        await self.setup()
+        try:
+            return await self._run()
+        finally:
+            await self.teardown()
+
+    async def _run(self):
+        logger.info(f"Running benchmark: {self.benchmark_name} for model: {self.model_config['name']}")
+        dataset = self.prepare_data()
+        self.count_prompt_tokens(dataset)
+
+        concurrency = self.get_concurrency()
+        results = [None] * len(dataset)
+        from tqdm.asyncio import tqdm
+        progress = tqdm(total=len(dataset), desc=f"Evaluating {self.benchmark_name}")
+
+        # With early stopping, samples are visited in a seeded random order so that
+        # any prefix of the run is an unbiased sample of the dataset.
+        monitor = self.open_sequential_monitor()
+        order = list(range(len(dataset)))
+        if monitor:
+            random.Random(self.early_stopping_settings()['seed']).shuffle(order)
+
+        checkpoint = self.open_checkpoint()
+        completed = {}
+        if checkpoint and self.benchmark_config['checkpoint'].get('resume'):
+            completed = checkpoint.load()
+            logger.info(f"Resuming {self.benchmark_name}: {len(completed)} results found in {checkpoint.path}")
+
+        def pending_samples():
+            # Samples with a checkpointed result are filled in directly and skipped.
+            for index in order:
+                if monitor and monitor.stopped:
+                    return
+                sample = dataset[index]
+                key = sample_key(sample) if checkpoint else None
+                if key in completed:
+                    results[index] = completed[key]
+                    if monitor:
+                        monitor.observe(results[index])
+                    progress.update(1)
+                    continue
+                yield index, sample, key
+
+        # A single shared iterator hands out samples; each worker pulls the next
+        # one as soon as its previous request has completed.
+        pending = pending_samples()
+
+        async def evaluate_pending(index, sample, key):
+            result = await self.evaluate_sample(sample, index)
+            results[index] = result
+            if checkpoint:
+                checkpoint.record(key, result)
+            if monitor:
+                monitor.observe(result)
+            progress.update(1)
+            return result
+
+        async def worker():
+            for index, sample, key in pending:
+                await evaluate_pending(index, sample, key)
+
+        started = time.perf_counter()
+        try:
+            if self.work_queue is not None:
+                # Samples go to the model's queue, shared with its other benchmarks.
+                jobs = (
+                    lambda index=index, sample=sample, key=key: evaluate_pending(index, sample, key)
+                    for index, sample, key in pending
+                )
+                await self.work_queue.run(
+                    self.benchmark_name, jobs, *self.expected_tokens(dataset),
+                    max_in_flight=self.benchmark_params.get('concurrency'),
+                )
             else:
-                result = self.process_response(response, sample)
+                num_workers = max(1, min(concurrency, len(dataset)))
+                await asyncio.gather(*(worker() for _ in range(num_workers)))
+        finally:
+            progress.close()
+            if checkpoint:
+                checkpoint.close()
+        wall_time = time.perf_counter() - started
 
-            results.append(result)
+        if monitor and monitor.stopped:
+            logger.info(f"Stopped {self.benchmark_name} early ({monitor.stop_reason}) after {monitor.total} of {len(dataset)} samples.")
+        return self.finish_run(dataset, results, wall_time, monitor)
+
+    def finish_run(self, dataset, results, wall_time, monitor=None):
+        """
+        Turns per-sample results into run()'s return value: stores them, then
+        computes the score, metrics, breakdowns and performance summary and
+        records the run in the run index.
+
+        Args:
+            dataset: The benchmark's dataset.
+            results (list): One result per dataset index; None for samples not evaluated.
+            wall_time (float): Seconds spent evaluating, for throughput.
+            monitor (SequentialMonitor): The early-stopping monitor, if any.
+        """
+        total = len(dataset)
+        self.write_results_store(dataset, results)
+        # Only evaluated samples count; all of them unless the run stopped early.
+        evaluated = [index for index, result in enumerate(results) if result is not None]
+        if len(evaluated) < len(dataset):
+            dataset = dataset.select(evaluated)
+            results = [results[index] for index in evaluated]
 
         # Aggregate results
         score = self.aggregate_results(results)
         logger.info(f"Finished benchmark: {self.benchmark_name}. Score: {score:.4f}")
 
+        metrics = self.summary_metrics(results)
+        if monitor:
+            metrics.update(monitor.summary(total))
+        performance = summarize_telemetry(self.telemetry_records, wall_time)
         return {
             "benchmark": self.benchmark_name,
             "model": self.model_config['name'],
             "score": score,
             "total_samples": len(results),
+            "metrics": metrics,
+            "breakdowns": self.breakdowns(dataset, results),
+            "performance": performance,
+            "comparison": self.record_run(dataset, results, score, metrics, performance),
+        }
+
+    def record_run(self, dataset, results, score, metrics, performance):
+        """
+        Adds this run's per-sample correctness to the run index and compares it
+        with the configured baseline run.
+
+        Returns:
+            compare_entries() output with the flipped samples listed (as dataset
+            index and sample key, up to `max_flipped` each way), or None when the
+            index is disabled, no run id is assigned or there is no baseline.
+        """
+        settings = run_index_settings(self.benchmark_config)
+        run_id = (self.benchmark_config.get('checkpoint') or {}).get('run_id')
+        if not run_id:
+            return None
+        try:
+            index = get_run_index(settings)
+            if index is None:
+                return None
+            keys = [sample_key(dataset[i]) for i in range(len(dataset))]
+            model = self.model_config['name']
+            index.record(run_id, model, self.benchmark_name, keys, [r.get("correct", False) for r in results], score, performance, metrics)
+            baseline = find_baseline(index, settings, run_id, model, self.benchmark_name)
+            if baseline is None:
+                return None
+            comparison = compare_entries(baseline, index.get(run_id, model, self.benchmark_name), settings.get('alpha', 0.05))
+            dataset_index = {key: i for i, key in enumerate(keys)}
+            describe_flips(index, self.benchmark_name, comparison, settings.get('max_flipped', 20), dataset_index)
+        except Exception as e:
+            logger.error(f"Could not update the run index for {self.benchmark_name}: {e}")
+            return None
+        logger.info(
+            f"{self.benchmark_name} vs run {comparison['baseline_run']}: delta {comparison['delta']:+.4f} on "
+            f"{comparison['paired']} paired samples, {comparison['regressions']} regressed, "
+            f"{comparison['improvements']} improved (McNemar p = {comparison['p_value']:.3g}, {comparison['verdict']})"
+        )
+        return comparison
+
+    # Attributes holding counters (dicts of numbers) that summary_metrics()
+    # reports. Distributed workers send them to the coordinator, which adds
+    # them up before the run is finished.
+    shard_counters = ("prompt_stats",)
+
+    def shard_state(self):
+        """Returns this evaluator's counters, as sent by a distributed worker."""
+        return {name: dict(getattr(self, name)) for name in self.shard_counters}
+
+    def merge_shard_state(self, state):
+        """Adds counters returned by another process's shard_state() to this evaluator's."""
+        for name in self.shard_counters:
+            counters = getattr(self, name)
+            for key, value in (state.get(name) or {}).items():
+                counters[key] = counters.get(key, 0) + value
+
+    # Completion tokens a sample typically uses, the work queue's first estimate
+    # of this benchmark's cost.
+    typical_completion_tokens = 256
+
+    def expected_completion_tokens(self):
+        """
+        Completion tokens one sample is expected to use, across all its requests:
+        `expected_completion_tokens` from the benchmark's section, or
+        typical_completion_tokens capped at max_tokens.
+        """
+        tokens = self.benchmark_params.get('expected_completion_tokens')
+        if tokens is None:
+            tokens = min(self.typical_completion_tokens, int(self.api_params.get('max_tokens', 1024)))
+        k = self.self_consistency_settings()['k']
+        return tokens * (1 + k) if k > 1 else tokens
+
+    def expected_tokens(self, dataset):
+        """(prompt, completion) tokens expected per sample, from the first sample's prompt."""
+        if not len(dataset):
+            return 0, 0
+        return estimate_message_tokens(self.get_prompt(dataset[0], 0)), self.expected_completion_tokens()
+
+    def early_stopping_settings(self):
+        """The `early_stopping:` settings, with a benchmark's own section taking precedence."""
+        return early_stopping_settings(self.benchmark_config, self.benchmark_params)
+
+    def open_sequential_monitor(self):
+        """
+        Returns a SequentialMonitor when early stopping is enabled, with the
+        baseline score loaded from a previous run if one is configured; else None.
+        """
+        settings = self.early_stopping_settings()
+        if not settings.get('enabled'):
+            return None
+        baseline = load_baseline(
+            settings, self.benchmark_config.get('results_store'), self.model_config['name'], self.benchmark_name
+        )
+        return SequentialMonitor(settings, baseline)
+
+    def summary_metrics(self, results):
+        """
+        Returns additional named metrics shown in the report next to the score.
+        Reports few-shot prefix sharing by default; subclasses extend it with
+        benchmark-specific numbers.
+        """
+        stats = self.prompt_stats
+        if not stats["prompts"]:
+            return {}
+        metrics = {
+            "Few-shot Mode": self.few_shot_settings().get('mode', 'random'),
+            "Tokenizer": self.token_counter.name,
+            "Prompt Tokens": stats["prompt_tokens"],
+            "Shared Prefix Tokens": stats["shared_prefix_tokens"],
+            "Shared Prefix Ratio": stats["shared_prefix_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0,
+        }
+        budget = self.prompt_token_budget()
+        if budget is not None:
+            metrics["Prompt Token Budget"] = budget
+            metrics["Prompts With Trimmed Shots"] = stats["trimmed_prompts"]
+            metrics["Prompts Over Budget"] = stats["over_budget_prompts"]
+        metrics.update(self.self_consistency_metrics(results))
+        return metrics
+
+    def self_consistency_metrics(self, results):
+        """maj@k (the score itself stays that of the greedy responses) and what the sampled chains cost."""
+        k = self.self_consistency_settings()['k']
+        voted = [r for r in results if "majority_correct" in r]
+        if k == 1 or not voted:
+            return {}
+        requested = sum(r.get("chains_requested", 0) for r in voted)
+        greedy_tokens = sum((r.get("telemetry") or {}).get("completion_tokens") or 0 for r in results)
+        sampling_tokens = sum(r.get("sampling_tokens") or 0 for r in voted)
+        return {
+            f"maj@{k}": sum(1 for r in voted if r["majority_correct"]) / len(voted),
+            "Chains Drawn": requested,
+            "Chains Saved by Early Stop": k * len(voted) - requested,
+            "Mean Chains per Problem": requested / len(voted),
+            "Greedy Completion Tokens": greedy_tokens,
+            "Self-Consistency Completion Tokens": sampling_tokens,
         }
 
+    def breakdowns(self, dataset, results):
+        """
+        Returns per-group accuracy tables shown in the report below the metrics,
+        as {title: rows of stats.grouped_accuracy()}. None by default; MMLU
+        reports its subjects and categories.
+        """
+        return {}
+
     def aggregate_results(self, results):
         """
         Aggregates individual sample results into a final score.
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Open caches by resolved path, so every evaluator writes through one connection.
+_caches = {}
+
+class ResponseCache:
+    """
+    A persistent, content-addressed store of API responses in a single SQLite file.
+
+    Entries are keyed by a hash of everything that determines a response (model,
+    endpoint, messages and decoding parameters). The file is kept under
+    `max_size_mb` by evicting least-recently-used entries.
+
+    Modes:
+        readwrite: serve hits and store new responses (default).
+        readonly:  serve hits, never write (not even access times).
+        bypass:    never serve hits, but store fresh responses, refreshing the cache.
+    """
+
+    MODES = ("readwrite", "readonly", "bypass")
+
+    def __init__(self, path, max_size_mb=1024, mode="readwrite"):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Expected one of {self.MODES}.")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+        self._conn.commit()
+        self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model_config, messages, params):
+        """
+        Hashes the request identity: model name, endpoint, messages and decoding params.
+        """
+        payload = {
+            "model_name": model_config['model_name'],
+            "api_base": model_config['api_base'],
+            "messages": messages,
+            "params": params,
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key):
+        """Returns the cached response for `key`, or None on a miss (always None in bypass mode)."""
+        if self.mode == "bypass":
+            return None
+        row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.mode == "readwrite":
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, response):
+        """Stores a JSON-serializable response under `key`. A no-op in readonly mode."""
+        if self.mode == "readonly":
+            return
+        encoded = json.dumps(response, ensure_ascii=False)
+        size = len(encoded.encode('utf-8')) + len(key)
+        previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, encoded, size, time.time()),
+        )
+        self.total_bytes += size - (previous[0] if previous else 0)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        self._conn.commit()
+
+    def _evict(self):
+        """Drops least-recently-used entries until the store is back under 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC")
+        evicted = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            evicted.append((key,))
+            self.total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logger.info(f"Response cache evicted {len(evicted)} entries ({self.path})")
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+def get_response_cache(settings):
+    """
+    Returns the shared ResponseCache described by the evaluation config's `cache:` section,
+    or None when the cache is not configured or disabled.
+    """
+    if not isinstance(settings, dict) or not settings.get('enabled', True):
+        return None
+    path = os.path.abspath(settings.get('path', os.path.join("cache", "responses.sqlite")))
+    cache = _caches.get(path)
+    if cache is None:
+        cache = ResponseCache(path, max_size_mb=settings.get('max_size_mb', 1024), mode=settings.get('mode', "readwrite"))
+        _caches[path] = cache
+        logger.info(f"Using response cache at {path} (mode: {cache.mode})")
+    return cache
+
+def close_response_caches():
+    """Closes every open response cache, logging its hit rate."""
+    for cache in _caches.values():
+        lookups = cache.hits + cache.misses
+        if lookups:
+            logger.info(f"Response cache {cache.path}: {cache.hits}/{lookups} hits")
+        cache.close()
+    _caches.clear()
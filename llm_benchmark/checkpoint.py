@@ -0,0 +1,107 @@
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+def sample_key(sample):
+    """
+    Returns a stable identifier for a dataset sample, derived from its content.
+    """
+    encoded = json.dumps(sample, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+def checkpoint_path(directory, run_id, model_name, benchmark_name):
+    """Returns the JSONL file holding the results of one (run, model, benchmark)."""
+    safe_model_name = model_name.replace('/', '_').replace(':', '_')
+    return os.path.join(directory, run_id, f"{safe_model_name}__{benchmark_name}.jsonl")
+
+def latest_run_id(directory):
+    """Returns the most recently modified run id under `directory`, or None."""
+    if not os.path.isdir(directory):
+        return None
+    runs = [d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d))]
+    if not runs:
+        return None
+    return max(runs, key=lambda d: os.path.getmtime(os.path.join(directory, d)))
+
+class Checkpoint:
+    """
+    An append-only JSONL log of per-sample results.
+
+    Each line is `{"key": <sample key>, "result": <result dict>}`. Results are
+    buffered and written in batches of `batch_size`, so a crash loses at most
+    one batch. A line left truncated by a crash is cut off before the first new
+    write, so that it does not run into the next entry.
+    """
+
+    def __init__(self, path, batch_size=20):
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self._buffer = []
+        self._file = None
+
+    def load(self):
+        """
+        Returns {sample key: result} for every result already in the checkpoint.
+        A truncated last line, left by a crash mid-write, is ignored.
+        """
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                    completed[entry['key']] = entry['result']
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    logger.warning(f"Skipping unreadable line {line_number} in checkpoint {self.path}")
+        return completed
+
+    def record(self, key, result):
+        """Buffers one result, writing the buffer out once it holds `batch_size` entries."""
+        self._buffer.append(json.dumps({"key": key, "result": result}, ensure_ascii=False, default=str))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._drop_partial_line()
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write("\n".join(self._buffer) + "\n")
+        self._file.flush()
+        self._buffer.clear()
+
+    def _drop_partial_line(self, chunk_size=65536):
+        """Truncates the file after its last newline, if it does not end in one."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            position = end
+            keep = 0
+            while position > 0:
+                step = min(chunk_size, position)
+                position -= step
+                f.seek(position)
+                newline = f.read(step).rfind(b"\n")
+                if newline != -1:
+                    keep = position + newline + 1
+                    break
+            f.truncate(keep)
+        logger.warning(f"Dropped a truncated last line ({end - keep} bytes) from checkpoint {self.path}")
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,694 @@
+import os
+import sys
+import copy
+import json
+import math
+import time
+import socket
+import asyncio
+import logging
+import argparse
+import ipaddress
+from urllib.parse import urlsplit, urlunsplit
+from .checkpoint import sample_key
+from .telemetry import summarize_telemetry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISTRIBUTED_SETTINGS = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    "token": None,
+    "shard_size": 20,
+    "lease_seconds": 300,
+    "max_attempts": 3,
+    "slots": 2,
+    "workers": None,
+}
+
+# Seconds an idle worker waits before asking for work again.
+POLL_INTERVAL = 1.0
+
+# Environment variable a worker reads a model's API key from, unless the model
+# names another one in `api_key_env`.
+DEFAULT_API_KEY_ENV = "OPENAI_API_KEY"
+
+def distributed_settings(eval_config):
+    """Returns the coordinator/worker settings: the defaults, updated by `evaluation.distributed`."""
+    settings = dict(DEFAULT_DISTRIBUTED_SETTINGS)
+    if isinstance(eval_config.get('distributed'), dict):
+        settings.update(eval_config['distributed'])
+    return settings
+
+def make_shards(total, shard_size):
+    """
+    Splits dataset indices 0..total-1 into consecutive ranges of `shard_size`.
+    Shard n always covers the same indices, so a resumed run re-creates the
+    shards of the interrupted one.
+    """
+    shard_size = max(1, int(shard_size))
+    return [range(start, min(start + shard_size, total)) for start in range(0, total, shard_size)]
+
+def _share(value, workers):
+    """A per-worker share of a limit, rounded up so that small limits stay usable."""
+    return max(1, math.ceil(value / workers)) if value else value
+
+def is_loopback(host):
+    """Whether `host` only accepts connections from this machine."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def _strip_credentials(url):
+    """Drops a user name and password embedded in a URL."""
+    parts = urlsplit(url)
+    if parts.username is None and parts.password is None:
+        return url
+    netloc = parts.hostname + (f":{parts.port}" if parts.port else "")
+    return urlunsplit(parts._replace(netloc=netloc))
+
+def worker_config(config, workers):
+    """
+    Returns the config served to workers, without secrets: `api_key` is removed
+    from every model and credentials embedded in `api_base` are dropped, so that
+    workers supply their own (see apply_credentials()). Every endpoint's
+    `rate_limit` and `evaluation.max_in_flight` are divided by the number of
+    workers, since each worker process enforces them on its own.
+    """
+    config = copy.deepcopy(config)
+    for model_config in config.get('models') or []:
+        model_config.pop('api_key', None)
+        if model_config.get('api_base'):
+            model_config['api_base'] = _strip_credentials(model_config['api_base'])
+    workers = max(1, int(workers or 1))
+    if workers == 1:
+        return config
+    for model_config in config.get('models') or []:
+        limits = model_config.get('rate_limit')
+        if isinstance(limits, dict):
+            for name in ("requests_per_minute", "tokens_per_minute", "max_concurrency"):
+                if limits.get(name):
+                    limits[name] = _share(limits[name], workers)
+    eval_config = config.get('evaluation') or {}
+    if eval_config.get('max_in_flight'):
+        eval_config['max_in_flight'] = _share(eval_config['max_in_flight'], workers)
+    return config
+
+def apply_credentials(config, local_models):
+    """
+    Fills in each model's `api_key` on a worker: from the worker's own config
+    file entry of the same name (`local_models`, name -> model entry), else from
+    the environment variable named by the model's `api_key_env`
+    (OPENAI_API_KEY by default). An `api_base` in the local entry replaces the
+    served one, e.g. to restore credentials the coordinator dropped from it.
+    """
+    for model_config in config.get('models') or []:
+        local = local_models.get(model_config['name']) or {}
+        if local.get('api_base'):
+            model_config['api_base'] = local['api_base']
+        env_name = model_config.get('api_key_env') or DEFAULT_API_KEY_ENV
+        api_key = local.get('api_key') or os.environ.get(env_name)
+        if not api_key:
+            logger.warning(f"No API key for model {model_config['name']} on this worker; set ${env_name} or pass --config.")
+        model_config['api_key'] = api_key or ""
+
+def local_models(config_path):
+    """{model name: model entry} from a worker's own config file, or {} if it has none."""
+    if not config_path or not os.path.exists(config_path):
+        return {}
+    from .utils import load_config
+    return {m['name']: m for m in (load_config(config_path) or {}).get('models') or []}
+
+class _Job:
+    """One (model, benchmark) of the run, as tracked by the coordinator."""
+
+    def __init__(self, evaluator, dataset, checkpoint, completed, progress):
+        self.evaluator = evaluator
+        self.dataset = dataset
+        self.checkpoint = checkpoint
+        self.results = [None] * len(dataset)
+        self.keys = [sample_key(dataset[index]) for index in range(len(dataset))]
+        for index, key in enumerate(self.keys):
+            if key in completed:
+                self.results[index] = completed[key]
+        self.progress = progress
+        self.remaining = 0
+        self.failed = False
+        self.done = False
+        self.result = None
+        # Telemetry records and the latest shard_state() sent by each worker.
+        self.records = []
+        self.states = {}
+
+    @property
+    def name(self):
+        return f"{self.evaluator.model_config['name']} / {self.evaluator.benchmark_name}"
+
+class UnknownShardError(LookupError):
+    """Raised for a shard id the coordinator never created."""
+
+class _Shard:
+    def __init__(self, shard_id, job, number, indices):
+        self.id = shard_id
+        self.job = job
+        self.number = number
+        self.indices = indices
+        self.attempts = 0
+        self.worker = None
+        self.lease_expires = None
+        self.done = False
+
+class Coordinator:
+    """
+    Splits every configured (model, benchmark) into shards of dataset indices
+    and hands them out to workers over HTTP.
+
+    Workers lease a shard, evaluate its samples (format_prompt -> call_api ->
+    process_response) and post the results back. A shard whose lease runs out
+    (its worker died or hung) is handed out again; one that fails `max_attempts`
+    times fails its benchmark. Once a benchmark's last shard is in, the
+    coordinator finishes it exactly as run() would: checkpoint, results store,
+    run index, and the model's report once all of its benchmarks are done.
+
+    Endpoints (JSON; with `token` set, requests need `Authorization: Bearer <token>`):
+        GET  /config    the configuration workers evaluate with, without API keys
+        POST /lease     {"worker"} -> {"task": {...} or null, "done": bool}
+        POST /renew     {"worker", "shard"} extends the shard's lease
+        POST /complete  {"worker", "shard", "results", "telemetry", "state"}
+        POST /fail      {"worker", "shard", "error"}
+
+    Requests without a required field, or with results missing a sample of the
+    shard, are answered with 400; unknown shards with 404.
+    """
+
+    def __init__(self, config, settings, evaluator_factory, local_workers=0, config_path=None):
+        if not settings.get('token') and not is_loopback(settings['host']):
+            raise ValueError(
+                f"Refusing to listen on {settings['host']} without a token; set evaluation.distributed.token or --token."
+            )
+        self.config = config
+        self.config_path = config_path
+        self.settings = settings
+        self.evaluator_factory = evaluator_factory
+        self.local_workers = local_workers
+        self.served_config = worker_config(config, settings.get('workers') or local_workers or 1)
+        self.jobs = {}
+        self.shards = {}
+        self.queue = []
+        self.model_results = {}
+        self.contacts = {}
+        self.dismissed = set()
+        self.finished = asyncio.get_running_loop().create_future()
+        self.started = None
+
+    def prepare(self):
+        """Loads every benchmark's data, restores checkpointed results and queues the pending shards."""
+        eval_config = self.config.get('evaluation', {})
+        resume = (eval_config.get('checkpoint') or {}).get('resume')
+        shard_size = self.settings['shard_size']
+        costs = {}
+        for model_config in self.config.get('models', []):
+            for bench_name in eval_config.get('benchmarks', []):
+                evaluator = self.evaluator_factory(bench_name, model_config, eval_config)
+                if evaluator is None:
+                    continue
+                self._warn_unsupported(evaluator)
+                dataset = evaluator.prepare_data()
+                # The coordinator only adds up the counters its workers report.
+                for name in evaluator.shard_counters:
+                    counters = getattr(evaluator, name)
+                    setattr(evaluator, name, {key: 0 for key in counters})
+                checkpoint = evaluator.open_checkpoint()
+                completed = checkpoint.load() if checkpoint and resume else {}
+
+                from tqdm import tqdm
+                progress = tqdm(total=len(dataset), desc=f"Evaluating {evaluator.benchmark_name} ({model_config['name']})")
+                job = _Job(evaluator, dataset, checkpoint, completed, progress)
+                self.jobs[(model_config['name'], evaluator.benchmark_name)] = job
+                if completed:
+                    logger.info(f"Resuming {job.name}: {len(completed)} results found in {checkpoint.path}")
+                progress.update(sum(1 for result in job.results if result is not None))
+
+                expected = evaluator.expected_completion_tokens()
+                for number, indices in enumerate(make_shards(len(dataset), shard_size)):
+                    pending = [index for index in indices if job.results[index] is None]
+                    if not pending:
+                        continue
+                    shard = _Shard(f"{model_config['name']}/{evaluator.benchmark_name}/{number}", job, number, pending)
+                    self.shards[shard.id] = shard
+                    self.queue.append(shard)
+                    costs[shard.id] = expected * len(pending)
+                    job.remaining += 1
+        # Longest expected shards first, so long generations do not trail at the end.
+        self.queue.sort(key=lambda shard: -costs[shard.id])
+        self.model_results = {
+            model_config['name']: [] for model_config in self.config.get('models', [])
+            if any(model == model_config['name'] for model, _ in self.jobs)
+        }
+        logger.info(f"Coordinator: {len(self.queue)} shards of up to {shard_size} samples across {len(self.jobs)} benchmarks.")
+
+    @staticmethod
+    def _warn_unsupported(evaluator):
+        if evaluator.early_stopping_settings().get('enabled'):
+            logger.warning(f"Early stopping is not supported in distributed mode; evaluating all {evaluator.benchmark_name} samples.")
+
+    # --- Leases ----------------------------------------------------------------
+
+    def _expire_leases(self, now):
+        for shard in self.shards.values():
+            if shard.worker is not None and not shard.done and shard.lease_expires < now:
+                logger.warning(f"Lease of shard {shard.id} held by {shard.worker} expired; requeueing it.")
+                shard.worker = None
+                self.queue.insert(0, shard)
+
+    def lease(self, worker):
+        """Returns the next shard for `worker` as a task dict, or None."""
+        now = time.monotonic()
+        self._expire_leases(now)
+        while self.queue:
+            shard = self.queue.pop(0)
+            if shard.done or shard.job.failed:
+                continue
+            shard.worker = worker
+            shard.attempts += 1
+            shard.lease_expires = now + self.settings['lease_seconds']
+            evaluator = shard.job.evaluator
+            return {
+                "shard": shard.id,
+                "model": evaluator.model_config['name'],
+                "benchmark": evaluator.benchmark_name,
+                "indices": shard.indices,
+                "sample_keys": [shard.job.keys[index] for index in shard.indices],
+                "renew_seconds": self.settings['lease_seconds'] / 3,
+            }
+        return None
+
+    def renew(self, worker, shard_id):
+        shard = self.shards.get(shard_id)
+        if shard is None or shard.done or shard.worker != worker:
+            return False
+        shard.lease_expires = time.monotonic() + self.settings['lease_seconds']
+        return True
+
+    def complete(self, worker, shard_id, results, telemetry, state):
+        """
+        Stores the results of a shard leased to `worker`. Results from a worker
+        that no longer holds the shard's lease (it expired, and the shard may have
+        been handed out again) are dropped, and False is returned.
+
+        Raises:
+            UnknownShardError: for an unknown `shard_id`.
+            ValueError: if `results` lack one of the shard's samples.
+        """
+        shard = self.shards.get(shard_id)
+        if shard is None:
+            raise UnknownShardError(f"unknown shard {shard_id!r}")
+        missing = [index for index in shard.indices if not isinstance(results, dict) or str(index) not in results]
+        if missing:
+            raise ValueError(f"results of shard {shard_id} lack samples {missing}")
+        job = shard.job
+        # Requests were made either way, so telemetry and counters always count.
+        job.records.extend(telemetry)
+        job.states[worker] = state
+        if shard.done or job.failed or shard.worker != worker:
+            return False
+        for index in shard.indices:
+            result = results[str(index)]
+            job.results[index] = result
+            if job.checkpoint:
+                job.checkpoint.record(job.keys[index], result)
+        shard.done = True
+        shard.worker = None
+        job.progress.update(len(shard.indices))
+        job.remaining -= 1
+        if job.remaining == 0:
+            self._finish_job(job)
+        return True
+
+    def fail(self, worker, shard_id, error):
+        """
+        Requeues a shard its worker could not evaluate, or fails its benchmark after max_attempts.
+
+        Raises:
+            UnknownShardError: for an unknown `shard_id`.
+        """
+        shard = self.shards.get(shard_id)
+        if shard is None:
+            raise UnknownShardError(f"unknown shard {shard_id!r}")
+        if shard.done or shard.worker != worker:
+            return
+        shard.worker = None
+        logger.warning(f"Shard {shard_id} failed on {worker} (attempt {shard.attempts}): {error}")
+        if shard.attempts < self.settings['max_attempts']:
+            self.queue.append(shard)
+            return
+        job = shard.job
+        logger.error(f"Benchmark {job.name} failed: shard {shard.number} failed {shard.attempts} times.")
+        job.failed = True
+        self._finish_job(job)
+
+    # --- Finishing -------------------------------------------------------------
+
+    def _finish_job(self, job):
+        job.progress.close()
+        if job.checkpoint:
+            job.checkpoint.close()
+        evaluator = job.evaluator
+        model_name = evaluator.model_config['name']
+        result = None
+        if not job.failed:
+            for state in job.states.values():
+                evaluator.merge_shard_state(state)
+            evaluator.telemetry_records = job.records
+            wall_time = time.perf_counter() - self.started
+            result = evaluator.finish_run(job.dataset, job.results, wall_time)
+        job.result = result
+        job.done = True
+        self._maybe_finish_model(model_name)
+
+    def _maybe_finish_model(self, model_name):
+        jobs = [job for (model, _), job in self.jobs.items() if model == model_name]
+        if not all(job.done for job in jobs):
+            return
+        from .report import generate_report
+        results = [job.result for job in jobs if job.result]
+        if results:
+            records = [record for job in jobs for record in job.records]
+            performance = summarize_telemetry(records, time.perf_counter() - self.started)
+            generate_report(results, model_name, performance=performance)
+        else:
+            logger.warning(f"No results were generated for model {model_name}.")
+        self.model_results[model_name] = results
+        if all(job.done for job in self.jobs.values()) and not self.finished.done():
+            self.finished.set_result(None)
+
+    # --- HTTP ------------------------------------------------------------------
+
+    def create_app(self):
+        """Returns the aiohttp application serving the coordinator's endpoints."""
+        from aiohttp import web
+
+        token = self.settings.get('token')
+
+        @web.middleware
+        async def authenticate(request, handler):
+            if token and request.headers.get("Authorization") != f"Bearer {token}":
+                return web.json_response({"error": "unauthorized"}, status=401)
+            return await handler(request)
+
+        def error(exception_class, message):
+            return exception_class(text=json.dumps({"error": message}), content_type="application/json")
+
+        async def body(request, *fields):
+            try:
+                payload = await request.json()
+            except ValueError:
+                raise error(web.HTTPBadRequest, "the request body is not JSON")
+            if not isinstance(payload, dict):
+                raise error(web.HTTPBadRequest, "the request body is not a JSON object")
+            missing = [field for field in ("worker",) + fields if field not in payload]
+            if missing:
+                raise error(web.HTTPBadRequest, f"missing fields: {', '.join(missing)}")
+            self.contacts[payload["worker"]] = time.monotonic()
+            return payload
+
+        async def get_config(request):
+            return web.json_response({"config": self.served_config})
+
+        async def lease(request):
+            payload = await body(request)
+            task = None if self.finished.done() else self.lease(payload["worker"])
+            done = self.finished.done()
+            if done:
+                self.dismissed.add(payload["worker"])
+            return web.json_response({"task": task, "done": done, "retry_after": POLL_INTERVAL})
+
+        async def renew(request):
+            payload = await body(request, "shard")
+            return web.json_response({"ok": self.renew(payload["worker"], payload["shard"])})
+
+        async def complete(request):
+            payload = await body(request, "shard", "results")
+            try:
+                accepted = self.complete(
+                    payload["worker"], payload["shard"], payload["results"],
+                    payload.get("telemetry") or [], payload.get("state") or {},
+                )
+            except UnknownShardError as e:
+                raise error(web.HTTPNotFound, str(e))
+            except ValueError as e:
+                raise error(web.HTTPBadRequest, str(e))
+            return web.json_response({"accepted": accepted})
+
+        async def fail(request):
+            payload = await body(request, "shard")
+            try:
+                self.fail(payload["worker"], payload["shard"], payload.get("error"))
+            except UnknownShardError as e:
+                raise error(web.HTTPNotFound, str(e))
+            return web.json_response({"ok": True})
+
+        app = web.Application(middlewares=[authenticate], client_max_size=256 * 1024 * 1024)
+        app.router.add_get("/config", get_config)
+        app.router.add_post("/lease", lease)
+        app.router.add_post("/renew", renew)
+        app.router.add_post("/complete", complete)
+        app.router.add_post("/fail", fail)
+        return app
+
+    async def serve(self):
+        """
+        Serves shards until every benchmark has finished, starting
+        `local_workers` worker processes on this host.
+
+        Returns:
+            {model name: list of run() results}, as passed to generate_report().
+        """
+        from aiohttp import web
+
+        self.started = time.perf_counter()
+        if not self.jobs:
+            self.finished.set_result(None)
+        for job in list(self.jobs.values()):
+            # Every sample already has a checkpointed result.
+            if job.remaining == 0:
+                self._finish_job(job)
+        if self.finished.done():
+            return self.model_results
+        runner = web.AppRunner(self.create_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.settings['host'], self.settings['port'])
+        await site.start()
+        port = runner.addresses[0][1]
+        local_host = "127.0.0.1" if self.settings['host'] in ("0.0.0.0", "::", "") else self.settings['host']
+        url = f"http://{local_host}:{port}"
+        logger.info(f"Coordinator listening on http://{self.settings['host']}:{port}")
+
+        processes = [
+            await spawn_local_worker(url, f"local-{i}", self.settings.get('token'), self.config_path)
+            for i in range(self.local_workers)
+        ]
+        try:
+            while not self.finished.done():
+                await asyncio.wait([self.finished], timeout=POLL_INTERVAL)
+                self._expire_leases(time.monotonic())
+                if processes and all(p.returncode is not None for p in processes) and not self._remote_workers_active():
+                    raise RuntimeError("All local workers exited before the run finished.")
+            # Let workers ask once more, so they learn that the run is over.
+            deadline = time.monotonic() + 5 * POLL_INTERVAL
+            while set(self.contacts) - self.dismissed and time.monotonic() < deadline:
+                await asyncio.sleep(POLL_INTERVAL / 10)
+        finally:
+            for process in processes:
+                if process.returncode is None:
+                    try:
+                        await asyncio.wait_for(process.wait(), timeout=10)
+                    except asyncio.TimeoutError:
+                        process.terminate()
+                        await process.wait()
+            for job in self.jobs.values():
+                if not job.done:
+                    job.progress.close()
+                    if job.checkpoint:
+                        job.checkpoint.close()
+            await runner.cleanup()
+        return self.model_results
+
+    def _remote_workers_active(self):
+        recent = time.monotonic() - self.settings['lease_seconds']
+        return any(seen > recent for name, seen in self.contacts.items() if not str(name).startswith("local-"))
+
+async def spawn_local_worker(url, name, token=None, config_path=None):
+    """
+    Starts `python -m llm_benchmark.distributed` as a worker of the coordinator
+    at `url`, reading API keys from `config_path` if given.
+    """
+    command = [sys.executable, "-m", "llm_benchmark.distributed", "--coordinator", url, "--name", name]
+    if config_path:
+        command += ["--config", os.path.abspath(config_path)]
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    if token:
+        env["BENCHMARK_WORKER_TOKEN"] = token
+    return await asyncio.create_subprocess_exec(*command, env=env)
+
+# --- Worker ------------------------------------------------------------------
+
+async def evaluate_shard(evaluator, dataset, indices):
+    """Evaluates the samples at `indices` with the benchmark's concurrency; returns {index: result}."""
+    results = {}
+    pending = iter(indices)
+
+    async def worker():
+        for index in pending:
+            results[index] = await evaluator.evaluate_sample(dataset[index], index)
+
+    num_workers = max(1, min(evaluator.get_concurrency(), len(indices)))
+    await asyncio.gather(*(worker() for _ in range(num_workers)))
+    return results
+
+class Worker:
+    """
+    Evaluates shards leased from a coordinator until it reports that the run is
+    over. Evaluators are created on first use of each (model, benchmark) and
+    kept, with their data, prompts and sandbox pools, for later shards.
+    """
+
+    def __init__(self, url, name=None, token=None, slots=None, config_path=None):
+        self.url = url.rstrip("/")
+        self.config_path = config_path
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.token = token
+        self.slots = slots
+        self.evaluators = {}
+        self._locks = {}
+        self._sent_records = {}
+        self._session = None
+
+    async def _post(self, path, payload):
+        data = json.dumps(dict(payload, worker=self.name), ensure_ascii=False, default=str)
+        async with self._session.post(self.url + path, data=data, headers={"Content-Type": "application/json"}) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def run(self):
+        import aiohttp
+        from .registry import import_evaluator_modules
+        from .utils import set_global_request_limit
+
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        self._session = aiohttp.ClientSession(headers=headers)
+        try:
+            async with self._session.get(self.url + "/config") as response:
+                response.raise_for_status()
+                self.config = (await response.json())["config"]
+            apply_credentials(self.config, local_models(self.config_path))
+            eval_config = self.config.get('evaluation', {})
+            import_evaluator_modules(eval_config.get('evaluator_modules'))
+            set_global_request_limit(eval_config.get('max_in_flight'))
+            slots = self.slots or distributed_settings(eval_config)['slots']
+            logger.info(f"Worker {self.name} connected to {self.url} ({slots} slots)")
+            await asyncio.gather(*(self._slot() for _ in range(max(1, int(slots)))))
+        finally:
+            await self.close()
+
+    async def _slot(self):
+        while True:
+            reply = await self._post("/lease", {})
+            task = reply.get("task")
+            if task is None:
+                if reply.get("done"):
+                    return
+                await asyncio.sleep(reply.get("retry_after", POLL_INTERVAL))
+                continue
+            await self._run_task(task)
+
+    async def _run_task(self, task):
+        renewal = asyncio.ensure_future(self._renew(task))
+        try:
+            evaluator, dataset = await self._evaluator(task["model"], task["benchmark"])
+            for index, key in zip(task["indices"], task["sample_keys"]):
+                if sample_key(dataset[index]) != key:
+                    raise ValueError(f"sample {index} differs from the coordinator's; is the same dataset revision loaded?")
+            results = await evaluate_shard(evaluator, dataset, task["indices"])
+        except Exception as e:
+            logger.error(f"Shard {task['shard']} failed: {e}")
+            await self._post("/fail", {"shard": task["shard"], "error": repr(e)})
+            return
+        finally:
+            renewal.cancel()
+        key = (task["model"], task["benchmark"])
+        records = evaluator.telemetry_records
+        sent, self._sent_records[key] = self._sent_records.get(key, 0), len(records)
+        await self._post("/complete", {
+            "shard": task["shard"],
+            "results": {str(index): result for index, result in results.items()},
+            "telemetry": records[sent:],
+            "state": evaluator.shard_state(),
+        })
+
+    async def _renew(self, task):
+        while True:
+            await asyncio.sleep(task["renew_seconds"])
+            try:
+                await self._post("/renew", {"shard": task["shard"]})
+            except Exception as e:
+                logger.warning(f"Could not renew the lease of shard {task['shard']}: {e}")
+
+    async def _evaluator(self, model_name, benchmark_name):
+        key = (model_name, benchmark_name)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key not in self.evaluators:
+                from .registry import get_evaluator_class
+                model_config = next(m for m in self.config.get('models', []) if m['name'] == model_name)
+                evaluator = get_evaluator_class(benchmark_name)(model_config, self.config.get('evaluation', {}))
+                dataset = evaluator.prepare_data()
+                # Each model formats and counts the prompts of its own shards, so
+                # that the coordinator can add up the counters of all workers.
+                evaluator._formatted_prompts = {}
+                evaluator.prompt_stats = {name: 0 for name in evaluator.prompt_stats}
+                evaluator.count_prompt_tokens(dataset)
+                await evaluator.setup()
+                self.evaluators[key] = (evaluator, dataset)
+        return self.evaluators[key]
+
+    async def close(self):
+        from .utils import close_clients
+        from .cache import close_response_caches
+        from .benchmark import clear_shared_data
+
+        for evaluator, _ in self.evaluators.values():
+            await evaluator.teardown()
+        self.evaluators.clear()
+        clear_shared_data()
+        await close_clients()
+        close_response_caches()
+        if self._session is not None:
+            await self._session.close()
+
+async def run_worker(url, name=None, token=None, slots=None, config_path=None):
+    """
+    Runs a worker of the coordinator at `url` until the run is over. API keys
+    come from the config file at `config_path`, if it exists, or the environment.
+    """
+    await Worker(url, name, token or os.environ.get("BENCHMARK_WORKER_TOKEN"), slots, config_path).run()
+
+def parse_args(argv=None):
+    """Parses the command line of `python -m llm_benchmark.distributed`."""
+    parser = argparse.ArgumentParser(description="Evaluate shards leased from a benchmark coordinator.")
+    parser.add_argument("--coordinator", required=True, help="Coordinator URL, e.g. http://10.0.0.5:8765.")
+    parser.add_argument("--name", help="Worker name shown in the coordinator's logs. Defaults to host:pid.")
+    parser.add_argument("--token", help="Shared secret; defaults to $BENCHMARK_WORKER_TOKEN.")
+    parser.add_argument("--slots", type=int, help="Shards evaluated at once (default: the coordinator's `slots`).")
+    parser.add_argument("--config", help="Config file to read API keys from; otherwise they come from the environment.")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    asyncio.run(run_worker(args.coordinator, args.name, args.token, args.slots, args.config))
@@ -1,8 +1,9 @@
 import re
-import random
-from datasets import load_dataset
 from ..benchmark import BenchmarkEvaluator
+from ..registry import register_evaluator
+from ..utils import load_dataset
 
+@register_evaluator("gsm8k")
 class GSM8KEvaluator(BenchmarkEvaluator):
     """
     Evaluator for the GSM8K (Grade School Math 8K) benchmark.
@@ -10,6 +11,10 @@ class GSM8KEvaluator(BenchmarkEvaluator):
     It uses chain-of-thought prompting for best results.
     """
 
+    typical_completion_tokens = 200
+
+    dataset_path = "gsm8k"
+
     @property
     def benchmark_name(self):
         return "gsm8k"
@@ -18,29 +23,39 @@ class GSM8KEvaluator(BenchmarkEvaluator):
         """
         Loads the GSM8K dataset.
         """
-        dataset = load_dataset("gsm8k", "main")
-        self.few_shot_data = list(dataset['train'])
+        dataset = load_dataset(self.dataset_path, "main", revision=self.dataset_revision)
+        # Both splits stay Arrow-backed; few-shot rows are fetched by index when drawn.
+        self.few_shot_data = dataset['train']
         # Using the full test set as is standard for GSM8K.
-        return list(dataset['test'])
+        return dataset['test']
 
     def format_prompt(self, sample):
         """
         Formats a few-shot, chain-of-thought prompt for the GSM8K task.
         """
-        k_shot = self.benchmark_config.get(self.benchmark_name, {}).get("k_shot", 8)
+        k_shot = self.benchmark_params.get("k_shot", 8)
+        return self.build_prompt(sample, k_shot)
 
-        few_shot_examples = random.sample(self.few_shot_data, k_shot)
+    def few_shot_header(self):
+        return "The following are grade school math questions. Please solve them step-by-step.\n\n"
 
-        prompt = "The following are grade school math questions. Please solve them step-by-step.\n\n"
+    def format_example(self, example):
+        return f"Question: {example['question']}\nAnswer:\n{example['answer']}\n\n"
 
-        for ex in few_shot_examples:
-            prompt += f"Question: {ex['question']}\n"
-            prompt += f"Answer:\n{ex['answer']}\n\n"
+    def format_query(self, sample):
+        return f"Question: {sample['question']}\nAnswer:\n"
 
-        prompt += f"Question: {sample['question']}\n"
-        prompt += "Answer:\n"
+    @staticmethod
+    def parse_ground_truth(answer):
+        """Returns the number after '####' in a GSM8K answer, or None."""
+        try:
+            return float(answer.split('####')[-1].strip().replace(',', ''))
+        except (ValueError, IndexError):
+            return None
 
-        return [{"role": "user", "content": prompt}]
+    def preprocess(self, dataset):
+        """Adds `answer_value`, the parsed ground-truth number of each test question."""
+        return dataset.map(lambda sample: {"answer_value": self.parse_ground_truth(sample['answer'])})
 
     def process_response(self, response, sample):
         """
@@ -48,11 +63,9 @@ class GSM8KEvaluator(BenchmarkEvaluator):
         The ground truth answer is in the format "#### <number>".
         We need to extract the number from both the model's response and the ground truth.
         """
-        # Extract ground truth answer
-        try:
-            true_answer_str = sample['answer'].split('####')[-1].strip()
-            true_answer = float(true_answer_str.replace(',', ''))
-        except (ValueError, IndexError):
+        # Ground truth parsed once by preprocess(), or here for unprepared samples
+        true_answer = sample['answer_value'] if 'answer_value' in sample else self.parse_ground_truth(sample['answer'])
+        if true_answer is None:
             return {"correct": False, "error": "Could not parse ground truth answer."}
 
         # Extract model's final answer
@@ -80,3 +93,8 @@ class GSM8KEvaluator(BenchmarkEvaluator):
             "parsed_answer": model_answer,
             "correct_answer": true_answer
         }
+
+    def answer_key(self, response, sample):
+        """The number process_response() parses from the response, on which self-consistency chains vote."""
+        parsed = self.process_response(response, sample).get("parsed_answer")
+        return parsed if isinstance(parsed, float) else None
@@ -1,7 +1,11 @@
+import asyncio
 import multiprocessing
 import random
-from datasets import load_dataset
 from ..benchmark import BenchmarkEvaluator
+from ..registry import register_evaluator
+from ..sandbox import SandboxPool
+from ..utils import call_api_n, load_dataset
+from ..results_store import prompt_hash
 
 # It's crucial to run untrusted code in a separate process.
 # This function will be the target for the multiprocessing.Process.
@@ -13,25 +17,75 @@ def execute_code(code_to_run, result_queue):
     except Exception:
         result_queue.put(False)
 
+def estimate_pass_at_k(n, c, k):
+    """
+    Unbiased estimator of pass@k from n samples of which c passed:
+    1 - C(n - c, k) / C(n, k), computed as a running product for numerical stability.
+    """
+    if n - c < k:
+        return 1.0
+    product = 1.0
+    for i in range(n - c + 1, n + 1):
+        product *= 1.0 - k / i
+    return 1.0 - product
+
+@register_evaluator("humaneval")
 class HumanEvalEvaluator(BenchmarkEvaluator):
     """
     Evaluator for the HumanEval benchmark.
     This benchmark tests the ability of a model to generate functional code.
     """
 
+    typical_completion_tokens = 150
+
+    dataset_path = "openai_humaneval"
+
     @property
     def benchmark_name(self):
         return "humaneval"
 
+    def __init__(self, model_config, benchmark_config):
+        super().__init__(model_config, benchmark_config)
+        self.sandbox = None
+        # Sandbox counters of distributed workers, merged by the coordinator.
+        self.sandbox_stats = {"programs_run": 0, "programs_per_sec": 0.0}
+
+    async def setup(self):
+        """
+        Starts a pool of sandbox workers, so generated programs execute
+        concurrently with outstanding API calls.
+        """
+        params = self.benchmark_params
+        self.sandbox = SandboxPool(
+            size=params.get('pool_size', 4),
+            timeout=params.get('timeout', 10.0),
+            memory_limit_mb=params.get('memory_limit_mb', 1024),
+        )
+        await self.sandbox.start()
+
+    async def teardown(self):
+        await self.sandbox.close()
+
+    def shard_state(self):
+        """Adds the sandbox pool's counters; workers run in parallel, so their throughputs add up."""
+        state = super().shard_state()
+        state["sandbox_stats"] = self.sandbox.stats() if self.sandbox else dict(self.sandbox_stats)
+        return state
+
+    def merge_shard_state(self, state):
+        super().merge_shard_state(state)
+        for key, value in (state.get("sandbox_stats") or {}).items():
+            self.sandbox_stats[key] += value
+
     def load_data(self):
         """
         Loads the HumanEval dataset.
         """
         # For HumanEval, we evaluate on the entire test set as is standard.
         # It's small enough (164 problems).
-        dataset = load_dataset("openai_humaneval", split="test")
+        dataset = load_dataset(self.dataset_path, split="test", revision=self.dataset_revision)
         # Using the full test set as is standard for HumanEval.
-        return list(dataset)
+        return dataset
 
 
     def format_prompt(self, sample):
@@ -41,9 +95,9 @@ class HumanEvalEvaluator(BenchmarkEvaluator):
         """
         return [{"role": "user", "content": sample['prompt']}]
 
-    def process_response(self, response, sample):
+    def build_program(self, response, sample):
         """
-        Processes the model's response by executing it against the test cases.
+        Combines the prompt, the model's completion and the test cases into one program.
         """
         # The model should generate the body of the function.
         # We combine the prompt (which includes the function signature) with the response.
@@ -53,14 +107,36 @@ class HumanEvalEvaluator(BenchmarkEvaluator):
         # The entry_point tells us the function name to use in the tests.
         test_code = sample['test'] + f"\n\ncheck({sample['entry_point']})"
 
-        code_to_run = full_code + "\n\n" + test_code
+        return full_code + "\n\n" + test_code
+
+    async def aprocess_response(self, response, sample):
+        """
+        Executes the completion in the sandbox pool without blocking the event loop.
+        """
+        is_correct, error = await self.sandbox.run(self.build_program(response, sample))
+        if error is None and not is_correct:
+            error = "Failed Execution"
+
+        return {
+            "correct": is_correct,
+            "model_answer_full": response,
+            "error": error
+        }
+
+    def process_response(self, response, sample):
+        """
+        Processes the model's response by executing it against the test cases.
+        This synchronous path runs the program in a one-off process; run() uses
+        the sandbox pool through aprocess_response instead.
+        """
+        code_to_run = self.build_program(response, sample)
 
         result_queue = multiprocessing.Queue()
         process = multiprocessing.Process(target=execute_code, args=(code_to_run, result_queue))
 
         process.start()
         # A timeout is critical to handle code that might hang.
-        process.join(timeout=10.0)
+        process.join(timeout=self.benchmark_params.get('timeout', 10.0))
 
         if process.is_alive():
             process.terminate()
@@ -81,10 +157,106 @@ class HumanEvalEvaluator(BenchmarkEvaluator):
             "error": error
         }
 
+    def expected_completion_tokens(self):
+        """In pass@k mode, every problem draws num_samples completions."""
+        return super().expected_completion_tokens() * self.num_samples
+
+    @property
+    def num_samples(self):
+        """Completions drawn per problem; values above 1 enable pass@k sampling."""
+        return max(1, int(self.benchmark_params.get('num_samples', 1)))
+
+    async def evaluate_sample(self, sample, index=None):
+        """
+        In pass@k mode, draws `num_samples` completions for the problem and executes
+        each distinct completion once, in parallel.
+        """
+        if self.num_samples == 1:
+            return await super().evaluate_sample(sample, index)
+
+        telemetry = {}
+        messages = self.get_prompt(sample, index)
+        completions = await call_api_n(
+            model_config=self.model_config,
+            messages=messages,
+            n=self.num_samples,
+            max_tokens=self.api_params.get('max_tokens', 1024),
+            temperature=self.benchmark_params.get('sampling_temperature', 0.8),
+            cache=self.response_cache,
+            stats=telemetry,
+        )
+        self.telemetry_records.append(telemetry)
+        if not completions:
+            return {
+                "correct": False,
+                "error": "API call failed",
+                "n": 0,
+                "num_correct": 0,
+                "unique_completions": 0,
+                "prompt_hash": prompt_hash(messages),
+                "telemetry": telemetry,
+            }
+
+        # Identical completions produce identical programs; run each one only once.
+        unique_completions = list(dict.fromkeys(completions))
+        outcomes = await asyncio.gather(*(self.aprocess_response(c, sample) for c in unique_completions))
+        result = self._sampling_result(completions, unique_completions, outcomes)
+        result["prompt_hash"] = prompt_hash(messages)
+        result["telemetry"] = telemetry
+        return result
+
+    @staticmethod
+    def _sampling_result(completions, unique_completions, outcomes):
+        """Builds the pass@k result of a problem from the outcome of each distinct completion."""
+        passed = {c: outcome['correct'] for c, outcome in zip(unique_completions, outcomes)}
+        return {
+            # The first completion alone is an unbiased draw for pass@1.
+            "correct": passed[completions[0]],
+            "n": len(completions),
+            "num_correct": sum(1 for c in completions if passed[c]),
+            "unique_completions": len(unique_completions),
+            "responses": completions,
+        }
+
+    def rescore_sample(self, stored, sample):
+        """Re-executes stored completions; in pass@k mode, every distinct one of them."""
+        completions = stored.get("responses")
+        if not completions:
+            return super().rescore_sample(stored, sample)
+        unique_completions = list(dict.fromkeys(completions))
+        outcomes = [self.process_response(c, sample) for c in unique_completions]
+        return self._sampling_result(completions, unique_completions, outcomes)
+
+    def summary_metrics(self, results):
+        """Reports pass@k (in sampling mode) and sandbox throughput for the run."""
+        metrics = super().summary_metrics(results)
+        if self.num_samples > 1:
+            sampled = [r for r in results if r.get("n")]
+            min_n = min((r["n"] for r in sampled), default=0)
+            for k in self.benchmark_params.get('pass_at_k', [1, 10, 100]):
+                if k <= min_n:
+                    metrics[f"pass@{k}"] = self._mean_pass_at_k(results, k)
+            total_drawn = sum(r.get("n", 0) for r in results)
+            executed = sum(r.get("unique_completions", 0) for r in results)
+            metrics["Completions Drawn"] = total_drawn
+            metrics["Duplicate Completions Skipped"] = total_drawn - executed
+        stats = self.sandbox.stats() if self.sandbox else self.sandbox_stats
+        metrics["Programs Executed"] = stats['programs_run']
+        metrics["Sandbox Throughput (programs/sec)"] = stats['programs_per_sec']
+        return metrics
+
+    def _mean_pass_at_k(self, results, k):
+        # Problems whose requests failed count as unsolved.
+        estimates = [estimate_pass_at_k(r["n"], r["num_correct"], k) if r.get("n") else 0.0 for r in results]
+        return sum(estimates) / len(estimates) if estimates else 0.0
+
     def aggregate_results(self, results):
         """
-        Calculates the pass@1 score.
+        Calculates the pass@1 score. In pass@k mode this is the unbiased
+        estimate over all completions drawn per problem.
         """
+        if self.num_samples > 1:
+            return self._mean_pass_at_k(results, 1)
         passed_count = sum(1 for r in results if r.get("correct", False))
         total_count = len(results)
         return passed_count / total_count if total_count > 0 else 0.0
@@ -1,14 +1,45 @@
-import re
-import random
-from datasets import load_dataset
+import asyncio
+import logging
+import multiprocessing
 from ..benchmark import BenchmarkEvaluator
+from ..registry import register_evaluator
+from ..utils import load_dataset
+from ..sandbox import SandboxPool, SandboxWorker
+from ..math_answers import (
+    last_boxed_content,
+    normalize_answer,
+    strings_equivalent,
+    symbolic_equal,
+)
 
+logger = logging.getLogger(__name__)
+
+# Symbolic check outcomes by (normalized answer, normalized truth), shared by all
+# models in the process.
+_symbolic_memo = {}
+
+@register_evaluator("math")
 class MATHEvaluator(BenchmarkEvaluator):
     """
     Evaluator for the MATH (Mathematical Problem Solving) benchmark.
     This is a challenging benchmark requiring deep mathematical reasoning.
     """
 
+    typical_completion_tokens = 600
+
+    dataset_path = "nlile/hendrycks-MATH-benchmark"
+
+    shard_counters = BenchmarkEvaluator.shard_counters + ("symbolic_checks",)
+
+    def __init__(self, model_config, benchmark_config):
+        super().__init__(model_config, benchmark_config)
+        self.symbolic_checks = {"checks": 0, "memo_hits": 0, "matches": 0, "timeouts": 0}
+        self._pending_checks = {}
+        self._symbolic_enabled = None
+        self.symbolic_pool = None
+        # Started on first use by process_response, which runs outside the event loop.
+        self._symbolic_worker = None
+
     @property
     def benchmark_name(self):
         return "math"
@@ -19,7 +50,7 @@ class MATHEvaluator(BenchmarkEvaluator):
         This version only has a 'train' split, so we create our own test set
         by splitting the data.
         """
-        dataset = load_dataset("nlile/hendrycks-MATH-benchmark", split="train")
+        dataset = load_dataset(self.dataset_path, split="train", revision=self.dataset_revision)
 
         # Shuffle the dataset
         shuffled_dataset = dataset.shuffle(seed=42)
@@ -28,36 +59,81 @@ class MATHEvaluator(BenchmarkEvaluator):
         # Let's use 500 samples for the test set.
         test_size = 500
 
-        self.few_shot_data = list(shuffled_dataset.select(range(test_size, len(shuffled_dataset))))
+        # select() only builds an index mapping over the Arrow table; no rows are copied.
+        self.few_shot_data = shuffled_dataset.select(range(test_size, len(shuffled_dataset)))
         test_dataset = shuffled_dataset.select(range(test_size))
 
-        return list(test_dataset)
+        return test_dataset
 
     def format_prompt(self, sample):
         """
         Formats a few-shot, chain-of-thought prompt for the MATH task.
         """
-        k_shot = self.benchmark_config.get(self.benchmark_name, {}).get("k_shot", 4)
+        k_shot = self.benchmark_params.get("k_shot", 4)
+        return self.build_prompt(sample, k_shot)
 
-        few_shot_examples = random.sample(self.few_shot_data, k_shot)
+    def few_shot_header(self):
+        return "The following are challenging math problems. Please solve them step-by-step, and put the final answer in a box like \\boxed{answer}.\n\n"
 
-        prompt = "The following are challenging math problems. Please solve them step-by-step, and put the final answer in a box like \\boxed{answer}.\n\n"
+    def format_example(self, example):
+        return f"Problem: {example['problem']}\nSolution:\n{example['solution']}\n\n"
 
-        for ex in few_shot_examples:
-            prompt += f"Problem: {ex['problem']}\n"
-            prompt += f"Solution:\n{ex['solution']}\n\n"
+    def format_query(self, sample):
+        return f"Problem: {sample['problem']}\nSolution:\n"
 
-        prompt += f"Problem: {sample['problem']}\n"
-        prompt += "Solution:\n"
+    def preprocess(self, dataset):
+        """Adds `reference_answer`, the boxed answer extracted from each reference solution."""
+        return dataset.map(lambda sample: {"reference_answer": self.extract_boxed_answer(sample['solution'])})
 
-        return [{"role": "user", "content": prompt}]
+    async def setup(self):
+        """
+        With `symbolic: true`, starts the pool of worker processes in which
+        answers that fail string comparison are checked with SymPy.
+        """
+        if not self.symbolic_enabled:
+            return
+        params = self.benchmark_params
+        self.symbolic_pool = SandboxPool(
+            size=params.get('symbolic_pool_size', 2),
+            timeout=params.get('symbolic_timeout', 5.0),
+            memory_limit_mb=params.get('symbolic_memory_limit_mb', 2048),
+        )
+        await self.symbolic_pool.start()
 
-    def process_response(self, response, sample):
+    async def teardown(self):
+        if self.symbolic_pool is not None:
+            await self.symbolic_pool.close()
+            self.symbolic_pool = None
+        if self._symbolic_worker is not None:
+            self._symbolic_worker.close()
+            self._symbolic_worker = None
+
+    @property
+    def symbolic_enabled(self):
+        """Whether the SymPy equivalence check is configured and SymPy is installed."""
+        if self._symbolic_enabled is None:
+            self._symbolic_enabled = bool(self.benchmark_params.get('symbolic', False))
+            if self._symbolic_enabled:
+                try:
+                    import sympy  # noqa: F401
+                except ImportError:
+                    logger.warning("math.symbolic is enabled but SymPy is not installed; using string comparison only.")
+                    self._symbolic_enabled = False
+        return self._symbolic_enabled
+
+    def score_answer(self, response, sample):
         """
-        Processes the model's response to extract the final answer from a \\boxed{} block.
+        Extracts and normalizes both answers and compares them as strings.
+
+        Returns:
+            A result dict. Its 'correct' is the cheap comparison only; a result with
+            'needs_symbolic_check' still has to be checked symbolically.
         """
         # Extract ground truth answer
-        true_answer = self.extract_boxed_answer(sample['solution'])
+        if 'reference_answer' in sample:
+            true_answer = sample['reference_answer']
+        else:
+            true_answer = self.extract_boxed_answer(sample['solution'])
         if true_answer is None:
             return {"correct": False, "error": "Could not parse ground truth answer."}
 
@@ -66,30 +142,129 @@ class MATHEvaluator(BenchmarkEvaluator):
         if model_answer is None:
             return {"correct": False, "parsed_answer": "N/A"}
 
-        # For now, we do a simple string comparison after some normalization.
-        # A more advanced system would use a symbolic math library.
-        is_correct = self.is_equiv(model_answer, true_answer)
+        normalized_model = normalize_answer(model_answer)
+        normalized_truth = normalize_answer(true_answer)
+        is_correct = strings_equivalent(normalized_model, normalized_truth)
 
-        return {
+        result = {
             "correct": is_correct,
             "model_answer_full": response,
             "parsed_answer": model_answer,
-            "correct_answer": true_answer
+            "correct_answer": true_answer,
         }
+        if not is_correct:
+            result["needs_symbolic_check"] = (normalized_model, normalized_truth)
+        return result
+
+    def answer_key(self, response, sample):
+        """
+        The normalized boxed answer, on which self-consistency chains vote.
+        Answers equal only symbolically (e.g. 0.5 and \\frac{1}{2}) vote separately.
+        """
+        model_answer = self.extract_boxed_answer(response)
+        return None if model_answer is None else normalize_answer(model_answer)
+
+    def _apply_symbolic_result(self, result, key, equal, timed_out=False):
+        result.pop("needs_symbolic_check")
+        if timed_out:
+            self.symbolic_checks["timeouts"] += 1
+        else:
+            # Timeouts are not memoized: the same pair may finish on a less loaded worker.
+            _symbolic_memo[key] = equal
+        if equal:
+            self.symbolic_checks["matches"] += 1
+            result["correct"] = True
+            result["equivalence"] = "symbolic"
+        return result
+
+    def process_response(self, response, sample):
+        """
+        Processes the model's response to extract the final answer from a \\boxed{} block.
+        Used when rescoring; the symbolic check, if enabled, runs in a sandbox
+        process of its own.
+        """
+        result = self.score_answer(response, sample)
+        key = result.get("needs_symbolic_check")
+        if key is None:
+            return result
+        if not self.symbolic_enabled:
+            result.pop("needs_symbolic_check")
+            return result
+        if key in _symbolic_memo:
+            return self._apply_symbolic_result(result, key, _symbolic_memo[key])
+        equal, error = self._symbolic_check_in_sandbox(key)
+        return self._apply_symbolic_result(result, key, bool(equal) and error is None, timed_out=error == "Timeout")
+
+    def _symbolic_check_in_sandbox(self, key):
+        """
+        Runs symbolic_equal in a sandbox worker, blocking, under the same timeout
+        and memory limit as the pool. The worker is replaced after a timeout,
+        crash or exception, like the pool's.
+
+        Returns:
+            An (equal, error) tuple, as SandboxPool.call.
+        """
+        params = self.benchmark_params
+        if self._symbolic_worker is None:
+            self._symbolic_worker = SandboxWorker(
+                multiprocessing.get_context("spawn"),
+                params.get('symbolic_memory_limit_mb', 2048),
+                cpu_limit=params.get('symbolic_timeout', 5.0) + 1,
+            )
+        worker = self._symbolic_worker
+        equal, error = worker.execute((symbolic_equal, key), params.get('symbolic_timeout', 5.0))
+        if error is not None or not worker.clean:
+            worker.kill()
+            self._symbolic_worker = None
+        return equal, error
+
+    async def aprocess_response(self, response, sample):
+        """
+        Scores the response; pairs that fail string comparison are checked in the
+        SymPy worker pool, once per distinct (answer, truth) pair.
+        """
+        result = self.score_answer(response, sample)
+        key = result.get("needs_symbolic_check")
+        if key is None:
+            return result
+        if not self.symbolic_enabled:
+            result.pop("needs_symbolic_check")
+            return result
+        if key in _symbolic_memo:
+            self.symbolic_checks["memo_hits"] += 1
+            return self._apply_symbolic_result(result, key, _symbolic_memo[key])
+
+        # Concurrent samples with the same pair wait for the check already in flight.
+        pending = self._pending_checks.get(key)
+        if pending is None:
+            self.symbolic_checks["checks"] += 1
+            pending = asyncio.ensure_future(self.symbolic_pool.call(symbolic_equal, *key))
+            self._pending_checks[key] = pending
+        else:
+            self.symbolic_checks["memo_hits"] += 1
+        try:
+            equal, error = await pending
+        finally:
+            self._pending_checks.pop(key, None)
+        return self._apply_symbolic_result(result, key, bool(equal) and error is None, timed_out=error == "Timeout")
+
+    def summary_metrics(self, results):
+        """Reports how often the symbolic check ran and how many answers it rescued."""
+        metrics = super().summary_metrics(results)
+        if self.symbolic_enabled:
+            metrics["Symbolic Checks"] = self.symbolic_checks["checks"]
+            metrics["Symbolic Memo Hits"] = self.symbolic_checks["memo_hits"]
+            metrics["Symbolic Matches"] = self.symbolic_checks["matches"]
+            metrics["Symbolic Timeouts"] = self.symbolic_checks["timeouts"]
+        return metrics
 
     def extract_boxed_answer(self, text):
-        """Extracts the content from the last \\boxed{} block in the text."""
-        matches = re.findall(r'\\boxed\{(.+?)\}', text)
-        if matches:
-            return matches[-1]
-        return None
+        """Extracts the content from the last \\boxed{} block in the text, keeping nested braces."""
+        return last_boxed_content(text)
 
     def is_equiv(self, str1, str2):
         """
-        A simplified check for equivalence between two answers.
-        This removes spaces and commas. A more robust solution is much more complex.
+        Cheap equivalence check between two answers: equal after LaTeX normalization,
+        or equal as numbers. See score_answer() for the symbolic fallback.
         """
-        def normalize(s):
-            return s.replace(" ", "").replace(",", "")
-
-        return normalize(str1) == normalize(str2)
+        return strings_equivalent(normalize_answer(str1), normalize_answer(str2))
@@ -1,57 +1,329 @@
 import random
-from datasets import load_dataset
+import logging
 from ..benchmark import BenchmarkEvaluator
+from ..registry import register_evaluator
+from ..utils import load_dataset
+from ..logprobs import call_api_logprobs, CompletionsBatcher
+from ..results_store import prompt_hash
+from ..stats import grouped_accuracy, wilson_interval
 
+logger = logging.getLogger(__name__)
+
+# The four top-level categories of the MMLU paper, by subject.
+CATEGORY_SUBJECTS = {
+    "STEM": (
+        "abstract_algebra", "astronomy", "college_biology", "college_chemistry", "college_computer_science",
+        "college_mathematics", "college_physics", "computer_security", "conceptual_physics",
+        "electrical_engineering", "elementary_mathematics", "high_school_biology", "high_school_chemistry",
+        "high_school_computer_science", "high_school_mathematics", "high_school_physics",
+        "high_school_statistics", "machine_learning",
+    ),
+    "Humanities": (
+        "formal_logic", "high_school_european_history", "high_school_us_history", "high_school_world_history",
+        "international_law", "jurisprudence", "logical_fallacies", "moral_disputes", "moral_scenarios",
+        "philosophy", "prehistory", "professional_law", "world_religions",
+    ),
+    "Social Sciences": (
+        "econometrics", "high_school_geography", "high_school_government_and_politics",
+        "high_school_macroeconomics", "high_school_microeconomics", "high_school_psychology",
+        "human_sexuality", "professional_psychology", "public_relations", "security_studies", "sociology",
+        "us_foreign_policy",
+    ),
+    "Other": (
+        "anatomy", "business_ethics", "clinical_knowledge", "college_medicine", "global_facts", "human_aging",
+        "management", "marketing", "medical_genetics", "miscellaneous", "nutrition", "professional_accounting",
+        "professional_medicine", "virology",
+    ),
+}
+SUBJECT_CATEGORY = {subject: category for category, subjects in CATEGORY_SUBJECTS.items() for subject in subjects}
+
+# Failed requests after which a logprob path that has not yet returned logprobs
+# in this run is taken to be unsupported by the endpoint.
+UNSUPPORTED_AFTER_FAILURES = 5
+
+@register_evaluator("mmlu")
 class MMLUEvaluator(BenchmarkEvaluator):
     """
     Evaluator for the MMLU (Massive Multitask Language Understanding) benchmark.
     """
 
+    _dev_by_subject = None
+
+    # A short reply ending in the answer letter.
+    typical_completion_tokens = 16
+
+    dataset_path = "cais/mmlu"
+
+    shard_counters = BenchmarkEvaluator.shard_counters + ("scoring_counts",)
+
+    def __init__(self, model_config, benchmark_config):
+        super().__init__(model_config, benchmark_config)
+        self.scoring_counts = {"logprobs": 0, "fallbacks": 0, "failed_requests": 0, "batches": 0}
+        self._logprob_paths = None
+        self._logprob_failures = {}
+        self._working_paths = set()
+        self._batcher = None
+
     @property
     def benchmark_name(self):
         return "mmlu"
 
     def load_data(self):
         """
-        Loads the MMLU dataset. For demonstration, we'll use a small subset.
-        In a real scenario, you might want to use the full 'all' split.
+        Loads the MMLU test split and selects the questions to evaluate.
+
+        `mmlu.sampling` picks them: 'random' (the default) draws `sample_size`
+        questions, 'stratified' draws `sample_size` questions spread over the
+        subjects in proportion to their size (at least one each), and 'full'
+        evaluates the whole test split. Draws are seeded, so that a resumed run
+        evaluates the same questions.
         """
-        # Using the 'all' configuration and then slicing for manageability
-        # The 'auxiliary_train' split is smaller and good for creating few-shot examples.
-        self.few_shot_data = list(load_dataset("cais/mmlu", "all", split="auxiliary_train"))
+        # The 'auxiliary_train' split is the few-shot pool unless examples are drawn per subject.
+        # Kept Arrow-backed: only the rows drawn as few-shot examples become Python dicts.
+        self.few_shot_data = load_dataset(self.dataset_path, "all", split="auxiliary_train", revision=self.dataset_revision)
 
         # Using the 'test' split for actual evaluation
-        dataset = load_dataset("cais/mmlu", "all", split="test")
-        # Using 200 samples for a more comprehensive but still manageable test run.
-        return random.sample(list(dataset), 200)
+        dataset = load_dataset(self.dataset_path, "all", split="test", revision=self.dataset_revision)
+        if self.few_shot_settings().get('mode') == 'per_subject':
+            self.dev_data = load_dataset(self.dataset_path, "all", split="dev", revision=self.dataset_revision)
+        params = self.benchmark_params
+        sampling = params.get('sampling', 'random')
+        sample_size = params.get('sample_size', 200)
+        rng = random.Random(params.get('seed', 42))
+        # Indices are drawn instead of rows, so the test split is never materialized.
+        if sampling == 'full' or sample_size >= len(dataset):
+            return dataset
+        if sampling == 'stratified':
+            return dataset.select(self._stratified_indices(dataset, sample_size, rng))
+        return dataset.select(rng.sample(range(len(dataset)), sample_size))
+
+    def data_params(self):
+        """The question draw, and whether the per-subject dev split is part of the data."""
+        params = self.benchmark_params
+        return {
+            "sampling": params.get('sampling', 'random'),
+            "sample_size": params.get('sample_size', 200),
+            "seed": params.get('seed', 42),
+            "dev_split": self.few_shot_settings().get('mode') == 'per_subject',
+        }
+
+    @staticmethod
+    def _stratified_indices(dataset, sample_size, rng):
+        """
+        Draws about `sample_size` indices, allocated to subjects in proportion to
+        their size. Indices are returned in dataset order, which keeps each
+        subject's questions (and so their shared few-shot prefix) together.
+        """
+        # Group once by reading only the subject column.
+        by_subject = {}
+        for index, subject in enumerate(dataset['subject']):
+            by_subject.setdefault(subject, []).append(index)
+        total = len(dataset)
+        selected = []
+        for subject in sorted(by_subject):
+            indices = by_subject[subject]
+            quota = min(len(indices), max(1, round(sample_size * len(indices) / total)))
+            selected.extend(rng.sample(indices, quota))
+        return sorted(selected)
+
+    def few_shot_settings(self):
+        """
+        As configured, except that evaluating the full or stratified set uses one
+        fixed set of `dev` examples per subject, the standard MMLU setup, unless
+        `mmlu.few_shot.mode` says otherwise.
+        """
+        settings = super().few_shot_settings()
+        if self.benchmark_params.get('sampling', 'random') in ('full', 'stratified'):
+            if 'mode' not in (self.benchmark_params.get('few_shot') or {}):
+                settings['mode'] = 'per_subject'
+            settings.setdefault('seed', self.benchmark_params.get('seed', 42))
+        return settings
 
     def format_prompt(self, sample):
         """
         Formats a few-shot prompt for the MMLU task.
         """
-        k_shot = self.benchmark_config.get(self.benchmark_name, {}).get("k_shot", 5)
+        k_shot = self.benchmark_params.get("k_shot", 5)
+        return self.build_prompt(sample, k_shot)
 
-        # Get k-shot examples from the auxiliary train set
-        few_shot_examples = random.sample(self.few_shot_data, k_shot)
+    def few_shot_header(self):
+        return "The following are multiple choice questions (with answers).\n\n"
 
-        prompt = "The following are multiple choice questions (with answers).\n\n"
+    def format_example(self, example):
+        return self._format_single_question(example, with_answer=True)
 
-        for ex in few_shot_examples:
-            prompt += self._format_single_question(ex, with_answer=True)
+    def format_query(self, sample):
+        return self._format_single_question(sample, with_answer=False)
 
-        prompt += self._format_single_question(sample, with_answer=False)
+    def few_shot_pool(self, group=None):
+        """
+        The auxiliary train set by default; in 'per_subject' mode, the subject's
+        questions from the `dev` split, which exists for exactly this purpose.
+        """
+        if group is None:
+            return self.few_shot_data
+        if self._dev_by_subject is None:
+            if getattr(self, 'dev_data', None) is None:
+                self.dev_data = load_dataset(self.dataset_path, "all", split="dev", revision=self.dataset_revision)
+            self._dev_by_subject = {}
+            # Group once by reading only the subject column.
+            for index, subject in enumerate(self.dev_data['subject']):
+                self._dev_by_subject.setdefault(subject, []).append(index)
+        indices = self._dev_by_subject.get(group)
+        if not indices:
+            return self.few_shot_data
+        return self.dev_data.select(indices)
 
-        return [{"role": "user", "content": prompt}]
+    def prompt_group(self, sample):
+        return sample['subject']
 
     def _format_single_question(self, sample, with_answer=True):
-        question = f"{sample['question']}\n"
-        choices = sample['choices']
-        for i, choice in enumerate(choices):
-            question += f"{chr(65 + i)}. {choice}\n"
-        question += "Answer:"
+        parts = [f"{sample['question']}\n"]
+        for i, choice in enumerate(sample['choices']):
+            parts.append(f"{chr(65 + i)}. {choice}\n")
+        parts.append("Answer:")
         if with_answer:
-            question += f" {chr(65 + sample['answer'])}\n\n"
-        return question
+            parts.append(f" {chr(65 + sample['answer'])}\n\n")
+        return "".join(parts)
+
+    def expected_completion_tokens(self):
+        """Logprob scoring requests a single token."""
+        if self.logprob_paths():
+            return 1
+        return super().expected_completion_tokens()
+
+    def logprob_paths(self):
+        """
+        The logprob scoring paths still usable in this run, in order of preference:
+        batched legacy completions (if `completions_batch` is set), then chat
+        completions. Empty unless `mmlu.scoring` is "logprobs" and the model does
+        not set `supports_logprobs: false`.
+        """
+        if self._logprob_paths is None:
+            paths = []
+            if self.benchmark_params.get('scoring', 'generate') == 'logprobs' and self.model_config.get('supports_logprobs', True):
+                if self.model_config.get('completions_batch'):
+                    paths.append("completions")
+                paths.append("chat")
+            self._logprob_paths = paths
+        return self._logprob_paths
+
+    async def _choice_logprobs(self, path, prompt_messages, candidates, telemetry):
+        if path == "chat":
+            return await call_api_logprobs(
+                self.model_config, prompt_messages, candidates, cache=self.response_cache, stats=telemetry
+            )
+        if self._batcher is None:
+            self._batcher = CompletionsBatcher(
+                self.model_config, batch_size=self.model_config['completions_batch'], cache=self.response_cache
+            )
+        prompt = "\n\n".join(m['content'] for m in prompt_messages)
+        return await self._batcher.score(prompt, candidates, stats=telemetry)
+
+    async def evaluate_sample(self, sample, index=None):
+        """
+        In logprobs mode, scores the sample from the next-token logprobs of the
+        answer letters with a single one-token request, falling back to generation.
+
+        A failed request (or one without logprobs) falls back for that sample
+        only; a path is dropped for the rest of the run only if it looks
+        unsupported (see _logprob_request_failed). A sample whose top tokens
+        contain no answer letter is generated.
+        """
+        if self.benchmark_params.get('scoring', 'generate') != 'logprobs':
+            return await super().evaluate_sample(sample, index)
+
+        prompt_messages = self.get_prompt(sample, index)
+        candidates = [chr(65 + i) for i in range(len(sample['choices']))]
+        for path in list(self.logprob_paths()):
+            telemetry = {}
+            scores = await self._choice_logprobs(path, prompt_messages, candidates, telemetry)
+            self.telemetry_records.append(telemetry)
+            if scores is None:
+                self._logprob_request_failed(path)
+                continue
+            self._working_paths.add(path)
+            if not scores:
+                break
+            self.scoring_counts["logprobs"] += 1
+            result = self.score_choices(scores, sample)
+            result["prompt_hash"] = prompt_hash(prompt_messages)
+            result["telemetry"] = telemetry
+            return result
+
+        self.scoring_counts["fallbacks"] += 1
+        return await super().evaluate_sample(sample, index)
+
+    def _logprob_request_failed(self, path):
+        """
+        Counts a failed logprob request. A path that has returned logprobs in this
+        run is kept, so a transient error only costs that sample its logprob
+        score; one whose first UNSUPPORTED_AFTER_FAILURES requests all failed is
+        dropped, so an endpoint without logprobs is not asked for every sample.
+        """
+        self.scoring_counts["failed_requests"] += 1
+        if path in self._working_paths or path not in self._logprob_paths:
+            return
+        self._logprob_failures[path] = self._logprob_failures.get(path, 0) + 1
+        if self._logprob_failures[path] >= UNSUPPORTED_AFTER_FAILURES:
+            self._logprob_paths.remove(path)
+            logger.warning(f"Logprob scoring via the {path} endpoint is unavailable for {self.model_config['name']}; falling back.")
+
+    def score_choices(self, scores, sample):
+        """Picks the answer letter with the highest logprob and checks it."""
+        parsed_answer = max(scores, key=scores.get)
+        correct_answer_char = chr(65 + sample['answer'])
+        return {
+            "correct": parsed_answer == correct_answer_char,
+            "parsed_answer": parsed_answer,
+            "correct_answer": correct_answer_char,
+            "scoring": "logprobs",
+            "choice_logprobs": scores,
+            "response": parsed_answer,
+        }
+
+    def rescore_sample(self, stored, sample):
+        """Logprob-scored results are re-scored from their stored letter logprobs."""
+        if stored.get("scoring") == "logprobs" and stored.get("choice_logprobs"):
+            return self.score_choices(stored["choice_logprobs"], sample)
+        return super().rescore_sample(stored, sample)
+
+    def breakdowns(self, dataset, results):
+        """Accuracy with Wilson 95% confidence intervals per category and per subject."""
+        subjects = dataset['subject']
+        categories = [SUBJECT_CATEGORY.get(subject, "Other") for subject in subjects]
+        return {
+            "Category": grouped_accuracy(categories, results),
+            "Subject": grouped_accuracy(subjects, results),
+        }
+
+    def shard_state(self):
+        """Counts the completions batches this process sent as scoring counters."""
+        state = super().shard_state()
+        if self._batcher is not None:
+            state["scoring_counts"]["batches"] += self._batcher.batches_sent
+        return state
+
+    def summary_metrics(self, results):
+        """
+        Adds the sampling mode and a Wilson 95% confidence interval for the score,
+        and how many samples were scored from logprobs and how many by generation.
+        """
+        metrics = super().summary_metrics(results)
+        correct = sum(1 for r in results if r.get("correct", False))
+        low, high = wilson_interval(correct, len(results))
+        metrics["Sampling"] = self.benchmark_params.get('sampling', 'random')
+        metrics["Score 95% CI"] = f"{low:.4f} - {high:.4f}"
+        if self.benchmark_params.get('scoring', 'generate') == 'logprobs':
+            metrics["Scoring"] = "logprobs"
+            metrics["Logprob-scored Samples"] = self.scoring_counts["logprobs"]
+            metrics["Generation Fallbacks"] = self.scoring_counts["fallbacks"]
+            if self.scoring_counts["failed_requests"]:
+                metrics["Failed Logprob Requests"] = self.scoring_counts["failed_requests"]
+            batches = self.scoring_counts["batches"] + (self._batcher.batches_sent if self._batcher is not None else 0)
+            if batches:
+                metrics["Completions Batches"] = batches
+        return metrics
 
     def process_response(self, response, sample):
         """
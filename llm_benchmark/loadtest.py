@@ -0,0 +1,224 @@
+import time
+import random
+import asyncio
+import logging
+from .utils import get_client, _stream_chat_completion
+from .telemetry import percentile
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the `loadtest:` section of config.yaml.
+DEFAULT_LOADTEST_SETTINGS = {
+    "mode": "poisson",
+    "rates": [1, 2, 4, 8, 16],
+    "concurrency_levels": [1, 2, 4, 8, 16, 32],
+    "step_duration": 30.0,
+    "corpus_size": 200,
+    "latency_factor": 2.0,
+    "max_error_rate": 0.05,
+    "seed": 0,
+}
+
+def build_prompt_corpus(evaluators, corpus_size):
+    """
+    Collects realistic prompts from the evaluators' own format_prompt() output.
+
+    Up to `corpus_size` prompts are taken in total, interleaving benchmarks so
+    that every step of a load test sees the same mix.
+
+    Args:
+        evaluators (list): BenchmarkEvaluator instances to draw prompts from.
+        corpus_size (int): Maximum number of prompts to collect.
+
+    Returns:
+        A list of chat message lists.
+    """
+    per_benchmark = []
+    for evaluator in evaluators:
+        dataset = evaluator.prepare_data()
+        limit = min(len(dataset), corpus_size)
+        prompts = [evaluator.get_prompt(dataset[index], index) for index in range(limit)]
+        logger.info(f"Load-test corpus: {len(prompts)} prompts from {evaluator.benchmark_name}")
+        per_benchmark.append(prompts)
+
+    corpus = []
+    for position in range(max((len(p) for p in per_benchmark), default=0)):
+        for prompts in per_benchmark:
+            if position < len(prompts):
+                corpus.append(prompts[position])
+    return corpus[:corpus_size]
+
+async def send_request(model_config, messages, max_tokens, temperature):
+    """
+    Sends one request straight to the endpoint, without the limiter, the global
+    in-flight cap or retries, so the measured latency and error rate are the
+    endpoint's own.
+
+    Returns:
+        A record dict with 'ok', 'latency', optional 'ttft' (streaming only),
+        'completion_tokens' and, on failure, 'error'.
+    """
+    client = get_client(model_config)
+    record = {"ok": False}
+    start = time.perf_counter()
+    try:
+        if model_config.get('stream', False):
+            response = await _stream_chat_completion(
+                client, model_config, messages, start, record, max_tokens=max_tokens, temperature=temperature
+            )
+        else:
+            response = await client.chat.completions.create(
+                model=model_config['model_name'],
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+            )
+        record["ok"] = True
+        usage = getattr(response, 'usage', None)
+        record["completion_tokens"] = usage.completion_tokens if usage is not None else 0
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {getattr(e, 'status_code', '') or e}"
+    record["latency"] = time.perf_counter() - start
+    return record
+
+async def run_poisson_step(model_config, corpus, rate, duration, max_tokens, temperature, rng):
+    """
+    Open-loop step: requests arrive as a Poisson process at `rate` per second for
+    `duration` seconds, whether or not earlier requests have completed.
+
+    Returns:
+        (records, elapsed) where elapsed runs until the last request finished.
+    """
+    tasks = []
+    start = time.perf_counter()
+    next_arrival = start
+    while True:
+        next_arrival += rng.expovariate(rate)
+        if next_arrival - start >= duration:
+            break
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        messages = corpus[len(tasks) % len(corpus)]
+        tasks.append(asyncio.create_task(send_request(model_config, messages, max_tokens, temperature)))
+    records = await asyncio.gather(*tasks)
+    return records, time.perf_counter() - start
+
+async def run_concurrency_step(model_config, corpus, concurrency, duration, max_tokens, temperature):
+    """
+    Closed-loop step: `concurrency` workers each send their next request as soon
+    as the previous one completes, for `duration` seconds.
+
+    Returns:
+        (records, elapsed) where elapsed runs until the last request finished.
+    """
+    records = []
+    start = time.perf_counter()
+    counter = iter(range(10 ** 12))
+
+    async def worker():
+        while time.perf_counter() - start < duration:
+            messages = corpus[next(counter) % len(corpus)]
+            records.append(await send_request(model_config, messages, max_tokens, temperature))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return records, time.perf_counter() - start
+
+def summarize_step(load, records, elapsed):
+    """Aggregates one step's records into throughput, error rate and latency percentiles."""
+    succeeded = [r for r in records if r["ok"]]
+    latencies = [r["latency"] for r in succeeded]
+    ttfts = [r["ttft"] for r in succeeded if r.get("ttft") is not None]
+    completion_tokens = sum(r.get("completion_tokens") or 0 for r in succeeded)
+    errors = {}
+    for r in records:
+        if not r["ok"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    summary = {
+        "load": load,
+        "requests": len(records),
+        "errors": len(records) - len(succeeded),
+        "error_rate": (len(records) - len(succeeded)) / len(records) if records else 0.0,
+        "throughput": len(succeeded) / elapsed if elapsed else 0.0,
+        "tokens_per_sec": completion_tokens / elapsed if elapsed else 0.0,
+        "error_types": errors,
+    }
+    for q in (50, 95, 99):
+        summary[f"latency_p{q}"] = percentile(latencies, q)
+    summary["ttft_p50"] = percentile(ttfts, 50)
+    summary["ttft_p95"] = percentile(ttfts, 95)
+    return summary
+
+def find_knee(steps, latency_factor=2.0, max_error_rate=0.05):
+    """
+    Finds the first step at which the endpoint is saturated.
+
+    A step is saturated when its p95 latency exceeds `latency_factor` times the
+    lowest p95 of the lighter steps, when its error rate exceeds `max_error_rate`,
+    or when it no longer delivers more throughput than the previous step.
+
+    Returns:
+        (index, reason) of the first saturated step, or (None, None) if every
+        step was healthy.
+    """
+    baseline = None
+    for index, step in enumerate(steps):
+        if step["error_rate"] > max_error_rate:
+            return index, f"error rate {step['error_rate']:.1%} > {max_error_rate:.1%}"
+        p95 = step["latency_p95"]
+        if baseline and p95 is not None and p95 > latency_factor * baseline:
+            return index, f"p95 latency {p95:.2f}s > {latency_factor:g}x baseline ({baseline:.2f}s)"
+        if index > 0 and step["throughput"] <= steps[index - 1]["throughput"] * 1.05:
+            return index, "throughput stopped increasing"
+        # The first step's p95 can include connection warm-up; track the best seen so far.
+        if p95 is not None:
+            baseline = p95 if baseline is None else min(baseline, p95)
+    return None, None
+
+async def run_load_test(model_config, corpus, settings, max_tokens, temperature):
+    """
+    Runs every step of a load test against one model and locates the knee.
+
+    Args:
+        model_config (dict): The model to drive.
+        corpus (list): Prompts to replay, as returned by build_prompt_corpus().
+        settings (dict): The `loadtest:` settings merged over DEFAULT_LOADTEST_SETTINGS.
+        max_tokens (int): max_tokens for every request.
+        temperature (float): Sampling temperature for every request.
+
+    Returns:
+        A dict with the mode, per-step summaries and the knee, for generate_loadtest_report().
+    """
+    mode = settings['mode']
+    if mode not in ("poisson", "concurrency"):
+        raise ValueError(f"Unknown load-test mode '{mode}'. Expected 'poisson' or 'concurrency'.")
+    if not corpus:
+        raise ValueError("The load-test prompt corpus is empty.")
+    levels = settings['rates'] if mode == "poisson" else settings['concurrency_levels']
+    duration = float(settings['step_duration'])
+    rng = random.Random(settings.get('seed'))
+
+    steps = []
+    for level in levels:
+        unit = "req/s" if mode == "poisson" else "concurrent"
+        logger.info(f"Load test {model_config['name']}: {level} {unit} for {duration:g}s")
+        if mode == "poisson":
+            records, elapsed = await run_poisson_step(model_config, corpus, float(level), duration, max_tokens, temperature, rng)
+        else:
+            records, elapsed = await run_concurrency_step(model_config, corpus, int(level), duration, max_tokens, temperature)
+        step = summarize_step(level, records, elapsed)
+        steps.append(step)
+        p95 = f"{step['latency_p95']:.2f}s" if step['latency_p95'] is not None else "-"
+        logger.info(
+            f"  {step['requests']} requests, {step['throughput']:.2f} req/s, "
+            f"p95 {p95}, errors {step['error_rate']:.1%}"
+        )
+
+    knee, reason = find_knee(steps, float(settings['latency_factor']), float(settings['max_error_rate']))
+    if knee is None:
+        logger.info("No saturation point found within the tested range.")
+    else:
+        logger.info(f"Saturation at step {knee + 1} ({steps[knee]['load']}): {reason}")
+    return {"mode": mode, "step_duration": duration, "steps": steps, "knee": knee, "knee_reason": reason}
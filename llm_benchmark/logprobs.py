@@ -0,0 +1,187 @@
+import asyncio
+import logging
+from .utils import _create_chat_completion, _create_completion
+
+logger = logging.getLogger(__name__)
+
+# Alternatives requested per position; the OpenAI API allows up to 20 for chat
+# completions and 5 for legacy completions.
+CHAT_TOP_LOGPROBS = 20
+COMPLETIONS_TOP_LOGPROBS = 5
+
+def best_choice(top_logprobs, candidates):
+    """
+    Returns {candidate: logprob} for every candidate found among the alternatives
+    for the first generated token. Tokens are matched after stripping whitespace,
+    so " A" and "A" both count as "A"; the best logprob per candidate is kept.
+
+    Args:
+        top_logprobs (iterable): (token, logprob) pairs.
+        candidates (iterable): Answer strings such as "A".."D".
+    """
+    wanted = set(candidates)
+    scores = {}
+    for token, logprob in top_logprobs:
+        key = token.strip()
+        if key in wanted and logprob > scores.get(key, float('-inf')):
+            scores[key] = logprob
+    return scores
+
+def _chat_top_logprobs(response):
+    """Extracts (token, logprob) pairs for the first token of a chat completion, or None."""
+    try:
+        content = response.choices[0].logprobs.content
+    except (AttributeError, IndexError, TypeError):
+        return None
+    if not content:
+        return None
+    return [(alt.token, alt.logprob) for alt in content[0].top_logprobs or []]
+
+def _completion_top_logprobs(choice):
+    """Extracts (token, logprob) pairs for the first token of a legacy completion choice, or None."""
+    logprobs = getattr(choice, 'logprobs', None)
+    top = getattr(logprobs, 'top_logprobs', None) if logprobs is not None else None
+    if not top:
+        return None
+    return list(top[0].items())
+
+def split_evenly(total, parts):
+    """
+    Splits the integer `total` into `parts` integers that differ by at most one
+    and add up to `total` (largest-remainder apportioning with equal weights).
+    """
+    share, remainder = divmod(total, parts)
+    return [share + 1 if position < remainder else share for position in range(parts)]
+
+async def call_api_logprobs(model_config, messages, candidates, cache=None, stats=None):
+    """
+    Scores answer candidates with a single one-token chat completion request
+    carrying `logprobs`/`top_logprobs`.
+
+    Returns:
+        {candidate: logprob} for the candidates among the top alternatives (possibly
+        empty), or None if the request failed or the endpoint returned no logprobs.
+    """
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(model_config, messages, {"max_tokens": 1, "temperature": 0.0, "top_logprobs": CHAT_TOP_LOGPROBS})
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if stats is not None:
+                stats['cached'] = True
+            return cached
+
+    response = await _create_chat_completion(
+        model_config,
+        messages,
+        stats=stats,
+        max_tokens=1,
+        temperature=0.0,
+        logprobs=True,
+        top_logprobs=CHAT_TOP_LOGPROBS,
+    )
+    if response is None:
+        return None
+    top = _chat_top_logprobs(response)
+    if top is None:
+        return None
+    scores = best_choice(top, candidates)
+    if cache is not None:
+        cache.put(cache_key, scores)
+    return scores
+
+class CompletionsBatcher:
+    """
+    Packs concurrent one-token scoring requests into batched calls to the legacy
+    completions endpoint, which accepts a list of prompts.
+
+    Callers await score(); a batch is sent once `batch_size` prompts are waiting
+    or `max_wait` seconds after the first one arrived, whichever comes first.
+    """
+
+    def __init__(self, model_config, batch_size=8, max_wait=0.05, cache=None):
+        self.model_config = model_config
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max_wait
+        self.cache = cache
+        self.batches_sent = 0
+        self._waiting = []
+        self._flush_handle = None
+
+    async def score(self, prompt, candidates, stats=None):
+        """
+        Returns {candidate: logprob} for one prompt, or None if its batch failed
+        or the endpoint returned no logprobs.
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(
+                self.model_config, prompt, {"max_tokens": 1, "temperature": 0.0, "logprobs": COMPLETIONS_TOP_LOGPROBS}
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if stats is not None:
+                    stats['cached'] = True
+                return cached
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append((prompt, future))
+        if len(self._waiting) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+        top, batch_stats = await future
+        if stats is not None:
+            stats.update(batch_stats)
+        if top is None:
+            return None
+        scores = best_choice(top, candidates)
+        if self.cache is not None:
+            self.cache.put(cache_key, scores)
+        return scores
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._waiting = self._waiting[:self.batch_size], self._waiting[self.batch_size:]
+        if self._waiting:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        if batch:
+            asyncio.ensure_future(self._send(batch))
+
+    async def _send(self, batch):
+        prompts = [prompt for prompt, _ in batch]
+        stats = {}
+        try:
+            response = await _create_completion(
+                self.model_config,
+                prompts,
+                stats=stats,
+                max_tokens=1,
+                temperature=0.0,
+                logprobs=COMPLETIONS_TOP_LOGPROBS,
+            )
+        except Exception as e:
+            logger.warning(f"Batched completions request for {self.model_config['name']} failed: {e}")
+            response = None
+        self.batches_sent += 1
+
+        # Each sample is charged an equal share of the batch's tokens, in whole
+        # tokens that add up to the batch's usage.
+        shares = {
+            key: split_evenly(int(stats[key]), len(batch))
+            for key in ('prompt_tokens', 'completion_tokens')
+            if stats.get(key) is not None
+        }
+
+        choices = {}
+        if response is not None:
+            for choice in response.choices:
+                choices[choice.index] = _completion_top_logprobs(choice)
+        for position, (_, future) in enumerate(batch):
+            if not future.done():
+                sample_stats = dict(stats, batch_size=len(batch))
+                sample_stats.update((key, split[position]) for key, split in shares.items())
+                future.set_result((choices.get(position), sample_stats))
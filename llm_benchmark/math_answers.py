@@ -0,0 +1,248 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# All patterns are compiled once at import; normalization runs for every response.
+_BOXED = re.compile(r'\\(?:boxed|fbox)(?![a-zA-Z])')
+_LEFT_RIGHT = re.compile(r'\\(?:left|right)(?:\.|(?![a-zA-Z]))')
+_SPACING = re.compile(r'\\[,;:! ]|\\(?:quad|qquad|displaystyle)(?![a-zA-Z])')
+_DEGREES = re.compile(r'\^\s*\{?\s*\\circ\s*\}?')
+_TEXT_ONLY = re.compile(r'^\\(?:text|textbf|mbox|mathrm)\{([^{}]*)\}$')
+_TRAILING_UNIT = re.compile(r'(?<=[\d}])\s*\\(?:text|mbox|mathrm)\{\s*[a-zA-Z][a-zA-Z\s.^0-9]*\}$')
+_TEXT_WRAPPER = re.compile(r'\\(?:text|textbf|mbox|mathrm)\{([^{}]*)\}')
+_FRAC_SHORTHAND = re.compile(r'\\frac(\d)(\d)|\\frac(\d)(?=\{)|\\frac(\{[^{}]*\})(\d)')
+_SQRT_SHORTHAND = re.compile(r'\\sqrt(\w)')
+_SIMPLE_SLASH = re.compile(r'^(-?\d+)/(\d+)$')
+_LEADING_VARIABLE = re.compile(r'^[a-zA-Z]\w?\s*=\s*')
+_THOUSANDS = re.compile(r'(?<=\d),(?=\d{3}(?!\d))')
+_LEADING_POINT = re.compile(r'(?<![\d.])\.(?=\d)')
+_NUMBER = re.compile(r'^-?\d+(?:\.\d+)?$')
+
+def last_boxed_content(text):
+    """
+    Returns the content of the last \\boxed{...} (or \\fbox{...}) in `text`,
+    matching braces so nested groups such as \\boxed{\\frac{1}{2}} are kept whole.
+    Also accepts the brace-less form `\\boxed 5`. Returns None if there is no
+    box or its braces are unbalanced.
+    """
+    last = None
+    for last in _BOXED.finditer(text):
+        pass
+    if last is None:
+        return None
+    position = last.end()
+    length = len(text)
+    while position < length and text[position] == ' ':
+        position += 1
+    if position == length:
+        return None
+    if text[position] != '{':
+        # `\boxed 5`: the argument runs to the next space or math delimiter.
+        end = position
+        while end < length and text[end] not in ' $\n':
+            end += 1
+        return text[position:end]
+
+    depth = 0
+    start = position + 1
+    while position < length:
+        char = text[position]
+        if char == '\\':
+            # Skip escaped characters, so \{ and \} do not count as braces.
+            position += 2
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:position]
+        position += 1
+    return None
+
+def _expand_frac_shorthand(match):
+    if match.group(1) is not None:
+        return f"\\frac{{{match.group(1)}}}{{{match.group(2)}}}"
+    if match.group(3) is not None:
+        return f"\\frac{{{match.group(3)}}}"
+    return f"\\frac{match.group(4)}{{{match.group(5)}}}"
+
+def normalize_answer(answer):
+    """
+    Canonicalizes a LaTeX answer for string comparison: drops \\left/\\right,
+    spacing commands, dollar signs, degrees, percent signs and trailing units;
+    unifies \\dfrac/\\tfrac and shorthand such as \\frac12 or \\sqrt2; rewrites
+    simple a/b as a fraction; removes a leading `x =`; and strips whitespace.
+    """
+    s = answer.strip()
+    s = s.replace("\n", "").replace("\\$", "").replace("$", "")
+    s = s.replace("\\dfrac", "\\frac").replace("\\tfrac", "\\frac")
+    s = _LEFT_RIGHT.sub("", s)
+    s = _SPACING.sub("", s)
+    s = _DEGREES.sub("", s)
+    s = s.replace("\\%", "").replace("%", "")
+
+    text_only = _TEXT_ONLY.match(s.strip())
+    if text_only:
+        s = text_only.group(1)
+    s = _TRAILING_UNIT.sub("", s.strip())
+    s = _TEXT_WRAPPER.sub(r"\1", s)
+
+    s = _LEADING_VARIABLE.sub("", s)
+    s = s.replace(" ", "")
+    s = _FRAC_SHORTHAND.sub(_expand_frac_shorthand, s)
+    s = _SQRT_SHORTHAND.sub(r"\\sqrt{\1}", s)
+    s = _THOUSANDS.sub("", s)
+    s = _LEADING_POINT.sub("0.", s)
+    s = s.rstrip(".")
+
+    slash = _SIMPLE_SLASH.match(s)
+    if slash:
+        s = f"\\frac{{{slash.group(1)}}}{{{slash.group(2)}}}"
+    return s
+
+def strings_equivalent(normalized_a, normalized_b):
+    """Cheap equivalence of two normalized answers: identical text, or equal numbers."""
+    if normalized_a == normalized_b:
+        return True
+    if _NUMBER.match(normalized_a) and _NUMBER.match(normalized_b):
+        return abs(float(normalized_a) - float(normalized_b)) < 1e-9
+    return False
+
+# --- Symbolic equivalence (optional, needs SymPy) ---------------------------
+
+_INNER_FRAC = re.compile(r'\\frac\{([^{}]*)\}\{([^{}]*)\}')
+_INNER_SQRT = re.compile(r'\\sqrt\{([^{}]*)\}')
+_INNER_ROOT = re.compile(r'\\sqrt\[([^\[\]]*)\]\{([^{}]*)\}')
+_EXPRESSION_CHARACTERS = re.compile(r'^[0-9a-zA-Z+\-*/^(). ]*$')
+_ATTRIBUTE_ACCESS = re.compile(r'[a-zA-Z_)\]]\s*\.')
+_IDENTIFIER = re.compile(r'[a-zA-Z]+')
+_COMMANDS = {
+    "\\pi": "pi",
+    "\\cdot": "*",
+    "\\times": "*",
+    "\\infty": "oo",
+    "\\ln": "log",
+    "\\log": "log",
+    "\\sin": "sin",
+    "\\cos": "cos",
+    "\\tan": "tan",
+}
+
+# The only names the converter produces. Everything else is a one-letter variable.
+_FUNCTIONS = ("sqrt",) + tuple(sorted({name for name in _COMMANDS.values() if name.isalpha()}))
+
+def _parse_namespace():
+    """
+    The globals parse_expr evaluates answers in: the functions and constants
+    above and the number and symbol classes its transformations emit, without
+    builtins. parse_expr calls eval(), which would otherwise give a model's
+    answer access to exec, __import__ and every SymPy name.
+    """
+    import sympy
+
+    namespace = {name: getattr(sympy, name) for name in _FUNCTIONS + ("Symbol", "Integer", "Rational", "Float")}
+    namespace["__builtins__"] = {}
+    return namespace
+
+def latex_to_sympy(normalized):
+    """
+    Parses a normalized LaTeX answer into a SymPy expression, or returns None
+    when it uses constructs the converter does not handle.
+
+    Answers are untrusted model output: besides arithmetic, only one-letter
+    variables and the names in _FUNCTIONS are accepted, and they are evaluated
+    in _parse_namespace(). SymPy's parser is still not a sandbox, so this only
+    runs in sandbox processes (see MATHEvaluator).
+    """
+    from sympy.parsing.sympy_parser import (
+        parse_expr,
+        standard_transformations,
+        implicit_multiplication_application,
+        convert_xor,
+    )
+
+    # Rewrite innermost groups first, so nesting such as \frac{\sqrt{3}}{2} resolves outward.
+    s = normalized
+    while True:
+        rewritten = _INNER_ROOT.sub(r"((\2)**(1/(\1)))", s)
+        rewritten = _INNER_SQRT.sub(r"sqrt(\1)", rewritten)
+        rewritten = _INNER_FRAC.sub(r"((\1)/(\2))", rewritten)
+        if rewritten == s:
+            break
+        s = rewritten
+    for command, replacement in _COMMANDS.items():
+        s = s.replace(command, replacement)
+    if "\\" in s:
+        return None
+    s = s.replace("{", "(").replace("}", ")")
+    if not _EXPRESSION_CHARACTERS.match(s) or _ATTRIBUTE_ACCESS.search(s):
+        return None
+    if any(len(name) > 1 and name not in _FUNCTIONS for name in _IDENTIFIER.findall(s)):
+        return None
+    transformations = standard_transformations + (implicit_multiplication_application, convert_xor)
+    try:
+        return parse_expr(s, local_dict={}, global_dict=_parse_namespace(), transformations=transformations, evaluate=True)
+    except Exception:
+        return None
+
+def _split_top_level(s):
+    """Splits a comma-separated tuple or list of answers, ignoring commas inside brackets."""
+    parts, depth, current = [], 0, []
+    for char in s:
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return parts
+
+def _enclosing_brackets(s):
+    """The opening and closing bracket of a tuple or interval such as (1,2] ('' when absent)."""
+    opening = s[:1] if s[:1] in ("(", "[") else ""
+    closing = s[-1:] if s[-1:] in (")", "]") else ""
+    return opening, closing
+
+def _tuple_parts(s, brackets):
+    opening, closing = brackets
+    return _split_top_level(s[len(opening):len(s) - len(closing)])
+
+def symbolic_equal(normalized_a, normalized_b):
+    """
+    Returns True if two normalized answers are mathematically equal according to
+    SymPy. Tuples and intervals are compared element-wise and only when their
+    brackets match, so [1,2] differs from (1,2). Any parse or simplification
+    failure counts as not equal.
+    """
+    import sympy
+
+    if "," in normalized_a or "," in normalized_b:
+        brackets = _enclosing_brackets(normalized_a)
+        if brackets != _enclosing_brackets(normalized_b):
+            return False
+        parts_a = _tuple_parts(normalized_a, brackets)
+        parts_b = _tuple_parts(normalized_b, brackets)
+    else:
+        parts_a, parts_b = [normalized_a], [normalized_b]
+    if len(parts_a) != len(parts_b):
+        return False
+    for part_a, part_b in zip(parts_a, parts_b):
+        expr_a = latex_to_sympy(part_a)
+        expr_b = latex_to_sympy(part_b)
+        if expr_a is None or expr_b is None:
+            return False
+        if expr_a == expr_b:
+            # Also covers infinite endpoints, whose difference is undefined.
+            continue
+        try:
+            if sympy.simplify(expr_a - expr_b) != 0:
+                return False
+        except Exception:
+            return False
+    return True
@@ -0,0 +1,339 @@
+import re
+import json
+import math
+import time
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+def _completion_payload(model, content, prompt_tokens=0, completion_tokens=0):
+    """Builds a response body in the shape of the OpenAI chat completions API."""
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+def _chunk_payload(completion_id, model, delta=None, finish_reason=None, usage=None):
+    """Builds one `chat.completion.chunk` event of a streamed response."""
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [{"index": 0, "delta": delta or {}, "finish_reason": finish_reason}],
+        "usage": usage,
+    }
+
+def _top_logprobs(answer, count):
+    """Alternatives for the first answer token: the answer itself is the most likely, other letters trail off."""
+    first = answer.strip()[:1] or " "
+    alternatives = [(f" {first}", -0.05)]
+    for letter in "ABCDEFGHIJ":
+        if letter != first and len(alternatives) < count:
+            alternatives.append((f" {letter}", -3.0 - len(alternatives)))
+    return alternatives[:max(1, count)]
+
+def _chat_logprobs(answer, count):
+    """The `logprobs` field of a chat completion choice, covering the first token only."""
+    top = [{"token": token, "logprob": logprob, "bytes": None} for token, logprob in _top_logprobs(answer, count)]
+    return {"content": [dict(top[0], top_logprobs=top)]}
+
+def _text_completion_payload(model, prompts, answer, logprobs=None):
+    """Builds a legacy `text_completion` response with one choice per prompt."""
+    choices = []
+    for index in range(len(prompts)):
+        choice = {"index": index, "text": answer, "finish_reason": "stop", "logprobs": None}
+        if logprobs:
+            top = _top_logprobs(answer, logprobs)
+            choice["text"] = top[0][0]
+            choice["logprobs"] = {
+                "tokens": [top[0][0]],
+                "token_logprobs": [top[0][1]],
+                "top_logprobs": [dict(top)],
+                "text_offset": [0],
+            }
+        choices.append(choice)
+    prompt_tokens = sum(len(p) for p in prompts) // 4
+    completion_tokens = len(prompts)
+    return {
+        "id": f"cmpl-{uuid.uuid4().hex}",
+        "object": "text_completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": choices,
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+async def _stream_completion(request, model, content, usage, include_usage, token_interval):
+    """Writes `content` as server-sent events, a few characters per chunk."""
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    async def send(payload):
+        await response.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    await send(_chunk_payload(completion_id, model, delta={"role": "assistant", "content": ""}))
+    for start in range(0, len(content), 4):
+        if token_interval:
+            await asyncio.sleep(token_interval)
+        await send(_chunk_payload(completion_id, model, delta={"content": content[start:start + 4]}))
+    await send(_chunk_payload(completion_id, model, finish_reason="stop"))
+    if include_usage:
+        await send(_chunk_payload(completion_id, model, usage=usage))
+    await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+# Request and injected-error counts of an application, for tests and benchmarks.
+STATS = web.AppKey("stats", dict)
+
+def _latency_sampler(latency, distribution="fixed", sigma=0.5, rng=None):
+    """
+    Returns a function drawing one response delay in seconds, with mean `latency`.
+
+    Distributions: 'fixed', 'uniform' (0 to 2x the mean), 'exponential', and
+    'lognormal' (with log-space standard deviation `sigma`; a long right tail
+    like real endpoints under load).
+    """
+    rng = rng or random.Random()
+    if not latency or distribution == "fixed":
+        return lambda: latency
+    if distribution == "uniform":
+        return lambda: rng.uniform(0, 2 * latency)
+    if distribution == "exponential":
+        return lambda: rng.expovariate(1 / latency)
+    if distribution == "lognormal":
+        mu = math.log(latency) - sigma * sigma / 2
+        return lambda: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Unknown latency distribution: {distribution}")
+
+def _error_response(status, message, error_type, headers=None):
+    """An error body in the shape the OpenAI API returns."""
+    return web.json_response(
+        {"error": {"message": message, "type": error_type, "param": None, "code": None}},
+        status=status,
+        headers=headers,
+    )
+
+def create_app(
+    answer="A",
+    latency=0.0,
+    token_interval=0.0,
+    logprobs=True,
+    latency_distribution="fixed",
+    latency_sigma=0.5,
+    error_rates=None,
+    retry_after=None,
+    hang_seconds=60.0,
+    answers=None,
+    seed=None,
+):
+    """
+    Creates a minimal OpenAI-compatible application for local testing.
+
+    Args:
+        answer (str): The content returned for chat completions no rule in
+                      `answers` matches.
+        latency (float): Mean seconds to wait before answering each request
+                         (before the first chunk when streaming).
+        token_interval (float): Seconds between chunks of a streamed response.
+        logprobs (bool): Whether requested logprobs are returned and the legacy
+                         /v1/completions endpoint is served; False mimics an
+                         endpoint without logprob support.
+        latency_distribution (str): 'fixed', 'uniform', 'exponential' or 'lognormal'.
+        latency_sigma (float): Log-space standard deviation of 'lognormal'.
+        error_rates (dict): Probability of injecting each failure per request:
+                            '429' (rate limited), '500' (server error) and
+                            'timeout' (the response is held for `hang_seconds`).
+        retry_after (float): Retry-After seconds sent with injected 429s; None sends no header.
+        hang_seconds (float): How long an injected timeout holds the request.
+        answers (list): (regex, answer) rules; the first pattern found in the
+                        last message selects the answer. Lets one server give
+                        each benchmark a well-formed reply.
+        seed (int): Seed for latency draws and error injection.
+
+    Returns:
+        An aiohttp web.Application serving POST /v1/chat/completions (and
+        POST /v1/completions when `logprobs` is set). Its counts of requests and
+        injected errors are in `app[STATS]`.
+    """
+    rng = random.Random(seed)
+    draw_latency = _latency_sampler(latency, latency_distribution, latency_sigma, rng)
+    error_rates = {str(k): float(v) for k, v in (error_rates or {}).items()}
+    rules = [(re.compile(pattern), reply) for pattern, reply in (answers or [])]
+    stats = {"requests": 0, "429": 0, "500": 0, "timeout": 0}
+
+    async def inject_fault():
+        """Returns an error response to send instead of an answer, or None."""
+        stats["requests"] += 1
+        roll = rng.random()
+        for kind in ("429", "500", "timeout"):
+            rate = error_rates.get(kind, 0.0)
+            if roll < rate:
+                stats[kind] += 1
+                if kind == "429":
+                    headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+                    return _error_response(429, "Rate limit exceeded (injected).", "rate_limit_error", headers)
+                if kind == "500":
+                    return _error_response(500, "Internal server error (injected).", "server_error")
+                await asyncio.sleep(hang_seconds)
+                return _error_response(504, "Gateway timeout (injected).", "timeout")
+            roll -= rate
+        delay = draw_latency()
+        if delay:
+            await asyncio.sleep(delay)
+        return None
+
+    def answer_for(text):
+        for pattern, reply in rules:
+            if pattern.search(text):
+                return reply
+        return answer
+
+    async def chat_completions(request):
+        body = await request.json()
+        fault = await inject_fault()
+        if fault is not None:
+            return fault
+        model = body.get("model", "mock")
+        messages = body.get("messages", [])
+        content = answer_for((messages[-1].get("content") or "") if messages else "")
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        prompt_tokens = prompt_chars // 4
+        completion_tokens = max(1, len(content) // 4)
+        if body.get("stream"):
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return await _stream_completion(request, model, content, usage, include_usage, token_interval)
+        n = int(body.get("n") or 1)
+        # Like the real API, usage counts the tokens of all n choices.
+        payload = _completion_payload(model, content, prompt_tokens=prompt_tokens, completion_tokens=n * completion_tokens)
+        if n > 1:
+            payload["choices"] = [dict(payload["choices"][0], index=i) for i in range(n)]
+        if logprobs and body.get("logprobs"):
+            for choice in payload["choices"]:
+                choice["logprobs"] = _chat_logprobs(content, body.get("top_logprobs") or 1)
+        return web.json_response(payload)
+
+    async def completions(request):
+        body = await request.json()
+        fault = await inject_fault()
+        if fault is not None:
+            return fault
+        prompts = body.get("prompt", "")
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        payload = _text_completion_payload(body.get("model", "mock"), prompts, answer_for(prompts[0]), body.get("logprobs"))
+        return web.json_response(payload)
+
+    app = web.Application()
+    app[STATS] = stats
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    if logprobs:
+        app.router.add_post("/v1/completions", completions)
+    return app
+
+async def start_mock_server(host="127.0.0.1", port=0, **app_kwargs):
+    """
+    Starts the mock server in the running event loop.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free port.
+        **app_kwargs: Passed through to create_app().
+
+    Returns:
+        A (runner, api_base) tuple. Call `await runner.cleanup()` to stop the server.
+    """
+    runner = web.AppRunner(create_app(**app_kwargs), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    api_base = f"http://{host}:{bound_port}/v1"
+    logger.info(f"Mock OpenAI server listening on {api_base}")
+    return runner, api_base
+
+def parse_args(argv=None):
+    """Parses the command line of `python -m llm_benchmark.mock_server`."""
+    parser = argparse.ArgumentParser(description="Serve a local OpenAI-compatible mock endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 picks a free port.")
+    parser.add_argument("--answer", default="A", help="Reply used when no --answer-rule matches.")
+    parser.add_argument(
+        "--answer-rule",
+        action="append",
+        default=[],
+        metavar="REGEX=ANSWER",
+        help="Reply ANSWER when REGEX is found in the last message. Repeatable; the first match wins.",
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response delay in seconds.")
+    parser.add_argument("--latency-distribution", default="fixed", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--token-interval", type=float, default=0.0, help="Seconds between streamed chunks.")
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate-500", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with injected 429s.")
+    parser.add_argument("--hang-seconds", type=float, default=60.0, help="How long an injected timeout holds a request.")
+    parser.add_argument("--no-logprobs", action="store_true", help="Behave like an endpoint without logprob support.")
+    parser.add_argument("--seed", type=int)
+    return parser.parse_args(argv)
+
+async def _serve(args):
+    rules = [rule.split("=", 1) for rule in args.answer_rule]
+    runner, api_base = await start_mock_server(
+        host=args.host,
+        port=args.port,
+        answer=args.answer,
+        latency=args.latency,
+        token_interval=args.token_interval,
+        logprobs=not args.no_logprobs,
+        latency_distribution=args.latency_distribution,
+        latency_sigma=args.latency_sigma,
+        error_rates={"429": args.error_rate_429, "500": args.error_rate_500, "timeout": args.timeout_rate},
+        retry_after=args.retry_after,
+        hang_seconds=args.hang_seconds,
+        answers=rules,
+        seed=args.seed,
+    )
+    # The first line of output is the base URL, so scripts can start the server with --port 0.
+    print(api_base, flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_serve(parse_args()))
+    except KeyboardInterrupt:
+        pass
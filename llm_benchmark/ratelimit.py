@@ -0,0 +1,194 @@
+import time
+import asyncio
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# One limiter per (api_base, api_key): every model and benchmark that talks to
+# the same endpoint draws from the same quota.
+_limiters = {}
+
+class TokenBucket:
+    """
+    A token bucket refilled continuously at `rate_per_minute`.
+
+    Capacity equals one minute's worth of tokens, so a full minute of quota can
+    be spent in a burst but not more.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # Waiters are served one at a time so a large request is not starved by small ones.
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+class EndpointLimiter:
+    """
+    Admission control for a single API endpoint.
+
+    Combines optional requests/min and tokens/min token buckets with an AIMD
+    (additive-increase, multiplicative-decrease) cap on in-flight requests:
+    every success raises the cap by roughly one request per window of `cap`
+    successes, and every 429/5xx/timeout multiplies it by `decrease_factor`.
+    A `Retry-After` from the server pauses all admissions to the endpoint.
+
+    Config keys (all optional, under a model's `rate_limit:`):
+        requests_per_minute, tokens_per_minute, max_concurrency,
+        min_concurrency (default 1), decrease_factor (default 0.5).
+    """
+
+    def __init__(self, settings=None):
+        settings = settings or {}
+        rpm = settings.get('requests_per_minute')
+        tpm = settings.get('tokens_per_minute')
+        self.requests_per_minute = rpm
+        self.tokens_per_minute = tpm
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+
+        self.min_concurrency = max(1, int(settings.get('min_concurrency', 1)))
+        max_concurrency = settings.get('max_concurrency')
+        self.max_concurrency = int(max_concurrency) if max_concurrency else None
+        self.decrease_factor = float(settings.get('decrease_factor', 0.5))
+        # Without a configured ceiling the cap starts unbounded and only becomes
+        # finite after the first throttling response.
+        self.concurrency_limit = float(self.max_concurrency) if self.max_concurrency else float('inf')
+
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+        # (timestamp, tokens) of admissions over the last minute, for reporting.
+        self._admitted = deque()
+        self.throttled_count = 0
+
+    async def acquire(self, tokens=0):
+        """
+        Waits until a request estimated at `tokens` tokens may be sent.
+        Every successful acquire() must be paired with a release().
+        """
+        while True:
+            delay = self.paused_until - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.concurrency_limit)
+            self.in_flight += 1
+
+        try:
+            if self.request_bucket:
+                await self.request_bucket.acquire(1)
+            if self.token_bucket and tokens:
+                await self.token_bucket.acquire(tokens)
+        except BaseException:
+            await self._release_slot()
+            raise
+
+        self._admitted.append((time.monotonic(), tokens))
+
+    async def release(self, outcome="ok", retry_after=None):
+        """
+        Returns the slot taken by acquire() and feeds the outcome to the AIMD controller.
+
+        Args:
+            outcome (str): 'ok' for a successful call, 'throttled' for 429/5xx/timeouts,
+                           anything else for failures that say nothing about load.
+            retry_after (float): Seconds the server asked us to wait, if any.
+        """
+        now = time.monotonic()
+        if outcome == "ok":
+            if self.concurrency_limit != float('inf'):
+                ceiling = self.max_concurrency or float('inf')
+                self.concurrency_limit = min(ceiling, self.concurrency_limit + 1.0 / self.concurrency_limit)
+        elif outcome == "throttled":
+            self.throttled_count += 1
+            # Requests already in flight when the endpoint pushed back will fail
+            # together; only decrease once per burst of failures.
+            if now - self._last_decrease > 1.0:
+                current = min(self.concurrency_limit, max(self.in_flight, self.min_concurrency))
+                self.concurrency_limit = max(self.min_concurrency, current * self.decrease_factor)
+                self._last_decrease = now
+                logger.info(f"Endpoint throttled; concurrency limit lowered to {self.concurrency_limit:.1f}")
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        await self._release_slot()
+
+    async def _release_slot(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        Returns the admitted rate over the last minute next to the configured limits.
+        """
+        now = time.monotonic()
+        while self._admitted and now - self._admitted[0][0] > 60.0:
+            self._admitted.popleft()
+        admitted_rpm = len(self._admitted)
+        admitted_tpm = sum(tokens for _, tokens in self._admitted)
+        return {
+            "admitted_requests_per_minute": admitted_rpm,
+            "admitted_tokens_per_minute": admitted_tpm,
+            "requests_per_minute_limit": self.requests_per_minute,
+            "tokens_per_minute_limit": self.tokens_per_minute,
+            "request_utilization": admitted_rpm / self.requests_per_minute if self.requests_per_minute else None,
+            "token_utilization": admitted_tpm / self.tokens_per_minute if self.tokens_per_minute else None,
+            "concurrency_limit": None if self.concurrency_limit == float('inf') else round(self.concurrency_limit, 2),
+            "in_flight": self.in_flight,
+            "throttled": self.throttled_count,
+        }
+
+def get_limiter(model_config):
+    """
+    Returns the shared EndpointLimiter for a model's endpoint, creating it on first use
+    from the model's `rate_limit:` settings.
+    """
+    key = (model_config['api_base'], model_config['api_key'])
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = EndpointLimiter(model_config.get('rate_limit'))
+        _limiters[key] = limiter
+    return limiter
+
+def get_limiter_stats():
+    """Returns {api_base: stats} for every endpoint used so far."""
+    return {api_base: limiter.stats() for (api_base, _), limiter in _limiters.items()}
+
+def reset_limiters():
+    """Forgets all limiters, e.g. before starting a new event loop."""
+    _limiters.clear()
+
+def format_limiter_stats(stats):
+    """Renders EndpointLimiter.stats() as a single log line."""
+    parts = [f"{stats['admitted_requests_per_minute']} req/min"]
+    if stats['requests_per_minute_limit']:
+        parts[-1] += f" ({stats['request_utilization']:.0%} of {stats['requests_per_minute_limit']})"
+    parts.append(f"{stats['admitted_tokens_per_minute']} tok/min")
+    if stats['tokens_per_minute_limit']:
+        parts[-1] += f" ({stats['token_utilization']:.0%} of {stats['tokens_per_minute_limit']})"
+    if stats['concurrency_limit'] is not None:
+        parts.append(f"concurrency limit {stats['concurrency_limit']}")
+    parts.append(f"{stats['throttled']} throttled")
+    return ", ".join(parts)
@@ -0,0 +1,85 @@
+import logging
+import importlib
+
+logger = logging.getLogger(__name__)
+
+# Evaluator classes registered with @register_evaluator, by benchmark name.
+_evaluators = {}
+
+# Modules defining the bundled evaluators. They are imported only when their
+# benchmark is requested, so that startup does not pay for every evaluator.
+BUILTIN_EVALUATOR_MODULES = {
+    "mmlu": "llm_benchmark.evaluators.mmlu",
+    "gsm8k": "llm_benchmark.evaluators.gsm8k",
+    "math": "llm_benchmark.evaluators.math",
+    "humaneval": "llm_benchmark.evaluators.humaneval",
+}
+
+# Installed packages can provide evaluators under this entry point group, e.g. in
+# pyproject.toml:
+#     [project.entry-points."llm_benchmark.evaluators"]
+#     my_bench = "my_package.evaluators:MyBenchEvaluator"
+ENTRY_POINT_GROUP = "llm_benchmark.evaluators"
+
+def register_evaluator(name):
+    """
+    Class decorator registering a BenchmarkEvaluator subclass under `name`, the
+    name used in `evaluation.benchmarks`.
+    """
+    def decorator(cls):
+        existing = _evaluators.get(name)
+        if existing is not None and existing is not cls:
+            logger.warning(f"Evaluator '{name}' is registered twice; {cls.__qualname__} replaces {existing.__qualname__}.")
+        _evaluators[name] = cls
+        return cls
+    return decorator
+
+def _entry_points():
+    from importlib.metadata import entry_points
+    return entry_points(group=ENTRY_POINT_GROUP)
+
+def import_evaluator_modules(modules):
+    """
+    Imports modules listed under `evaluation.evaluator_modules`, whose
+    @register_evaluator classes become available by name.
+    """
+    for module in modules or []:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.error(f"Could not import evaluator module '{module}': {e}")
+
+def get_evaluator_class(name):
+    """
+    Returns the evaluator class for a benchmark name, or None.
+
+    Looks in the registered classes, then imports the bundled module for `name`
+    (whose class registers itself), then loads a matching installed entry point.
+    """
+    cls = _evaluators.get(name)
+    if cls is not None:
+        return cls
+    try:
+        if name in BUILTIN_EVALUATOR_MODULES:
+            importlib.import_module(BUILTIN_EVALUATOR_MODULES[name])
+        else:
+            for entry_point in _entry_points():
+                if entry_point.name == name:
+                    _evaluators.setdefault(name, entry_point.load())
+                    break
+    except Exception as e:
+        logger.error(f"Could not find or load evaluator for '{name}': {e}")
+        return None
+    cls = _evaluators.get(name)
+    if cls is None:
+        logger.error(f"No evaluator registered for benchmark: '{name}'")
+    return cls
+
+def available_evaluators():
+    """Names of all known benchmarks, without importing their evaluators."""
+    names = set(_evaluators) | set(BUILTIN_EVALUATOR_MODULES)
+    try:
+        names.update(entry_point.name for entry_point in _entry_points())
+    except Exception as e:
+        logger.debug(f"Could not list evaluator entry points: {e}")
+    return sorted(names)
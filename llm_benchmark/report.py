@@ -1,17 +1,23 @@
 import os
 import logging
 from datetime import datetime
-from jinja2 import Environment, FileSystemLoader
 
 logger = logging.getLogger(__name__)
 
-def generate_report(results, model_name):
+def _template_environment(template_dir):
+    # jinja2 is only imported when a report is written.
+    from jinja2 import Environment, FileSystemLoader
+    return Environment(loader=FileSystemLoader(template_dir))
+
+def generate_report(results, model_name, performance=None):
     """
     Generates a Markdown report from the evaluation results using a Jinja2 template.
 
     Args:
         results (list): A list of result dictionaries from the evaluators.
         model_name (str): The name of the model that was evaluated.
+        performance (dict): Optional latency/throughput summary across all
+                            benchmarks, as returned by summarize_telemetry().
     """
     try:
         # Calculate overall score (simple average)
@@ -21,7 +27,7 @@ def generate_report(results, model_name):
         # Setup Jinja2 environment
         # The path is relative to where the script is run from, so we construct it carefully.
         template_dir = os.path.join(os.path.dirname(__file__), 'templates')
-        env = Environment(loader=FileSystemLoader(template_dir))
+        env = _template_environment(template_dir)
         template = env.get_template('report.md.jinja')
 
         # Data for the template
@@ -30,6 +36,7 @@ def generate_report(results, model_name):
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "overall_score": overall_score,
             "results": results,
+            "performance": performance,
         }
 
         # Render the report
@@ -53,3 +60,89 @@ def generate_report(results, model_name):
     except Exception as e:
         logger.error(f"Failed to generate report: {e}")
         return None
+
+def _latency_chart(steps, width=40):
+    """Renders p95 latency per load level as a text bar chart (the saturation curve)."""
+    values = [s['latency_p95'] or 0.0 for s in steps]
+    peak = max(values, default=0.0) or 1.0
+    label_width = max((len(str(s['load'])) for s in steps), default=1)
+    lines = []
+    for step, value in zip(steps, values):
+        bar = "#" * max(1, round(width * value / peak)) if value else ""
+        lines.append(f"{str(step['load']):>{label_width}} | {bar} {value:.2f}s")
+    return "\n".join(lines)
+
+def generate_loadtest_report(result, model_name):
+    """
+    Generates a Markdown report of a load test: one row per step plus the
+    p95 latency curve and the detected saturation point.
+
+    Args:
+        result (dict): The dict returned by loadtest.run_load_test().
+        model_name (str): The name of the model that was tested.
+    """
+    try:
+        template_dir = os.path.join(os.path.dirname(__file__), 'templates')
+        env = _template_environment(template_dir)
+        template = env.get_template('loadtest.md.jinja')
+
+        report_content = template.render({
+            "model_name": model_name,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "result": result,
+            "chart": _latency_chart(result['steps']),
+        })
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_model_name = model_name.replace('/', '_').replace(':', '_')
+        os.makedirs("results", exist_ok=True)
+        report_path = os.path.join("results", f"loadtest_{safe_model_name}_{timestamp}.md")
+
+        with open(report_path, "w", encoding='utf-8') as f:
+            f.write(report_content)
+
+        logger.info(f"Load-test report successfully generated at: {report_path}")
+        return report_path
+
+    except Exception as e:
+        logger.error(f"Failed to generate load-test report: {e}")
+        return None
+
+def generate_comparison_report(run_id, rows, alpha=0.05):
+    """
+    Generates a Markdown report comparing one run with its baselines, from the
+    run index alone.
+
+    Args:
+        run_id (str): The compared run.
+        rows (list): One dict per (model, benchmark) of the run: 'model',
+                     'benchmark', 'score', 'comparison' (compare_entries() output
+                     with flips described, or None) and 'history' (run index
+                     entries, oldest first).
+        alpha (float): Significance level used for the verdicts.
+    """
+    try:
+        template_dir = os.path.join(os.path.dirname(__file__), 'templates')
+        env = _template_environment(template_dir)
+        template = env.get_template('compare.md.jinja')
+
+        report_content = template.render({
+            "run_id": run_id,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "rows": rows,
+            "alpha": alpha,
+        })
+
+        safe_run_id = run_id.replace('/', '_').replace(':', '_')
+        os.makedirs("results", exist_ok=True)
+        report_path = os.path.join("results", f"compare_{safe_run_id}.md")
+
+        with open(report_path, "w", encoding='utf-8') as f:
+            f.write(report_content)
+
+        logger.info(f"Comparison report successfully generated at: {report_path}")
+        return report_path
+
+    except Exception as e:
+        logger.error(f"Failed to generate comparison report: {e}")
+        return None
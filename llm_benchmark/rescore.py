@@ -0,0 +1,93 @@
+import os
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from .checkpoint import sample_key
+from .results_store import read_results, write_results, result_row
+
+logger = logging.getLogger(__name__)
+
+# Fields of a stored result that rescoring keeps as they are.
+PRESERVED_FIELDS = ("response", "responses", "prompt_hash", "telemetry")
+
+# The evaluator used by a rescoring worker process, built once by _init_worker.
+_worker_evaluator = None
+
+def _init_worker(evaluator_class, model_config, benchmark_config):
+    global _worker_evaluator
+    _worker_evaluator = evaluator_class(model_config, benchmark_config)
+
+def _rescore_batch(batch, evaluator=None):
+    """Re-scores a list of (stored result, sample) pairs."""
+    evaluator = evaluator or _worker_evaluator
+    results = []
+    for stored, sample in batch:
+        result = evaluator.rescore_sample(stored, sample)
+        for field in PRESERVED_FIELDS:
+            if field in stored:
+                result.setdefault(field, stored[field])
+        results.append(result)
+    return results
+
+def rescore_file(path, evaluator, workers=None, batch_size=64):
+    """
+    Re-runs answer extraction over the stored responses of one results file,
+    without calling the API, and writes the new results back in place.
+
+    Batches of samples are scored in a pool of `workers` processes (all CPUs by
+    default); `workers=1` scores in this process.
+
+    Args:
+        path (str): A file written by BenchmarkEvaluator.run().
+        evaluator (BenchmarkEvaluator): An evaluator of the file's benchmark; its
+                                        dataset provides the samples.
+        workers (int): Number of worker processes.
+        batch_size (int): Samples per batch handed to a worker.
+
+    Returns:
+        A dict with the previous and new scores and the number of samples whose
+        correctness changed.
+    """
+    rows, metadata = read_results(path)
+    dataset = evaluator.prepare_data()
+
+    previous = [json.loads(row["result"]) for row in rows]
+    batch_items, positions = [], []
+    for position, row in enumerate(rows):
+        index = row["index"]
+        sample = dataset[index] if index < len(dataset) else None
+        if sample is None or sample_key(sample) != row["sample_key"]:
+            # The dataset no longer matches the stored run; keep the old result.
+            continue
+        batch_items.append((previous[position], sample))
+        positions.append(position)
+    skipped = len(rows) - len(positions)
+    if skipped:
+        logger.warning(f"{skipped} stored samples in {path} no longer match the dataset and were not rescored.")
+
+    batches = [batch_items[i:i + batch_size] for i in range(0, len(batch_items), batch_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(batches) <= 1:
+        rescored = [result for batch in batches for result in _rescore_batch(batch, evaluator)]
+    else:
+        # Workers never call the API, so they do not open the response cache.
+        benchmark_config = {k: v for k, v in evaluator.benchmark_config.items() if k != 'cache'}
+        init_args = (type(evaluator), evaluator.model_config, benchmark_config)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as executor:
+            rescored = [result for batch_results in executor.map(_rescore_batch, batches) for result in batch_results]
+
+    results = list(previous)
+    for position, result in zip(positions, rescored):
+        results[position] = result
+    changed = sum(
+        1 for position in positions
+        if bool(previous[position].get("correct")) != bool(results[position].get("correct"))
+    )
+
+    write_results(path, [result_row(row["index"], row["sample_key"], result) for row, result in zip(rows, results)], metadata)
+    return {
+        "previous_score": evaluator.aggregate_results(previous),
+        "score": evaluator.aggregate_results(results),
+        "rescored": len(positions),
+        "changed": changed,
+    }
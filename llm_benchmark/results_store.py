@@ -0,0 +1,124 @@
+import os
+import json
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Telemetry fields stored as their own columns.
+TELEMETRY_COLUMNS = ("latency", "ttft", "prompt_tokens", "completion_tokens", "retries")
+
+def prompt_hash(messages):
+    """Returns a stable identifier for the exact prompt sent for a sample."""
+    encoded = json.dumps(messages, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+def results_path(directory, run_id, model_name, benchmark_name):
+    """Returns the Parquet file holding the per-sample results of one (run, model, benchmark)."""
+    safe_model_name = model_name.replace('/', '_').replace(':', '_')
+    return os.path.join(directory, run_id, f"{safe_model_name}__{benchmark_name}.parquet")
+
+def result_row(index, key, result):
+    """
+    Flattens one sample's result dict into a row: identifiers, the raw response,
+    the parsed answer and correctness, telemetry, and the full result as JSON.
+    """
+    telemetry = result.get("telemetry") or {}
+    parsed = result.get("parsed_answer")
+    row = {
+        "index": index,
+        "sample_key": key,
+        "prompt_hash": result.get("prompt_hash"),
+        "response": result.get("response"),
+        "responses": result.get("responses"),
+        "parsed_answer": None if parsed is None else str(parsed),
+        "correct": bool(result.get("correct", False)),
+        "error": result.get("error"),
+        "cached": bool(telemetry.get("cached", False)),
+        "result": json.dumps(result, ensure_ascii=False, default=str),
+    }
+    for column in TELEMETRY_COLUMNS:
+        row[column] = telemetry.get(column)
+    return row
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("index", pa.int64()),
+        ("sample_key", pa.string()),
+        ("prompt_hash", pa.string()),
+        ("response", pa.string()),
+        ("responses", pa.list_(pa.string())),
+        ("parsed_answer", pa.string()),
+        ("correct", pa.bool_()),
+        ("error", pa.string()),
+        ("cached", pa.bool_()),
+        ("result", pa.string()),
+        ("latency", pa.float64()),
+        ("ttft", pa.float64()),
+        ("prompt_tokens", pa.int64()),
+        ("completion_tokens", pa.int64()),
+        ("retries", pa.int64()),
+    ])
+
+def write_results(path, rows, metadata):
+    """
+    Writes rows built by result_row() to a Parquet file, replacing it atomically.
+
+    Args:
+        path (str): Destination file.
+        rows (list): Row dicts.
+        metadata (dict): String key/values stored in the file's schema metadata
+                         (model, benchmark, run id).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema().with_metadata({k: str(v) for k, v in metadata.items()})
+    table = pa.Table.from_pylist(rows, schema=schema)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.tmp"
+    pq.write_table(table, temporary)
+    os.replace(temporary, path)
+
+def read_results(path):
+    """Returns (rows, metadata) for a file written by write_results()."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path)
+    metadata = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items() if not k.startswith(b"ARROW")}
+    return table.to_pylist(), metadata
+
+def stored_accuracy(path):
+    """Returns (correct, total) for a results file, reading only its `correct` column."""
+    import pyarrow.parquet as pq
+
+    column = pq.read_table(path, columns=["correct"]).column("correct").to_pylist()
+    return sum(1 for value in column if value), len(column)
+
+def read_results_metadata(path):
+    """Returns the schema metadata (model, benchmark, run id) of a results file without reading its rows."""
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(path).metadata or {}
+    return {k.decode(): v.decode() for k, v in metadata.items() if not k.startswith(b"ARROW")}
+
+def find_results(directory, run_id, model_name=None, benchmark_name=None):
+    """
+    Lists the results files of a run, optionally only those of one model and/or benchmark.
+    """
+    run_dir = os.path.join(directory, run_id)
+    if not os.path.isdir(run_dir):
+        return []
+    paths = []
+    for filename in sorted(os.listdir(run_dir)):
+        if not filename.endswith(".parquet"):
+            continue
+        stem = filename[:-len(".parquet")]
+        model_part, _, benchmark_part = stem.rpartition("__")
+        if model_name and model_part != model_name.replace('/', '_').replace(':', '_'):
+            continue
+        if benchmark_name and benchmark_part != benchmark_name:
+            continue
+        paths.append(os.path.join(run_dir, filename))
+    return paths
@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from .stats import mcnemar_test
+
+logger = logging.getLogger(__name__)
+
+# Open indexes by resolved path, so every evaluator writes through one connection.
+_indexes = {}
+
+DEFAULT_RUN_INDEX_SETTINGS = {
+    "enabled": True,
+    "path": os.path.join("results", "runs.sqlite"),
+    "baseline_run": "previous",
+    "baseline_model": None,
+    "alpha": 0.05,
+    "max_flipped": 20,
+}
+
+def run_index_settings(eval_config):
+    """Returns the run index settings: the defaults, updated by `evaluation.run_index`."""
+    settings = dict(DEFAULT_RUN_INDEX_SETTINGS)
+    if isinstance(eval_config.get('run_index'), dict):
+        settings.update(eval_config['run_index'])
+    return settings
+
+def _to_blob(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+def _from_blob(blob):
+    return int.from_bytes(blob or b"", 'little')
+
+def _popcount(bits):
+    return bin(bits).count("1")
+
+def _positions_of(bits):
+    positions = []
+    for offset, byte in enumerate(_to_blob(bits)):
+        if byte:
+            positions.extend(offset * 8 + i for i in range(8) if byte >> i & 1)
+    return positions
+
+class RunIndex:
+    """
+    A compact SQLite index of finished runs: one row per (run, model, benchmark)
+    with its score, latency summary and metrics, and the correctness of every
+    sample as a bitmap.
+
+    Each benchmark's samples get stable bit positions, assigned by sample key the
+    first time a sample is seen. Runs over different subsets of a benchmark (e.g.
+    MMLU sampling, early stopping) are therefore comparable bit by bit: paired
+    samples, flips and McNemar counts are bitwise operations on two rows, without
+    reading any stored responses.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " benchmark TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " score REAL,"
+            " evaluated INTEGER NOT NULL,"
+            " correct INTEGER NOT NULL,"
+            " evaluated_bits BLOB NOT NULL,"
+            " correct_bits BLOB NOT NULL,"
+            " latency_p50 REAL,"
+            " latency_p95 REAL,"
+            " latency_p99 REAL,"
+            " metrics TEXT,"
+            " PRIMARY KEY (run_id, model, benchmark))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS samples ("
+            " benchmark TEXT NOT NULL,"
+            " sample_key TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " PRIMARY KEY (benchmark, sample_key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (model, benchmark, created)")
+        self._conn.commit()
+
+    def _positions(self, benchmark, keys):
+        """Returns the bit position of each key, assigning new positions to unseen keys."""
+        known = dict(self._conn.execute("SELECT sample_key, position FROM samples WHERE benchmark = ?", (benchmark,)))
+        next_position = max(known.values(), default=-1) + 1
+        new_rows = []
+        for key in keys:
+            if key not in known:
+                known[key] = next_position
+                new_rows.append((benchmark, key, next_position))
+                next_position += 1
+        if new_rows:
+            self._conn.executemany("INSERT INTO samples (benchmark, sample_key, position) VALUES (?, ?, ?)", new_rows)
+        return [known[key] for key in keys]
+
+    def record(self, run_id, model, benchmark, sample_keys, correct, score=None, performance=None, metrics=None, created=None):
+        """
+        Stores (or replaces) the outcome of one (run, model, benchmark).
+
+        Args:
+            sample_keys (list): checkpoint.sample_key() of each evaluated sample.
+            correct (list): Whether each of those samples was answered correctly.
+            score (float): The benchmark's aggregate score.
+            performance (dict): summarize_telemetry() output; latency percentiles are kept.
+            metrics (dict): The report metrics, stored as JSON.
+            created (float): Timestamp of the run; now by default. Rescoring keeps
+                             the original one, which orders runs for "previous".
+        """
+        positions = self._positions(benchmark, sample_keys)
+        size = max(positions, default=-1) // 8 + 1
+        evaluated_bits, correct_bits = bytearray(size), bytearray(size)
+        for position, is_correct in zip(positions, correct):
+            evaluated_bits[position >> 3] |= 1 << (position & 7)
+            if is_correct:
+                correct_bits[position >> 3] |= 1 << (position & 7)
+        performance = performance or {}
+        self._conn.execute(
+            "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id, model, benchmark, created or time.time(), score,
+                len(sample_keys), sum(1 for c in correct if c),
+                bytes(evaluated_bits), bytes(correct_bits),
+                performance.get('latency_p50'), performance.get('latency_p95'), performance.get('latency_p99'),
+                json.dumps(metrics or {}, ensure_ascii=False, default=str),
+            ),
+        )
+        self._conn.commit()
+
+    def _entry(self, row):
+        columns = ("run_id", "model", "benchmark", "created", "score", "evaluated", "correct",
+                   "evaluated_bits", "correct_bits", "latency_p50", "latency_p95", "latency_p99", "metrics")
+        entry = dict(zip(columns, row))
+        entry["evaluated_bits"] = _from_blob(entry["evaluated_bits"])
+        entry["correct_bits"] = _from_blob(entry["correct_bits"])
+        entry["metrics"] = json.loads(entry["metrics"] or "{}")
+        return entry
+
+    def get(self, run_id, model, benchmark):
+        """Returns the entry of one (run, model, benchmark), or None."""
+        row = self._conn.execute(
+            "SELECT * FROM runs WHERE run_id = ? AND model = ? AND benchmark = ?", (run_id, model, benchmark)
+        ).fetchone()
+        return self._entry(row) if row else None
+
+    def entries(self, run_id=None, model=None, benchmark=None):
+        """Returns the matching entries, oldest first."""
+        clauses, params = [], []
+        for column, value in (("run_id", run_id), ("model", model), ("benchmark", benchmark)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn.execute(f"SELECT * FROM runs{where} ORDER BY created", params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def previous_run(self, run_id, model, benchmark):
+        """The most recent run of (model, benchmark) recorded before `run_id`, or None."""
+        current = self.get(run_id, model, benchmark)
+        before = current["created"] if current else time.time()
+        row = self._conn.execute(
+            "SELECT run_id FROM runs WHERE model = ? AND benchmark = ? AND run_id != ? AND created < ?"
+            " ORDER BY created DESC LIMIT 1",
+            (model, benchmark, run_id, before),
+        ).fetchone()
+        return row[0] if row else None
+
+    def latest_run(self):
+        """The run id recorded most recently, or None."""
+        row = self._conn.execute("SELECT run_id FROM runs ORDER BY created DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def sample_keys(self, benchmark, positions):
+        """Returns the sample key at each bit position."""
+        if not positions:
+            return []
+        keys = dict((position, key) for key, position in self._conn.execute(
+            "SELECT sample_key, position FROM samples WHERE benchmark = ?", (benchmark,)
+        ))
+        return [keys.get(position) for position in positions]
+
+    def close(self):
+        self._conn.close()
+
+def compare_entries(baseline, candidate, alpha=0.05):
+    """
+    Compares two entries of the same benchmark on the samples both evaluated.
+
+    Returns:
+        A dict with the number of paired samples, both scores on them, the
+        delta, the flips in each direction (counts and bit positions), McNemar's
+        p-value, and a verdict: "regression" or "improvement" when p < alpha,
+        else "no significant change".
+    """
+    paired = baseline["evaluated_bits"] & candidate["evaluated_bits"]
+    base_correct = baseline["correct_bits"] & paired
+    cand_correct = candidate["correct_bits"] & paired
+    regressed = base_correct & ~cand_correct
+    improved = cand_correct & ~base_correct
+    n = _popcount(paired)
+    regressions, improvements = _popcount(regressed), _popcount(improved)
+    p_value = mcnemar_test(regressions, improvements)
+    verdict = "no significant change"
+    if p_value < alpha:
+        verdict = "regression" if regressions > improvements else "improvement"
+    return {
+        "baseline_run": baseline["run_id"],
+        "baseline_model": baseline["model"],
+        "paired": n,
+        "baseline_score": _popcount(base_correct) / n if n else None,
+        "candidate_score": _popcount(cand_correct) / n if n else None,
+        "delta": (_popcount(cand_correct) - _popcount(base_correct)) / n if n else None,
+        "regressions": regressions,
+        "improvements": improvements,
+        "regressed_positions": _positions_of(regressed),
+        "improved_positions": _positions_of(improved),
+        "p_value": p_value,
+        "verdict": verdict,
+    }
+
+def describe_flips(index, benchmark, comparison, limit, dataset_index=None):
+    """
+    Replaces the flipped bit positions of a compare_entries() result with lists
+    'regressed' and 'improved' of {"sample_key", "index"} (up to `limit` each),
+    where `index` is the sample's position in `dataset_index` (sample key ->
+    dataset index) if given.
+    """
+    for direction in ("regressed", "improved"):
+        positions = comparison.pop(f"{direction}_positions")[:limit]
+        comparison[direction] = [
+            {"index": (dataset_index or {}).get(key), "sample_key": key}
+            for key in index.sample_keys(benchmark, positions)
+        ]
+    return comparison
+
+def find_baseline(index, settings, run_id, model, benchmark):
+    """
+    Returns the baseline entry for (run, model, benchmark) under the run index
+    settings: `baseline_run` ("previous" for the latest earlier run, or a run id)
+    by `baseline_model` (this model by default). None if there is none.
+    """
+    baseline_model = settings.get('baseline_model') or model
+    baseline_run = settings.get('baseline_run')
+    if not baseline_run:
+        return None
+    if baseline_run == "previous":
+        if baseline_model == model:
+            baseline_run = index.previous_run(run_id, model, benchmark)
+        else:
+            entries = index.entries(model=baseline_model, benchmark=benchmark)
+            baseline_run = entries[-1]["run_id"] if entries else None
+        if baseline_run is None:
+            return None
+    if baseline_run == run_id and baseline_model == model:
+        return None
+    return index.get(str(baseline_run), baseline_model, benchmark)
+
+def get_run_index(settings):
+    """
+    Returns the shared RunIndex described by the `run_index:` settings, or None
+    when it is disabled.
+    """
+    if not settings.get('enabled', True):
+        return None
+    path = os.path.abspath(settings.get('path') or DEFAULT_RUN_INDEX_SETTINGS['path'])
+    index = _indexes.get(path)
+    if index is None:
+        index = RunIndex(path)
+        _indexes[path] = index
+    return index
+
+def close_run_indexes():
+    """Closes every open run index."""
+    for index in _indexes.values():
+        index.close()
+    _indexes.clear()
@@ -0,0 +1,272 @@
+import math
+import time
+import asyncio
+import builtins
+import logging
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Largest file a sandboxed task may write; a larger write kills the worker.
+MAX_FILE_SIZE_MB = 16
+
+def _set_limit(name, soft, hard=None):
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return
+    limit = getattr(resource, name, None)
+    if limit is None:
+        return
+    try:
+        resource.setrlimit(limit, (soft, soft if hard is None else hard))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Could not apply sandbox resource limit {name}: {e}")
+
+def _apply_limits(memory_limit_mb):
+    """
+    Caps the worker's address space and the size of files it writes, stops it
+    from starting processes and disables core dumps, where the OS allows it.
+    """
+    if memory_limit_mb:
+        limit = int(memory_limit_mb) * 1024 * 1024
+        _set_limit("RLIMIT_AS", limit)
+    _set_limit("RLIMIT_FSIZE", MAX_FILE_SIZE_MB * 1024 * 1024)
+    # Counts threads too on Linux; tasks get none beyond the worker's main thread.
+    _set_limit("RLIMIT_NPROC", 0)
+    _set_limit("RLIMIT_CORE", 0)
+
+def _limit_cpu_time(cpu_limit):
+    """
+    Lets the next task use `cpu_limit` more seconds of CPU time before the
+    kernel kills the worker, in case nobody is left to enforce the timeout.
+    RLIMIT_CPU counts the process's whole lifetime, so it is raised before each task.
+    """
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_limit)
+    _set_limit("RLIMIT_CPU", soft, resource.getrlimit(resource.RLIMIT_CPU)[1])
+
+def _worker_main(conn, memory_limit_mb, cpu_limit=None):
+    """
+    Entry point of a sandbox process: runs tasks received over `conn` one at a time.
+
+    A task is either a program (a string), answered with True if it ran to
+    completion, or a (function, args) pair, answered with the function's return
+    value. Either is answered with False if it raises.
+
+    Each reply is paired with whether the process is still clean: False once a
+    task raised (it may have stopped halfway through patching something) or
+    changed the builtins module, so that the pool replaces the worker before
+    the next program can see what this one left behind.
+
+    With `cpu_limit`, a task that uses more than that many seconds of CPU time
+    kills the process.
+    """
+    _apply_limits(memory_limit_mb)
+    pristine_builtins = dict(vars(builtins))
+    conn.send("ready")
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        clean = True
+        if cpu_limit:
+            _limit_cpu_time(cpu_limit)
+        try:
+            if isinstance(task, str):
+                # Fresh globals and a private copy of the builtins per program, so
+                # that rebinding a builtin by name does not reach the next program.
+                exec(task, {"__builtins__": dict(pristine_builtins)})
+                reply = True
+            else:
+                function, args = task
+                reply = function(*args)
+        except BaseException:
+            reply = False
+            clean = False
+        if vars(builtins) != pristine_builtins:
+            clean = False
+        conn.send((reply, clean))
+
+class SandboxWorker:
+    """A long-lived child process that executes untrusted programs (or isolated calls) sent over a pipe."""
+
+    def __init__(self, context, memory_limit_mb, startup_timeout=60.0, cpu_limit=None):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_limit_mb, cpu_limit), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks_run = 0
+        # False once a task may have left state behind; see _worker_main.
+        self.clean = True
+        # Block until the child is ready so interpreter startup (which re-imports
+        # the __main__ module) never counts against a program's timeout.
+        try:
+            ready = self.conn.poll(startup_timeout) and self.conn.recv() == "ready"
+        except (EOFError, OSError):
+            ready = False
+        if not ready:
+            self.kill()
+            raise RuntimeError("Sandbox worker failed to start")
+
+    def execute(self, code_to_run, timeout):
+        """
+        Runs one program, blocking for at most `timeout` seconds.
+
+        Returns:
+            A (passed, error) tuple. `error` is "Timeout" or a process-exit message
+            when the worker is no longer usable and must be replaced.
+        """
+        self.tasks_run += 1
+        try:
+            self.conn.send(code_to_run)
+            if not self.conn.poll(timeout):
+                return False, "Timeout"
+            passed, self.clean = self.conn.recv()
+            return passed, None
+        except (EOFError, OSError):
+            self.process.join(timeout=1.0)
+            return False, f"Process exited with code {self.process.exitcode}"
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=1.0)
+        self.kill()
+
+class SandboxPool:
+    """
+    A pool of pre-started sandbox processes for executing generated code.
+
+    Programs are awaited from the event loop (the blocking wait runs in a thread),
+    so code execution overlaps with outstanding API calls. A worker that times out
+    or dies is killed and replaced, and so is one whose program raised or
+    patched the builtins module, so that monkeypatching cannot leak into the
+    next program. Workers are also recycled after `max_tasks_per_worker`
+    programs so state leaked by passing programs cannot accumulate indefinitely.
+    """
+
+    def __init__(self, size=4, timeout=10.0, memory_limit_mb=1024, max_tasks_per_worker=100):
+        self.size = max(1, int(size))
+        self.timeout = float(timeout)
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        # 'spawn' starts workers from a fresh interpreter instead of a copy of the
+        # parent's (possibly large) address space, which the memory rlimit would count.
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = None
+        self._executor = None
+        self._workers = []
+        self.programs_run = 0
+        self._first_start = None
+        self._last_end = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="sandbox")
+        self._idle = asyncio.Queue()
+        workers = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, self._new_worker) for _ in range(self.size))
+        )
+        for worker in workers:
+            self._idle.put_nowait(worker)
+        logger.info(f"Started {self.size} sandbox workers (timeout {self.timeout}s, memory limit {self.memory_limit_mb} MB)")
+
+    def _new_worker(self):
+        # The CPU limit is a backstop for the timeout, one second coarser.
+        worker = SandboxWorker(self._context, self.memory_limit_mb, cpu_limit=self.timeout + 1)
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker):
+        worker.kill()
+        self._workers.remove(worker)
+        return self._new_worker()
+
+    def _execute(self, worker, code_to_run):
+        """Runs in an executor thread; returns the result and the worker to hand back."""
+        passed, error = worker.execute(code_to_run, self.timeout)
+        if error is not None or not worker.clean or worker.tasks_run >= self.max_tasks_per_worker:
+            worker = self._replace(worker)
+        return passed, error, worker
+
+    async def run(self, code_to_run):
+        """
+        Executes a program in the next idle worker.
+
+        Returns:
+            A (passed, error) tuple, where error is None, "Timeout" or an exit message.
+        """
+        return await self._run_task(code_to_run)
+
+    async def call(self, function, *args):
+        """
+        Calls a picklable module-level `function` in the next idle worker, under the
+        same timeout and memory limit as programs.
+
+        Returns:
+            A (result, error) tuple. `result` is False if the function raised or
+            the worker timed out or died.
+        """
+        return await self._run_task((function, args))
+
+    async def _run_task(self, task):
+        worker = await self._idle.get()
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        if self._first_start is None:
+            self._first_start = start
+        execution = loop.run_in_executor(self._executor, self._execute, worker, task)
+        try:
+            passed, error, worker = await asyncio.shield(execution)
+        except asyncio.CancelledError:
+            # The executor thread is still using the worker's pipe; the worker goes
+            # back to the pool only once its task is over.
+            execution.add_done_callback(functools.partial(self._hand_back, worker))
+            raise
+        except BaseException:
+            self._idle.put_nowait(worker)
+            raise
+        self._idle.put_nowait(worker)
+        self.programs_run += 1
+        self._last_end = time.perf_counter()
+        return passed, error
+
+    def _hand_back(self, worker, execution):
+        """Returns the worker _execute() ended with (or `worker`, if it raised) to the pool."""
+        if not execution.cancelled() and execution.exception() is None:
+            worker = execution.result()[2]
+        self._idle.put_nowait(worker)
+
+    def stats(self):
+        """Returns the number of programs executed and the pool's throughput in programs/sec."""
+        elapsed = (self._last_end - self._first_start) if self.programs_run else 0.0
+        return {
+            "programs_run": self.programs_run,
+            "programs_per_sec": self.programs_run / elapsed if elapsed > 0 else 0.0,
+        }
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        workers, self._workers = self._workers, []
+        if workers:
+            await asyncio.gather(*(loop.run_in_executor(self._executor, w.close) for w in workers))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
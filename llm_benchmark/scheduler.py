@@ -0,0 +1,254 @@
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEDULER_SETTINGS = {
+    "enabled": False,
+    "policy": "sjf",
+    "concurrency": None,
+    "prompt_token_weight": 0.1,
+    "weights": {},
+    "deadlines": {},
+}
+
+POLICIES = ("sjf", "fair", "deadline")
+
+# Observed samples after which a benchmark's measured token usage counts as much
+# as its prior estimate.
+PRIOR_WEIGHT = 5
+
+def scheduler_settings(eval_config):
+    """Returns the work-queue settings: the defaults, updated by `evaluation.scheduler`."""
+    settings = dict(DEFAULT_SCHEDULER_SETTINGS)
+    settings.update(eval_config.get('scheduler') or {})
+    if settings['policy'] not in POLICIES:
+        logger.error(f"Unknown scheduler policy '{settings['policy']}' (expected one of {', '.join(POLICIES)}); using sjf.")
+        settings['policy'] = "sjf"
+    return settings
+
+def observed_tokens(result):
+    """
+    Returns the (prompt, completion) tokens a sample's requests reported, or None
+    for cached or failed samples, whose cost says nothing about the endpoint.
+    """
+    telemetry = (result or {}).get("telemetry") or {}
+    if telemetry.get("cached") or telemetry.get("completion_tokens") is None:
+        return None
+    completion_tokens = telemetry["completion_tokens"] + (result.get("sampling_tokens") or 0)
+    return telemetry.get("prompt_tokens") or 0, completion_tokens
+
+class _Source:
+    """One benchmark's stream of samples, as seen by the work queue."""
+
+    def __init__(self, name, jobs, prompt_tokens, completion_tokens, max_in_flight, order):
+        self.name = name
+        self.jobs = jobs
+        self.order = order
+        self.max_in_flight = max_in_flight
+        self.prior = (prompt_tokens, completion_tokens)
+        self.observed_prompt = 0
+        self.observed_completion = 0
+        self.observations = 0
+        self.in_flight = 0
+        self.started = 0
+        self.service = 0.0
+        self.exhausted = False
+        self.finished_at = None
+        self.done = asyncio.get_running_loop().create_future()
+
+    def expected_tokens(self):
+        """(prompt, completion) tokens per sample: the prior, refined by observed usage."""
+        weight = PRIOR_WEIGHT + self.observations
+        prompt = (self.prior[0] * PRIOR_WEIGHT + self.observed_prompt) / weight
+        completion = (self.prior[1] * PRIOR_WEIGHT + self.observed_completion) / weight
+        return prompt, completion
+
+    def observe(self, result):
+        tokens = observed_tokens(result)
+        if tokens is not None:
+            self.observed_prompt += tokens[0]
+            self.observed_completion += tokens[1]
+            self.observations += 1
+
+    @property
+    def ready(self):
+        return not self.exhausted and (self.max_in_flight is None or self.in_flight < self.max_in_flight)
+
+class WorkQueue:
+    """
+    A single pool of workers serving every benchmark of one model.
+
+    Each benchmark registers its samples as a lazy stream of jobs; whenever a
+    worker is free it takes the next job from the benchmark the policy picks:
+
+    - `sjf`: shortest expected job first. A job's cost is its benchmark's expected
+      completion tokens plus `prompt_token_weight` times its prompt tokens; quick
+      benchmarks (e.g. MMLU) finish first while long generations keep the
+      remaining workers busy.
+    - `fair`: the benchmark that has received the least expected cost so far,
+      divided by its `weights` entry (default 1), so that each gets a share of
+      the endpoint.
+    - `deadline`: earliest `deadlines` entry first (seconds from the start; none
+      means no deadline), then shortest expected job.
+
+    Expected tokens start from each benchmark's estimate and are refined with the
+    usage its requests report. Jobs are drawn only when a worker is free, so
+    benchmarks that stop early simply stop yielding samples.
+    """
+
+    def __init__(self, settings, concurrency):
+        self.policy = settings['policy']
+        self.prompt_token_weight = float(settings['prompt_token_weight'])
+        self.weights = settings.get('weights') or {}
+        self.deadlines = settings.get('deadlines') or {}
+        self.concurrency = max(1, int(concurrency))
+        self.sources = []
+        self.finished = []
+        # Worker task -> the source it is running a job for (None between jobs).
+        self._workers = {}
+        self._registered = 0
+        self.started = None
+
+    def expected_cost(self, source):
+        prompt, completion = source.expected_tokens()
+        return completion + self.prompt_token_weight * prompt
+
+    def _priority(self, source):
+        if self.policy == "fair":
+            return (source.service / float(self.weights.get(source.name, 1.0)), source.order)
+        if self.policy == "deadline":
+            return (float(self.deadlines.get(source.name, float('inf'))), self.expected_cost(source), source.order)
+        return (self.expected_cost(source), source.order)
+
+    async def run(self, name, jobs, prompt_tokens, completion_tokens, max_in_flight=None):
+        """
+        Runs a benchmark's jobs on the shared workers and returns once all of them
+        have completed.
+
+        Args:
+            name (str): The benchmark, as used in `weights` and `deadlines`.
+            jobs (iterator): Yields coroutine functions, one per sample, each
+                             returning the sample's result dict.
+            prompt_tokens (float): Prompt tokens expected per sample.
+            completion_tokens (float): Completion tokens expected per sample.
+            max_in_flight (int): Optional cap on this benchmark's concurrent jobs.
+        """
+        if self.started is None:
+            self.started = time.perf_counter()
+        source = _Source(name, iter(jobs), prompt_tokens, completion_tokens, max_in_flight, self._registered)
+        self._registered += 1
+        self.sources.append(source)
+        self._start_workers()
+        await source.done
+
+    def _start_workers(self):
+        for _ in range(self.concurrency - len(self._workers)):
+            worker = asyncio.ensure_future(self._worker())
+            self._workers[worker] = None
+            worker.add_done_callback(self._worker_done)
+
+    def _worker_done(self, worker):
+        """
+        Propagates a worker's unexpected exit: the benchmark it was serving (or,
+        between jobs, every benchmark still running) fails instead of waiting
+        forever, and the remaining benchmarks get a replacement worker.
+        """
+        source = self._workers.pop(worker, None)
+        if not worker.cancelled() and worker.exception() is None:
+            return
+        affected = [source] if source is not None else list(self.sources)
+        if worker.cancelled():
+            for source in affected:
+                self._fail(source, None)
+            return
+        error = worker.exception()
+        logger.error(f"Work queue worker failed: {error!r}")
+        for source in affected:
+            self._fail(source, error)
+        if self.sources:
+            self._start_workers()
+
+    def _next_source(self):
+        ready = [source for source in self.sources if source.ready]
+        return min(ready, key=self._priority) if ready else None
+
+    async def _worker(self):
+        # Exits when no benchmark can take another job; workers are started again
+        # when a benchmark registers, and a finishing job's worker keeps going.
+        task = asyncio.current_task()
+        while True:
+            self._workers[task] = None
+            source = self._next_source()
+            if source is None:
+                # Removed right away, so that a benchmark registering next starts a replacement.
+                del self._workers[task]
+                return
+            try:
+                job = next(source.jobs)
+            except StopIteration:
+                source.exhausted = True
+                self._maybe_finish(source)
+                continue
+            except Exception as e:
+                self._fail(source, e)
+                continue
+            source.in_flight += 1
+            source.started += 1
+            self._workers[task] = source
+            source.service += self.expected_cost(source)
+            try:
+                result = await job()
+            except Exception as e:
+                self._fail(source, e)
+                continue
+            finally:
+                source.in_flight -= 1
+            source.observe(result)
+            self._maybe_finish(source)
+
+    def _maybe_finish(self, source):
+        if source.exhausted and source.in_flight == 0 and not source.done.done():
+            source.finished_at = time.perf_counter()
+            self.sources.remove(source)
+            self.finished.append(source)
+            source.done.set_result(None)
+
+    def _fail(self, source, error):
+        # Like an exception in a benchmark's own workers, this fails that benchmark's
+        # run; without an error (the worker was cancelled), the run is cancelled.
+        source.exhausted = True
+        if not source.done.done():
+            source.finished_at = time.perf_counter()
+            self.sources.remove(source)
+            self.finished.append(source)
+            if error is None:
+                source.done.cancel()
+            else:
+                source.done.set_exception(error)
+
+    def stats(self):
+        """Per benchmark: samples run, finish time since the queue started, and expected tokens per sample."""
+        stats = []
+        for source in self.finished + self.sources:
+            prompt, completion = source.expected_tokens()
+            stats.append({
+                "benchmark": source.name,
+                "samples": source.started,
+                "finished_after": None if source.finished_at is None else source.finished_at - self.started,
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+            })
+        return stats
+
+def format_scheduler_stats(policy, stats):
+    """Formats WorkQueue.stats() as a single log line."""
+    parts = []
+    for entry in stats:
+        finished = "running" if entry['finished_after'] is None else f"done at {entry['finished_after']:.1f}s"
+        parts.append(
+            f"{entry['benchmark']} {entry['samples']} samples, {finished}, "
+            f"~{entry['prompt_tokens']:.0f}+{entry['completion_tokens']:.0f} tokens/sample"
+        )
+    return f"policy {policy}: " + "; ".join(parts)
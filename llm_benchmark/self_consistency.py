@@ -0,0 +1,78 @@
+from collections import Counter
+
+DEFAULT_SELF_CONSISTENCY_SETTINGS = {
+    "k": 1,
+    "temperature": 0.7,
+    "max_tokens": None,
+    "early_stop": True,
+}
+
+def self_consistency_settings(benchmark_params):
+    """Returns the self-consistency settings: the defaults, updated by the benchmark's `self_consistency:` section."""
+    settings = dict(DEFAULT_SELF_CONSISTENCY_SETTINGS)
+    settings.update(benchmark_params.get('self_consistency') or {})
+    settings['k'] = max(1, int(settings['k']))
+    return settings
+
+def majority_vote(keys):
+    """
+    Returns (winning answer key, its votes). Chains without a parsable answer
+    (key None) do not vote; ties go to the answer seen first.
+    """
+    counts = Counter(key for key in keys if key is not None)
+    if not counts:
+        return None, 0
+    # Counter keeps insertion order, and max() returns the first maximal key.
+    winner = max(counts, key=counts.get)
+    return winner, counts[winner]
+
+def _top_two(keys):
+    counts = sorted(Counter(key for key in keys if key is not None).values(), reverse=True) + [0, 0]
+    return counts[0], counts[1]
+
+def majority_decided(keys, remaining):
+    """Whether `remaining` more chains could no longer change the majority answer."""
+    leader, runner_up = _top_two(keys)
+    return leader > runner_up + remaining
+
+def next_round_size(keys, remaining):
+    """
+    The fewest further chains that could settle the vote: the number that, all
+    agreeing with the current leader, would put it out of reach.
+    """
+    leader, runner_up = _top_two(keys)
+    return min(remaining, (runner_up + remaining - leader) // 2 + 1)
+
+async def draw_votes(draw, answer_key, k, early_stop=True):
+    """
+    Draws up to `k` chains and parses each one's answer.
+
+    Without early stopping all `k` chains are requested at once. With it, chains
+    are requested in rounds, each just large enough to possibly decide the vote,
+    until the majority answer can no longer change.
+
+    Args:
+        draw: Coroutine function (n, offset) -> list of up to n completions;
+              `offset` counts the chains requested before.
+        answer_key: Function completion -> hashable answer, or None if the
+                    completion has no parsable answer.
+        k (int): Maximum number of chains.
+        early_stop (bool): Stop once the majority is decided.
+
+    Returns:
+        (completions, answer keys, number of chains requested)
+    """
+    completions, keys = [], []
+    requested = 0
+    while requested < k:
+        remaining = k - requested
+        n = next_round_size(keys, remaining) if early_stop else remaining
+        drawn = await draw(n, requested)
+        requested += n
+        completions += drawn
+        keys += [answer_key(completion) for completion in drawn]
+        if not drawn:
+            break  # the endpoint is failing; do not keep asking
+        if early_stop and majority_decided(keys, k - requested):
+            break
+    return completions, keys, requested
@@ -0,0 +1,111 @@
+import os
+import math
+import logging
+from .stats import INTERVALS
+from .results_store import find_results, stored_accuracy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EARLY_STOPPING_SETTINGS = {
+    "enabled": False,
+    "method": "wilson",
+    "confidence": 0.95,
+    "target_width": 0.05,
+    "min_samples": 100,
+    "check_growth": 1.1,
+    "seed": 0,
+}
+
+def early_stopping_settings(benchmark_config, benchmark_params):
+    """
+    Returns the early-stopping settings: the defaults, updated by the evaluation
+    level `early_stopping:` section and then by the benchmark's own.
+    """
+    settings = dict(DEFAULT_EARLY_STOPPING_SETTINGS)
+    settings.update(benchmark_config.get('early_stopping') or {})
+    settings.update(benchmark_params.get('early_stopping') or {})
+    return settings
+
+def load_baseline(settings, results_store, model_name, benchmark_name):
+    """
+    Returns the baseline accuracy to compare against: `baseline_score` if set,
+    otherwise the accuracy stored for `baseline_run` (by `baseline_model`, this
+    model by default). Returns None if neither is configured or nothing is stored.
+    """
+    if settings.get('baseline_score') is not None:
+        return float(settings['baseline_score'])
+    run_id = settings.get('baseline_run')
+    if not run_id:
+        return None
+    if not isinstance(results_store, dict):
+        results_store = {}
+    directory = results_store.get('dir', os.path.join('results', 'samples'))
+    paths = find_results(directory, str(run_id), settings.get('baseline_model') or model_name, benchmark_name)
+    if not paths:
+        logger.warning(f"No stored {benchmark_name} results for run {run_id} in {directory}; early stopping ignores the baseline.")
+        return None
+    correct, total = stored_accuracy(paths[0])
+    return correct / total if total else None
+
+class SequentialMonitor:
+    """
+    Tracks running accuracy as results arrive and decides when to stop.
+
+    A confidence interval for the accuracy is computed once `min_samples` results
+    are in, and again each time the count has grown by a factor `check_growth`.
+    Evaluation stops when the interval is narrower than `target_width`, or lies
+    entirely above or below the baseline.
+
+    Looking at the interval repeatedly would inflate the error rate of a fixed
+    confidence level, so the k-th check uses error budget alpha / (k * (k + 1)).
+    These budgets sum to alpha, so the stated confidence holds over the whole run;
+    spacing checks geometrically keeps the number of checks, and so the cost of
+    this correction, small.
+    """
+
+    def __init__(self, settings, baseline=None):
+        self.interval = INTERVALS[settings.get('method', 'wilson')]
+        self.alpha = 1 - float(settings.get('confidence', 0.95))
+        self.target_width = settings.get('target_width')
+        self.min_samples = int(settings.get('min_samples', 100))
+        self.check_growth = max(1.0, float(settings.get('check_growth', 1.1)))
+        self.next_check = self.min_samples
+        self.baseline = baseline
+        self.correct = 0
+        self.total = 0
+        self.checks = 0
+        self.bounds = (0.0, 1.0)
+        self.stop_reason = None
+
+    @property
+    def stopped(self):
+        return self.stop_reason is not None
+
+    def observe(self, result):
+        """Records one sample's result and re-checks the stopping rule when due."""
+        self.total += 1
+        self.correct += bool(result.get("correct", False))
+        if self.stopped or self.total < self.next_check:
+            return
+        self.next_check = max(self.total + 1, math.ceil(self.total * self.check_growth))
+        self.checks += 1
+        confidence = 1 - self.alpha / (self.checks * (self.checks + 1))
+        low, high = self.bounds = self.interval(self.correct, self.total, confidence)
+        if self.baseline is not None and low > self.baseline:
+            self.stop_reason = "above baseline"
+        elif self.baseline is not None and high < self.baseline:
+            self.stop_reason = "below baseline"
+        elif self.target_width is not None and high - low <= self.target_width:
+            self.stop_reason = "target width reached"
+
+    def summary(self, dataset_size):
+        """Metrics describing the outcome, for the report."""
+        low, high = self.bounds
+        metrics = {
+            "Early Stopping": self.stop_reason or "not triggered",
+            "Samples Evaluated": f"{self.total} / {dataset_size}",
+            "Sequential Interval": f"{low:.4f} - {high:.4f}",
+        }
+        if self.baseline is not None:
+            metrics["Baseline Score"] = self.baseline
+        return metrics
@@ -0,0 +1,136 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Latest commit of each Hugging Face dataset repository, resolved once per process.
+_resolved_commits = {}
+
+# Name under which the evaluated dataset itself is stored in a snapshot.
+DATASET_ENTRY = "__dataset__"
+METADATA_FILE = "snapshot.json"
+# Per snapshot directory: the commit of each dataset repository that the newest
+# snapshots were built from, used when the Hub cannot be reached.
+REVISIONS_FILE = "revisions.json"
+
+def resolve_dataset_commit(path, timeout=10.0):
+    """
+    Returns the current commit hash of the Hugging Face dataset repository
+    `path`, or None when it cannot be resolved (offline, unknown repository).
+    """
+    if not path:
+        return None
+    if path not in _resolved_commits:
+        try:
+            from huggingface_hub import HfApi
+            _resolved_commits[path] = HfApi().dataset_info(path, timeout=timeout).sha
+        except Exception as e:
+            logger.debug(f"Could not resolve the latest revision of {path}: {e}")
+            _resolved_commits[path] = None
+    return _resolved_commits[path]
+
+def _read_revisions(directory):
+    try:
+        with open(os.path.join(directory, REVISIONS_FILE), encoding='utf-8') as f:
+            revisions = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return revisions if isinstance(revisions, dict) else {}
+
+def recorded_dataset_commit(directory, path):
+    """Returns the commit of dataset `path` last passed to record_dataset_commit() for `directory`, or None."""
+    return _read_revisions(directory).get(path)
+
+def record_dataset_commit(directory, path, commit):
+    """
+    Remembers that `directory` holds snapshots of dataset `path` at `commit`, so
+    that offline runs can open them without resolving the latest commit.
+    """
+    revisions = _read_revisions(directory)
+    if revisions.get(path) == commit:
+        return
+    revisions[path] = commit
+    os.makedirs(directory, exist_ok=True)
+    temporary = os.path.join(directory, f"{REVISIONS_FILE}.tmp-{os.getpid()}")
+    with open(temporary, "w", encoding='utf-8') as f:
+        json.dump(revisions, f, indent=2, sort_keys=True)
+    os.replace(temporary, os.path.join(directory, REVISIONS_FILE))
+
+def snapshot_path(directory, benchmark_name, key):
+    """Returns the snapshot directory for one benchmark and snapshot key."""
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directory, benchmark_name, digest)
+
+def save_snapshot(path, key, dataset, state):
+    """
+    Writes the evaluated dataset and the attributes load_data() set to `path`.
+
+    Dataset-valued attributes (few-shot pools) are stored as Arrow files, with
+    any select()/shuffle() index mapping flattened so that only the selected rows
+    are kept; other attributes must be JSON-serializable.
+
+    Returns:
+        True if the snapshot was written, False if some attribute cannot be stored.
+    """
+    from datasets import Dataset
+
+    datasets = {DATASET_ENTRY: dataset}
+    plain_state = {}
+    for name, value in state.items():
+        if isinstance(value, Dataset):
+            datasets[name] = value
+        else:
+            plain_state[name] = value
+    try:
+        encoded_state = json.dumps(plain_state)
+    except TypeError:
+        logger.warning(f"Cannot snapshot {path}: load_data() set attributes that are not datasets or JSON values.")
+        return False
+
+    temporary = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    for name, value in datasets.items():
+        value.flatten_indices().save_to_disk(os.path.join(temporary, name))
+    with open(os.path.join(temporary, METADATA_FILE), "w", encoding='utf-8') as f:
+        json.dump({"key": key, "datasets": sorted(datasets), "state": json.loads(encoded_state)}, f)
+    try:
+        os.rename(temporary, path)
+    except OSError:
+        # Another process finished the same snapshot first.
+        shutil.rmtree(temporary, ignore_errors=True)
+    return True
+
+def load_snapshot(path, key):
+    """
+    Opens a snapshot written by save_snapshot(). The Arrow files are memory-mapped,
+    so this takes milliseconds and needs no network access.
+
+    Returns:
+        (dataset, state), or None if there is no complete snapshot for `key` at `path`.
+    """
+    from datasets import load_from_disk
+
+    metadata_path = os.path.join(path, METADATA_FILE)
+    if not os.path.exists(metadata_path):
+        return None
+    try:
+        with open(metadata_path, encoding='utf-8') as f:
+            metadata = json.load(f)
+        if metadata.get("key") != key:
+            return None
+        state = dict(metadata.get("state") or {})
+        dataset = None
+        for name in metadata["datasets"]:
+            loaded = load_from_disk(os.path.join(path, name))
+            if name == DATASET_ENTRY:
+                dataset = loaded
+            else:
+                state[name] = loaded
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable dataset snapshot {path}: {e}")
+        return None
+    return dataset, state
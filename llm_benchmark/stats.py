@@ -0,0 +1,97 @@
+import math
+from statistics import NormalDist
+
+def z_score(confidence=0.95):
+    """Returns the two-sided standard normal quantile for a confidence level."""
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+def wilson_interval(successes, total, confidence=0.95):
+    """
+    Returns the Wilson score interval (low, high) for a binomial proportion.
+
+    Unlike the normal approximation it stays inside [0, 1] and behaves well for
+    small samples and accuracies near 0 or 1, as in per-subject breakdowns.
+    Returns (0.0, 1.0) when `total` is 0.
+    """
+    if total <= 0:
+        return 0.0, 1.0
+    z = z_score(confidence)
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    low = 0.0 if successes == 0 else max(0.0, center - margin)
+    high = 1.0 if successes == total else min(1.0, center + margin)
+    return low, high
+
+def grouped_accuracy(groups, results, confidence=0.95):
+    """
+    Accuracy with a Wilson interval for each group of samples.
+
+    Args:
+        groups (list): The group name of each sample, aligned with `results`.
+        results (list): Per-sample result dicts with a 'correct' field.
+        confidence (float): Confidence level of the intervals.
+
+    Returns:
+        A list of dicts (group, correct, total, accuracy, ci_low, ci_high), sorted
+        by group name.
+    """
+    counts = {}
+    for group, result in zip(groups, results):
+        correct, total = counts.get(group, (0, 0))
+        counts[group] = (correct + bool(result.get("correct", False)), total + 1)
+    rows = []
+    for group in sorted(counts):
+        correct, total = counts[group]
+        low, high = wilson_interval(correct, total, confidence)
+        rows.append({
+            "group": group,
+            "correct": correct,
+            "total": total,
+            "accuracy": correct / total,
+            "ci_low": low,
+            "ci_high": high,
+        })
+    return rows
+
+def bernstein_interval(successes, total, confidence=0.95):
+    """
+    Returns an empirical Bernstein interval (low, high) for the mean of a 0/1
+    outcome (Maurer & Pontil, 2009). It is wider than Wilson's for small samples
+    but is a finite-sample bound rather than an asymptotic approximation.
+    Returns (0.0, 1.0) when fewer than two samples are available.
+    """
+    if total < 2:
+        return 0.0, 1.0
+    delta = 1 - confidence
+    p = successes / total
+    # Unbiased sample variance of a Bernoulli sample.
+    variance = p * (1 - p) * total / (total - 1)
+    log_term = math.log(4 / delta)  # two-sided: delta/2 per side
+    margin = math.sqrt(2 * variance * log_term / total) + 7 * log_term / (3 * (total - 1))
+    return max(0.0, p - margin), min(1.0, p + margin)
+
+INTERVALS = {
+    "wilson": wilson_interval,
+    "bernstein": bernstein_interval,
+}
+
+def mcnemar_test(regressions, improvements):
+    """
+    Two-sided p-value of McNemar's test for paired 0/1 outcomes.
+
+    Only discordant pairs matter: `regressions` samples correct in the baseline
+    and wrong in the candidate, `improvements` the reverse. Uses the exact
+    binomial test, or the continuity-corrected chi-square approximation when
+    there are more than 1000 discordant pairs. Returns 1.0 when there are none.
+    """
+    n = regressions + improvements
+    if n == 0:
+        return 1.0
+    if n <= 1000:
+        k = min(regressions, improvements)
+        tail = sum(math.comb(n, i) for i in range(k + 1)) / 2 ** n
+        return min(1.0, 2 * tail)
+    chi_square = (abs(regressions - improvements) - 1) ** 2 / n
+    return math.erfc(math.sqrt(chi_square / 2))
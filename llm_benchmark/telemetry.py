@@ -0,0 +1,54 @@
+import math
+
+def percentile(values, q):
+    """
+    Returns the q-th percentile (0-100) of `values` using linear interpolation
+    between closest ranks, or None for an empty sequence.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize_telemetry(records, wall_time=None):
+    """
+    Aggregates per-request telemetry (as filled in by call_api's `stats`) into
+    latency percentiles and throughput.
+
+    Args:
+        records (list): Telemetry dicts, one per evaluated sample.
+        wall_time (float): Seconds over which the requests were made; used for
+                           sustained tokens/sec and requests/sec.
+
+    Returns:
+        A dict of summary statistics. Latency values are in seconds; entries are
+        None when the data needed for them was not recorded (e.g. TTFT without
+        streaming).
+    """
+    live = [r for r in records if r and not r.get('cached') and 'latency' in r]
+    latencies = [r['latency'] for r in live]
+    ttfts = [r['ttft'] for r in live if r.get('ttft') is not None]
+    inter_token = [r['inter_token_latency'] for r in live if r.get('inter_token_latency') is not None]
+    prompt_tokens = sum(r.get('prompt_tokens') or 0 for r in live)
+    completion_tokens = sum(r.get('completion_tokens') or 0 for r in live)
+
+    summary = {
+        "requests": len(live),
+        "cached": sum(1 for r in records if r and r.get('cached')),
+        "retries": sum(r.get('retries', 0) for r in records if r),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "wall_time": wall_time,
+        "tokens_per_sec": completion_tokens / wall_time if wall_time else None,
+        "requests_per_sec": len(live) / wall_time if wall_time else None,
+        "inter_token_latency_mean": sum(inter_token) / len(inter_token) if inter_token else None,
+    }
+    for q in (50, 95, 99):
+        summary[f"latency_p{q}"] = percentile(latencies, q)
+        summary[f"ttft_p{q}"] = percentile(ttfts, q)
+    return summary
@@ -0,0 +1,102 @@
+import logging
+from .utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# One TokenCounter per encoding, shared by every model that uses it.
+_counters = {}
+
+# Tokens the chat format adds around each message, and before the reply
+# (as documented for OpenAI chat models; a close bound for most others).
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+# Entries kept in a counter's memo before it is cleared.
+MEMO_SIZE = 100_000
+
+class TokenCounter:
+    """
+    Counts tokens with a tiktoken encoding, memoizing counts by text.
+
+    With `encoding=None` (tiktoken or the encoding files unavailable) counts fall
+    back to the ~4 characters per token estimate.
+    """
+
+    def __init__(self, encoding=None):
+        self.encoding = encoding
+        self.name = encoding.name if encoding is not None else "estimate"
+        self._memo = {}
+
+    def count(self, text):
+        """Returns the number of tokens in `text`."""
+        count = self._memo.get(text)
+        if count is None:
+            count = len(self.encoding.encode_ordinary(text)) if self.encoding is not None else estimate_tokens(text)
+            self._remember(text, count)
+        return count
+
+    def count_many(self, texts):
+        """
+        Returns the token count of each text. Texts not seen before are encoded
+        in a single batch, which tiktoken spreads across threads.
+        """
+        unseen = list(dict.fromkeys(t for t in texts if t not in self._memo))
+        if unseen:
+            if self.encoding is not None:
+                counts = [len(tokens) for tokens in self.encoding.encode_ordinary_batch(unseen)]
+            else:
+                counts = [estimate_tokens(t) for t in unseen]
+            for text, count in zip(unseen, counts):
+                self._remember(text, count)
+        return [self._memo[t] if t in self._memo else self.count(t) for t in texts]
+
+    def count_messages(self, messages):
+        """Returns the prompt size of a list of chat messages, including the chat format overhead."""
+        contents = self.count_many([m.get('content') or '' for m in messages])
+        return sum(contents) + TOKENS_PER_MESSAGE * len(messages) + TOKENS_PER_REPLY
+
+    def _remember(self, text, count):
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        self._memo[text] = count
+
+def _load_encoding(model_config):
+    """Returns the tiktoken encoding for a model, or None if it cannot be loaded."""
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken is not installed; token counts are estimated from text length.")
+        return None
+    encoding_name = model_config.get('tokenizer')
+    try:
+        if encoding_name:
+            return tiktoken.get_encoding(encoding_name)
+        try:
+            return tiktoken.encoding_for_model(model_config['model_name'])
+        except KeyError:
+            # Not an OpenAI model name; its own tokenizer is usually close to this one.
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Encoding files are downloaded on first use and may be unreachable offline.
+        logger.warning(f"Could not load a tokenizer for {model_config['name']} ({e}); token counts are estimated from text length.")
+        return None
+
+def get_token_counter(model_config):
+    """
+    Returns the shared TokenCounter for a model.
+
+    The encoding is the model's `tokenizer:` setting (a tiktoken encoding name)
+    if given, otherwise tiktoken's encoding for `model_name`, falling back to
+    cl100k_base for models tiktoken does not know.
+    """
+    key = model_config.get('tokenizer') or model_config['model_name']
+    counter = _counters.get(key)
+    if counter is None:
+        encoding = _load_encoding(model_config)
+        counter = _counters.get(encoding.name) if encoding is not None else None
+        if counter is None:
+            counter = TokenCounter(encoding)
+            if encoding is not None:
+                _counters[encoding.name] = counter
+        _counters[key] = counter
+    return counter
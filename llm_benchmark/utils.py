@@ -1,11 +1,39 @@
+import time
 import yaml
+import random
+import contextlib
 import asyncio
 import logging
-from openai import AsyncOpenAI, APIError
+from datetime import datetime
+from types import SimpleNamespace
+from email.utils import parsedate_to_datetime
+from .ratelimit import get_limiter, reset_limiters
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
+# `openai` (and `datasets`, for load_dataset below) are imported on first use:
+# together they account for most of the package's import time.
+
+# One AsyncOpenAI client per (api_base, api_key), shared by every evaluator so
+# that requests to the same endpoint reuse pooled keep-alive connections.
+_clients = {}
+
+# Connection pool defaults, overridable per model under `connection:` in config.yaml.
+DEFAULT_CONNECTION_SETTINGS = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "timeout": 600.0,
+}
+
+# Optional process-wide cap on requests in flight across all endpoints.
+_global_request_limit = None
+_global_semaphore = None
+
+# Status codes worth retrying; other 4xx errors (bad request, auth) fail immediately.
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
 def load_config(config_path="configs/config.yaml"):
     """
     Loads the YAML configuration file.
@@ -20,7 +48,77 @@ def load_config(config_path="configs/config.yaml"):
         logger.error(f"Error parsing YAML file: {e}")
         raise
 
-async def call_api(model_config, messages, max_tokens, temperature):
+def get_client(model_config):
+    """
+    Returns the shared AsyncOpenAI client for a model's endpoint, creating it on first use.
+
+    Args:
+        model_config (dict): A model entry from config.yaml. An optional
+                             'connection' mapping overrides the pool settings in
+                             DEFAULT_CONNECTION_SETTINGS.
+
+    Returns:
+        An AsyncOpenAI client that is reused for every call to the same
+        api_base/api_key pair.
+    """
+    key = (model_config['api_base'], model_config['api_key'])
+    client = _clients.get(key)
+    if client is None:
+        try:
+            import httpx
+        except ImportError:  # openai>=3 ships its transport as httpx2
+            import httpx2 as httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        settings = {**DEFAULT_CONNECTION_SETTINGS, **model_config.get('connection', {})}
+        limits = httpx.Limits(
+            max_connections=settings['max_connections'],
+            max_keepalive_connections=settings['max_keepalive_connections'],
+            keepalive_expiry=settings['keepalive_expiry'],
+        )
+        client = AsyncOpenAI(
+            api_key=model_config['api_key'],
+            base_url=model_config['api_base'],
+            # Retries are handled by call_api so they go through the endpoint's limiter.
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(limits=limits, timeout=settings['timeout']),
+        )
+        _clients[key] = client
+        logger.debug(f"Created API client for {model_config['api_base']} with {settings}")
+    return client
+
+def set_global_request_limit(limit):
+    """
+    Caps the number of API requests in flight across all models and endpoints.
+    None or 0 removes the cap. Per-endpoint limits still apply underneath it.
+    """
+    global _global_request_limit, _global_semaphore
+    _global_request_limit = int(limit) if limit else None
+    _global_semaphore = None
+
+def _get_global_semaphore():
+    # Created lazily so it binds to the running event loop.
+    global _global_semaphore
+    if _global_request_limit and _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(_global_request_limit)
+    return _global_semaphore
+
+async def close_clients():
+    """
+    Closes every pooled client and drops the per-endpoint limiters.
+    Call once at shutdown, inside the running event loop.
+    """
+    reset_limiters()
+    set_global_request_limit(_global_request_limit)
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"Error while closing API client: {e}")
+
+async def call_api(model_config, messages, max_tokens, temperature, cache=None, stats=None):
     """
     Makes an asynchronous call to an OpenAI-compatible API with retry logic.
 
@@ -30,37 +128,307 @@ async def call_api(model_config, messages, max_tokens, temperature):
         messages (list): A list of message dictionaries for the chat prompt.
         max_tokens (int): The maximum number of tokens to generate.
         temperature (float): The sampling temperature.
+        cache (ResponseCache): Optional response cache consulted before, and
+                               filled after, the API call.
+        stats (dict): Optional dict filled with request telemetry: 'latency',
+                      'ttft' and 'inter_token_latency' (streaming only),
+                      'prompt_tokens', 'completion_tokens', 'retries', and
+                      'cached' for responses served from the cache.
 
     Returns:
         The model's response content as a string, or None if an error occurs
         after all retries.
     """
-    client = AsyncOpenAI(
-        api_key=model_config['api_key'],
-        base_url=model_config['api_base'],
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(model_config, messages, {"max_tokens": max_tokens, "temperature": temperature})
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if stats is not None:
+                stats['cached'] = True
+            return cached
+
+    response = await _create_chat_completion(
+        model_config,
+        messages,
+        stats=stats,
+        stream=model_config.get('stream', False),
+        max_tokens=max_tokens,
+        temperature=temperature,
+    )
+    if response is None:
+        return None
+    content = response.choices[0].message.content
+    if cache is not None and content is not None:
+        cache.put(cache_key, content)
+    return content
+
+async def call_api_n(model_config, messages, n, max_tokens, temperature, cache=None, stats=None, sample_offset=0):
+    """
+    Draws `n` completions for the same prompt.
+
+    Uses the `n` request parameter when the endpoint supports it (the model's
+    `supports_n` setting, default true). If the endpoint rejects `n` or returns
+    fewer choices than requested, the remainder is fetched with concurrent
+    single-completion requests.
+
+    Args:
+        model_config (dict): The model configuration.
+        messages (list): A list of message dictionaries for the chat prompt.
+        n (int): Number of completions to draw.
+        max_tokens (int): The maximum number of tokens per completion.
+        temperature (float): The sampling temperature.
+        cache (ResponseCache): Optional response cache; the full list of
+                               completions is cached under one key.
+        stats (dict): Optional telemetry dict, as for call_api. When several
+                      requests are made, token counts and retries are summed and
+                      the latency is that of the slowest request.
+        sample_offset (int): Number of completions already drawn for this prompt
+                             by earlier calls; part of the cache key, so that a
+                             later round is not served an earlier round's draws.
+
+    Returns:
+        A list of up to `n` completion strings. Failed draws are omitted, so the
+        list may be shorter (or empty) when requests fail after all retries.
+    """
+    cache_key = None
+    if cache is not None:
+        params = {"max_tokens": max_tokens, "temperature": temperature, "n": n}
+        if sample_offset:
+            params["offset"] = sample_offset
+        cache_key = cache.make_key(model_config, messages, params)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if stats is not None:
+                stats['cached'] = True
+            return cached
+
+    completions = []
+    request_stats = []
+    if n > 1 and model_config.get('supports_n', True):
+        request_stats.append({})
+        response = await _create_chat_completion(
+            model_config, messages, stats=request_stats[-1], max_tokens=max_tokens, temperature=temperature, n=n
+        )
+        if response is not None:
+            completions = [choice.message.content for choice in response.choices[:n]]
+
+    missing = n - len(completions)
+    if missing > 0:
+        fan_out_stats = [{} for _ in range(missing)]
+        request_stats += fan_out_stats
+        responses = await asyncio.gather(*(
+            _create_chat_completion(model_config, messages, stats=fan_out_stats[i], max_tokens=max_tokens, temperature=temperature)
+            for i in range(missing)
+        ))
+        completions += [r.choices[0].message.content for r in responses if r is not None]
+
+    if stats is not None:
+        _merge_request_stats(stats, request_stats)
+    completions = [c for c in completions if c is not None]
+    if cache is not None and len(completions) == n:
+        cache.put(cache_key, completions)
+    return completions
+
+def _merge_request_stats(stats, request_stats):
+    """Combines the telemetry of several requests made for one sample."""
+    completed = [r for r in request_stats if 'latency' in r]
+    if not completed:
+        return
+    stats['latency'] = max(r['latency'] for r in completed)
+    for key in ('prompt_tokens', 'completion_tokens'):
+        values = [r[key] for r in completed if r.get(key) is not None]
+        if values:
+            stats[key] = sum(values)
+    stats['retries'] = sum(r.get('retries', 0) for r in request_stats)
+    stats['requests'] = len(request_stats)
+
+async def _stream_chat_completion(client, model_config, messages, start, stats, **params):
+    """
+    Streams a chat completion, recording time to first token and mean
+    inter-token latency in `stats`.
+
+    Returns:
+        An object shaped like a non-streaming response (`choices[0].message.content`
+        and `usage`), so callers do not need to distinguish the two.
+    """
+    extra = {}
+    if model_config.get('stream_usage', True):
+        # Ask for a final chunk carrying token usage; disable for endpoints that reject it.
+        extra['stream_options'] = {"include_usage": True}
+    stream = await client.chat.completions.create(
+        model=model_config['model_name'],
+        messages=messages,
+        stream=True,
+        **extra,
+        **params,
     )
 
+    parts = []
+    usage = None
+    first_token_at = last_token_at = None
+    chunks_with_content = 0
+    async for chunk in stream:
+        if getattr(chunk, 'usage', None):
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            now = time.perf_counter()
+            if first_token_at is None:
+                first_token_at = now
+            last_token_at = now
+            chunks_with_content += 1
+            parts.append(delta)
+
+    if stats is not None and first_token_at is not None:
+        stats['ttft'] = first_token_at - start
+        generated = usage.completion_tokens if usage and usage.completion_tokens else chunks_with_content
+        stats['inter_token_latency'] = (last_token_at - first_token_at) / (generated - 1) if generated > 1 else 0.0
+
+    message = SimpleNamespace(role="assistant", content="".join(parts))
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message)], usage=usage)
+
+async def _create_chat_completion(model_config, messages, stats=None, stream=False, **params):
+    """
+    Sends one chat completion request through the endpoint's limiter, retrying
+    transient failures with jittered exponential backoff.
+
+    With `stream=True` the response is streamed so that time to first token can
+    be measured. Telemetry is written to `stats` if given.
+
+    Returns:
+        The API response object, or None if the request failed after all retries
+        or with a non-retryable error.
+    """
+    client = get_client(model_config)
+    estimated_tokens = estimate_message_tokens(messages) + params.get('max_tokens', 0) * params.get('n', 1)
+
+    async def send(start):
+        if stream:
+            return await _stream_chat_completion(client, model_config, messages, start, stats, **params)
+        return await client.chat.completions.create(
+            model=model_config['model_name'],
+            messages=messages,
+            **params,
+        )
+
+    return await _send_with_retries(model_config, send, estimated_tokens, stats)
+
+async def _create_completion(model_config, prompt, stats=None, **params):
+    """
+    Sends one request to the legacy completions endpoint (`prompt` may be a list
+    of prompts, answered in one call), with the same limiter and retry handling
+    as chat completions.
+
+    Returns:
+        The API response object, or None on failure.
+    """
+    client = get_client(model_config)
+    prompts = prompt if isinstance(prompt, list) else [prompt]
+    estimated_tokens = sum(estimate_tokens(p) for p in prompts) + params.get('max_tokens', 0) * len(prompts)
+
+    async def send(start):
+        return await client.completions.create(model=model_config['model_name'], prompt=prompt, **params)
+
+    return await _send_with_retries(model_config, send, estimated_tokens, stats)
+
+async def _send_with_retries(model_config, send, estimated_tokens, stats=None):
+    """
+    Runs `send(start)` (an API call started at perf_counter time `start`) through
+    the endpoint's limiter and the global in-flight cap, retrying transient
+    failures with jittered exponential backoff.
+
+    Returns:
+        The API response object, or None if the request failed after all retries
+        or with a non-retryable error.
+    """
+    from openai import APIError, APIConnectionError, APITimeoutError
+
+    limiter = get_limiter(model_config)
+
     max_retries = 5
     backoff_factor = 2
     initial_delay = 1
 
     for attempt in range(max_retries):
+        if stats is not None:
+            stats['retries'] = attempt
+        await limiter.acquire(estimated_tokens)
         try:
-            response = await client.chat.completions.create(
-                model=model_config['model_name'],
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-            )
-            return response.choices[0].message.content
+            # The endpoint slot is taken first, so a busy endpoint never holds
+            # global slots that other endpoints could use.
+            async with _get_global_semaphore() or contextlib.nullcontext():
+                start = time.perf_counter()
+                response = await send(start)
+                latency = time.perf_counter() - start
+        except asyncio.CancelledError:
+            await limiter.release("error")
+            raise
         except APIError as e:
+            status = getattr(e, 'status_code', None)
+            retryable = isinstance(e, (APIConnectionError, APITimeoutError)) or status in RETRYABLE_STATUS_CODES
+            retry_after = _retry_after_seconds(e)
+            await limiter.release("throttled" if retryable else "error", retry_after=retry_after)
+            if not retryable:
+                logger.error(f"Non-retryable API error: {e}")
+                return None
             logger.warning(f"API error occurred (attempt {attempt + 1}/{max_retries}): {e}. Retrying...")
             if attempt + 1 == max_retries:
                 logger.error("Max retries reached. API call failed.")
                 return None
-            delay = initial_delay * (backoff_factor ** attempt)
+            # Full jitter keeps concurrent retries from hitting the endpoint in lockstep.
+            # A Retry-After pause, if any, is enforced by the limiter on the next acquire().
+            delay = random.uniform(0, initial_delay * (backoff_factor ** attempt))
             await asyncio.sleep(delay)
         except Exception as e:
+            await limiter.release("error")
             logger.error(f"An unexpected error occurred: {e}")
             return None
+        else:
+            await limiter.release("ok")
+            if stats is not None:
+                stats['latency'] = latency
+                usage = getattr(response, 'usage', None)
+                if usage is not None:
+                    stats['prompt_tokens'] = usage.prompt_tokens
+                    stats['completion_tokens'] = usage.completion_tokens
+            return response
     return None
+
+def load_dataset(*args, **kwargs):
+    """datasets.load_dataset, importing `datasets` (and with it pyarrow and pandas) on first use."""
+    from datasets import load_dataset as hf_load_dataset
+    return hf_load_dataset(*args, **kwargs)
+
+def estimate_tokens(text):
+    """A cheap token count estimate (~4 characters per token)."""
+    return len(text) // 4
+
+def estimate_message_tokens(messages):
+    """A cheap prompt size estimate used for tokens/min budgeting."""
+    return sum(estimate_tokens(m.get('content') or '') for m in messages)
+
+def _retry_after_seconds(error):
+    """
+    Returns the server-requested delay from `retry-after-ms` / `Retry-After` headers, or None.
+    """
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000.0
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            # Retry-After may also be an HTTP date.
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return None
@@ -1,86 +1,407 @@
+import os
+import time
 import asyncio
 import logging
-import importlib
-from llm_benchmark.utils import load_config
-from llm_benchmark.report import generate_report
+import argparse
+from datetime import datetime
+from llm_benchmark.utils import load_config, close_clients, set_global_request_limit
+from llm_benchmark.benchmark import clear_shared_data
+from llm_benchmark.report import generate_report, generate_loadtest_report, generate_comparison_report
+from llm_benchmark.ratelimit import get_limiter, format_limiter_stats
+from llm_benchmark.cache import close_response_caches
+from llm_benchmark.checkpoint import latest_run_id
+from llm_benchmark.telemetry import summarize_telemetry
+from llm_benchmark.loadtest import DEFAULT_LOADTEST_SETTINGS, build_prompt_corpus, run_load_test
+from llm_benchmark.results_store import find_results, read_results, read_results_metadata
+from llm_benchmark.rescore import rescore_file
+from llm_benchmark.scheduler import WorkQueue, scheduler_settings, format_scheduler_stats
+from llm_benchmark.run_index import (
+    run_index_settings, get_run_index, close_run_indexes, find_baseline, compare_entries, describe_flips,
+)
+from llm_benchmark.distributed import Coordinator, distributed_settings, run_worker
+from llm_benchmark import registry
 
 # Setup basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def get_evaluator_class(benchmark_name):
-    """Dynamically imports and returns the evaluator class."""
-    # This mapping ensures the correct class name is always used.
-    class_name_map = {
-        "mmlu": "MMLUEvaluator",
-        "gsm8k": "GSM8KEvaluator",
-        "math": "MATHEvaluator",
-        "humaneval": "HumanEvalEvaluator",
-    }
-
-    class_name = class_name_map.get(benchmark_name)
-    if not class_name:
-        logging.error(f"No evaluator class mapping found for benchmark: '{benchmark_name}'")
-        return None
-
-    try:
-        module_name = f"llm_benchmark.evaluators.{benchmark_name}"
-        module = importlib.import_module(module_name)
-        return getattr(module, class_name)
-    except (ImportError, AttributeError) as e:
-        logging.error(f"Could not find or load evaluator for '{benchmark_name}': {e}")
-        return None
+    """Returns the evaluator class registered for a benchmark name, or None."""
+    return registry.get_evaluator_class(benchmark_name)
 
 async def run_model_evaluation(model_config, eval_config):
     """Runs all configured benchmarks for a single model."""
     logging.info(f"--- Starting evaluation for model: {model_config['name']} ---")
 
-    tasks = []
+    evaluators = []
     benchmark_names = eval_config.get('benchmarks', [])
 
     for bench_name in benchmark_names:
         EvaluatorClass = get_evaluator_class(bench_name)
         if EvaluatorClass:
             # Pass the top-level model config and the entire evaluation config
-            evaluator = EvaluatorClass(model_config, eval_config)
-            tasks.append(evaluator.run())
+            evaluators.append(EvaluatorClass(model_config, eval_config))
 
-    if not tasks:
+    if not evaluators:
         logging.warning(f"No valid benchmarks found for model {model_config['name']}. Skipping.")
         return
 
+    # With a scheduler, all benchmarks share one work queue instead of each
+    # keeping its own requests in flight.
+    queue = None
+    settings = scheduler_settings(eval_config)
+    if settings.get('enabled'):
+        queue = WorkQueue(settings, settings.get('concurrency') or model_config.get('concurrency', 1))
+        for evaluator in evaluators:
+            evaluator.work_queue = queue
+
     # Run all benchmark tasks concurrently for the current model
-    results = await asyncio.gather(*tasks)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(evaluator.run() for evaluator in evaluators))
+    wall_time = time.perf_counter() - started
 
     # Filter out any None results from failed benchmarks
     results = [r for r in results if r]
 
+    # How close this run came to the endpoint's quota
+    limiter_stats = get_limiter(model_config).stats()
+    logging.info(f"Endpoint {model_config['api_base']}: {format_limiter_stats(limiter_stats)}")
+    if queue is not None:
+        logging.info(f"Work queue for {model_config['name']}: {format_scheduler_stats(queue.policy, queue.stats())}")
+
+    # Latency and throughput across all of this model's benchmarks
+    records = [record for evaluator in evaluators for record in evaluator.telemetry_records]
+    performance = summarize_telemetry(records, wall_time)
+
     if results:
-        generate_report(results, model_config['name'])
+        generate_report(results, model_config['name'], performance=performance)
     else:
         logging.warning(f"No results were generated for model {model_config['name']}.")
 
     logging.info(f"--- Finished evaluation for model: {model_config['name']} ---")
 
-async def main():
+def _number_list(value):
+    """Parses a comma-separated list of numbers, e.g. '1,2,4.5'."""
+    return [float(v) if '.' in v else int(v) for v in value.split(',') if v.strip()]
+
+def parse_args(argv=None):
+    """Parses command-line options."""
+    parser = argparse.ArgumentParser(description="Run the LLM benchmark suite for all configured models.")
+    parser.add_argument("--config", default="configs/config.yaml", help="Path to the YAML configuration file.")
+    parser.add_argument("--run-id", help="Identifier under which per-sample checkpoints are stored. Defaults to a timestamp.")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip samples that already have checkpointed results (from --run-id, or the latest run).",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    loadtest = subparsers.add_parser(
+        "loadtest",
+        help="Drive a model's endpoint with benchmark prompts at increasing load and find its saturation point.",
+        description="Replays the configured benchmarks' prompts against one model, either at fixed Poisson "
+                    "arrival rates (open loop) or at fixed concurrency levels (closed loop). Settings default "
+                    "to the config file's `loadtest:` section.",
+    )
+    loadtest.add_argument("--config", default=argparse.SUPPRESS, help="Path to the YAML configuration file.")
+    loadtest.add_argument("--model", help="Name of the model to test. Defaults to the first configured model.")
+    loadtest.add_argument("--mode", choices=["poisson", "concurrency"], help="Open-loop arrival rates or closed-loop concurrency.")
+    loadtest.add_argument("--rates", type=_number_list, help="Comma-separated arrival rates (req/s) for poisson mode.")
+    loadtest.add_argument("--concurrency-levels", type=_number_list, help="Comma-separated concurrency levels.")
+    loadtest.add_argument("--step-duration", type=float, help="Seconds to hold each load level.")
+    loadtest.add_argument("--corpus-size", type=int, help="Number of benchmark prompts to replay.")
+
+    rescore = subparsers.add_parser(
+        "rescore",
+        help="Re-run answer extraction over a run's stored responses without calling the API.",
+        description="Re-scores the per-sample results stored for a run with the current process_response() "
+                    "code and writes the new results back in place.",
+    )
+    rescore.add_argument("--config", default=argparse.SUPPRESS, help="Path to the YAML configuration file.")
+    rescore.add_argument("--run-id", default=argparse.SUPPRESS, help="Run to rescore. Defaults to the most recent one.")
+    rescore.add_argument("--model", help="Only rescore this model's results.")
+    rescore.add_argument("--benchmark", help="Only rescore this benchmark's results.")
+    rescore.add_argument("--workers", type=int, help="Worker processes (default: one per CPU; 1 scores in-process).")
+
+    compare = subparsers.add_parser(
+        "compare",
+        help="Compare a run with a baseline run from the run index, without loading stored responses.",
+        description="Writes a report of score deltas, flipped samples and McNemar tests for every model and "
+                    "benchmark of a run, plus each one's score history. Settings default to the config "
+                    "file's `evaluation.run_index:` section.",
+    )
+    compare.add_argument("--config", default=argparse.SUPPRESS, help="Path to the YAML configuration file.")
+    compare.add_argument("--run-id", default=argparse.SUPPRESS, help="Run to compare. Defaults to the most recent one.")
+    compare.add_argument("--baseline", help="Baseline run id, or 'previous' for each benchmark's preceding run.")
+    compare.add_argument("--baseline-model", help="Compare against this model's results instead of the same model's.")
+    compare.add_argument("--model", help="Only compare this model's results.")
+    compare.add_argument("--benchmark", help="Only compare this benchmark's results.")
+    compare.add_argument("--history", type=int, default=10, help="Number of recent runs listed per benchmark.")
+
+    coordinate = subparsers.add_parser(
+        "coordinate",
+        help="Split the configured benchmarks into shards and serve them to worker processes.",
+        description="Runs the evaluation as a coordinator: workers on this or other hosts lease shards of each "
+                    "benchmark's dataset over HTTP, and their results are merged into the usual reports. "
+                    "Settings default to the config file's `evaluation.distributed:` section.",
+    )
+    coordinate.add_argument("--config", default=argparse.SUPPRESS, help="Path to the YAML configuration file.")
+    coordinate.add_argument("--run-id", default=argparse.SUPPRESS, help="Identifier of the run. Defaults to a timestamp.")
+    coordinate.add_argument("--resume", action="store_true", default=argparse.SUPPRESS, help="Skip samples with checkpointed results.")
+    coordinate.add_argument("--host", help="Interface to listen on; 0.0.0.0 accepts workers on other hosts.")
+    coordinate.add_argument("--port", type=int, help="Port to listen on; 0 picks a free one.")
+    coordinate.add_argument("--local-workers", type=int, default=0, help="Worker processes to start on this host.")
+    coordinate.add_argument("--shard-size", type=int, help="Samples per shard.")
+    coordinate.add_argument("--token", help="Shared secret workers must present.")
+
+    worker = subparsers.add_parser(
+        "worker",
+        help="Evaluate shards leased from a coordinator.",
+        description="Connects to a coordinator, takes its configuration and evaluates the shards it hands out "
+                    "until the run is over. API keys are read from --config, if it exists, or the environment.",
+    )
+    worker.add_argument("--coordinator", required=True, help="Coordinator URL, e.g. http://10.0.0.5:8765.")
+    worker.add_argument("--name", help="Worker name shown in the coordinator's logs. Defaults to host:pid.")
+    worker.add_argument("--token", help="Shared secret; defaults to $BENCHMARK_WORKER_TOKEN.")
+    worker.add_argument("--slots", type=int, help="Shards evaluated at once (default: the coordinator's `slots`).")
+    worker.add_argument(
+        "--config", default=argparse.SUPPRESS,
+        help="Config file to read API keys from, if it exists; otherwise they come from each model's api_key_env.",
+    )
+    return parser.parse_args(argv)
+
+def configure_checkpoints(eval_config, args):
+    """Assigns the run id and resume flag used by every evaluator's checkpoint."""
+    settings = eval_config.get('checkpoint')
+    if not isinstance(settings, dict):
+        settings = {}
+    eval_config['checkpoint'] = settings
+
+    run_id = args.run_id
+    if args.resume and not run_id:
+        run_id = latest_run_id(settings.get('dir', 'checkpoints'))
+        if run_id is None:
+            logging.warning("--resume given but no previous run was found. Starting a new run.")
+    settings['run_id'] = run_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+    settings['resume'] = args.resume
+    logging.info(f"Run id: {settings['run_id']}{' (resuming)' if args.resume else ''}")
+
+def loadtest_settings(config, args):
+    """Merges load-test defaults, the config's `loadtest:` section and command-line overrides."""
+    settings = {**DEFAULT_LOADTEST_SETTINGS, **(config.get('loadtest') or {})}
+    for name in ("model", "mode", "rates", "concurrency_levels", "step_duration", "corpus_size"):
+        value = getattr(args, name, None)
+        if value is not None:
+            settings[name] = value
+    return settings
+
+async def run_load_test_command(config, args):
+    """Builds a prompt corpus from the configured benchmarks and load-tests one model."""
+    models = config.get('models', [])
+    eval_config = config.get('evaluation', {})
+    settings = loadtest_settings(config, args)
+
+    model_name = settings.get('model')
+    model_config = next((m for m in models if m['name'] == model_name), None) if model_name else (models or [None])[0]
+    if model_config is None:
+        logging.error(f"Model '{model_name}' not found in the configuration file." if model_name else "No models found in the configuration file.")
+        return
+
+    evaluators = []
+    for bench_name in settings.get('benchmarks') or eval_config.get('benchmarks', []):
+        EvaluatorClass = get_evaluator_class(bench_name)
+        if EvaluatorClass:
+            evaluators.append(EvaluatorClass(model_config, eval_config))
+    corpus = build_prompt_corpus(evaluators, int(settings['corpus_size']))
+
+    api_params = eval_config.get('api_params', {})
+    result = await run_load_test(
+        model_config,
+        corpus,
+        settings,
+        max_tokens=settings.get('max_tokens', api_params.get('max_tokens', 1024)),
+        temperature=api_params.get('temperature', 0.1),
+    )
+    generate_loadtest_report(result, model_config['name'])
+
+def run_rescore_command(config, args):
+    """Re-scores the stored per-sample results of a run and logs how the scores changed."""
+    eval_config = config.get('evaluation', {})
+    settings = eval_config.get('results_store')
+    directory = (settings if isinstance(settings, dict) else {}).get('dir', os.path.join('results', 'samples'))
+    run_id = args.run_id or latest_run_id(directory)
+    if run_id is None:
+        logging.error(f"No stored runs found under {directory}.")
+        return
+
+    paths = find_results(directory, run_id, args.model, args.benchmark)
+    if not paths:
+        logging.error(f"No stored results match run '{run_id}'.")
+        return
+
+    models = {m['name']: m for m in config.get('models', [])}
+    for path in paths:
+        metadata = read_results_metadata(path)
+        EvaluatorClass = get_evaluator_class(metadata['benchmark'])
+        if not EvaluatorClass:
+            continue
+        # Scoring does not use the endpoint, so a model missing from the config is fine.
+        model_config = models.get(metadata['model'], {"name": metadata['model'], "model_name": metadata['model']})
+        evaluator = EvaluatorClass(model_config, eval_config)
+        summary = rescore_file(path, evaluator, workers=args.workers)
+        logging.info(
+            f"Rescored {metadata['model']} / {metadata['benchmark']}: {summary['previous_score']:.4f} -> "
+            f"{summary['score']:.4f} ({summary['changed']} of {summary['rescored']} samples changed)"
+        )
+        update_run_index(eval_config, run_id, metadata, path, summary['score'])
+
+def update_run_index(eval_config, run_id, metadata, path, score):
+    """Replaces a rescored run's correctness bitmap in the run index, if it is indexed there."""
+    index = get_run_index(run_index_settings(eval_config))
+    entry = index.get(run_id, metadata['model'], metadata['benchmark']) if index else None
+    if entry is None:
+        return
+    rows, _ = read_results(path)
+    index.record(
+        run_id, metadata['model'], metadata['benchmark'],
+        [row['sample_key'] for row in rows], [row['correct'] for row in rows],
+        score, performance=entry, metrics=entry['metrics'], created=entry['created'],
+    )
+
+def run_compare_command(config, args):
+    """Compares a run's indexed results with their baselines and writes a comparison report."""
+    settings = run_index_settings(config.get('evaluation', {}))
+    settings['enabled'] = True
+    if args.baseline:
+        settings['baseline_run'] = args.baseline
+    if args.baseline_model:
+        settings['baseline_model'] = args.baseline_model
+    index = get_run_index(settings)
+    run_id = args.run_id or index.latest_run()
+    if run_id is None:
+        logging.error(f"The run index {index.path} is empty.")
+        return
+
+    entries = index.entries(run_id=run_id, model=args.model, benchmark=args.benchmark)
+    if not entries:
+        logging.error(f"No indexed results match run '{run_id}'.")
+        return
+
+    alpha = settings.get('alpha', 0.05)
+    rows = []
+    for entry in entries:
+        baseline = find_baseline(index, settings, run_id, entry['model'], entry['benchmark'])
+        comparison = None
+        if baseline is not None:
+            comparison = describe_flips(index, entry['benchmark'], compare_entries(baseline, entry, alpha), settings.get('max_flipped', 20))
+        history = index.entries(model=entry['model'], benchmark=entry['benchmark'])
+        rows.append({
+            "model": entry['model'],
+            "benchmark": entry['benchmark'],
+            "score": entry['score'],
+            "comparison": comparison,
+            "history": history[-args.history:],
+        })
+    generate_comparison_report(run_id, rows, alpha)
+
+def create_evaluator(bench_name, model_config, eval_config):
+    """Returns the evaluator for a benchmark name, or None if no evaluator is registered for it."""
+    EvaluatorClass = get_evaluator_class(bench_name)
+    return EvaluatorClass(model_config, eval_config) if EvaluatorClass else None
+
+async def run_coordinator_command(config, args):
+    """Serves the configured benchmarks to workers and writes each model's report."""
+    eval_config = config.get('evaluation', {})
+    settings = distributed_settings(eval_config)
+    for name in ("host", "port", "shard_size", "token"):
+        value = getattr(args, name, None)
+        if value is not None:
+            settings[name] = value
+    if scheduler_settings(eval_config).get('enabled'):
+        logging.warning("evaluation.scheduler does not apply in distributed mode; shards are handed out longest first.")
+    try:
+        coordinator = Coordinator(config, settings, create_evaluator, local_workers=args.local_workers, config_path=args.config)
+    except ValueError as e:
+        logging.error(str(e))
+        return
+    coordinator.prepare()
+    await coordinator.serve()
+
+async def main(args=None):
     """
     Main function to load configuration and orchestrate the benchmark evaluation.
     """
+    args = args or parse_args([])
     logging.info("Starting LLM Benchmark System...")
 
+    if args.command == "worker":
+        # Workers take their configuration from the coordinator.
+        await run_worker(args.coordinator, args.name, args.token, args.slots, args.config)
+        return
+
     try:
-        config = load_config()
+        config = load_config(args.config)
     except FileNotFoundError:
         return # Error is logged in load_config
+    registry.import_evaluator_modules((config.get('evaluation') or {}).get('evaluator_modules'))
+
+    if args.command == "rescore":
+        try:
+            run_rescore_command(config, args)
+        finally:
+            clear_shared_data()
+            close_response_caches()
+            close_run_indexes()
+        return
+
+    if args.command == "compare":
+        try:
+            run_compare_command(config, args)
+        finally:
+            close_run_indexes()
+        return
+
+    if args.command == "loadtest":
+        try:
+            await run_load_test_command(config, args)
+        finally:
+            clear_shared_data()
+            await close_clients()
+        return
 
     models_to_evaluate = config.get('models', [])
     eval_config = config.get('evaluation', {})
+    configure_checkpoints(eval_config, args)
+
+    if args.command == "coordinate":
+        try:
+            await run_coordinator_command(config, args)
+        finally:
+            clear_shared_data()
+            close_response_caches()
+            close_run_indexes()
+        logging.info("LLM Benchmark System has finished all evaluations.")
+        return
 
     if not models_to_evaluate:
         logging.error("No models found in the configuration file. Exiting.")
         return
 
-    for model_config in models_to_evaluate:
-        await run_model_evaluation(model_config, eval_config)
+    set_global_request_limit(eval_config.get('max_in_flight'))
+
+    try:
+        if eval_config.get('concurrent_models', True):
+            # Models run side by side; per-endpoint limiters and the global
+            # in-flight cap keep the combined load in check.
+            await asyncio.gather(*(run_model_evaluation(m, eval_config) for m in models_to_evaluate))
+        else:
+            for model_config in models_to_evaluate:
+                await run_model_evaluation(model_config, eval_config)
+    finally:
+        clear_shared_data()
+        # API clients are pooled across all evaluators; release their connections once.
+        await close_clients()
+        close_response_caches()
+        close_run_indexes()
 
     logging.info("LLM Benchmark System has finished all evaluations.")
 
@@ -89,4 +410,4 @@ if __name__ == "__main__":
     # with multiprocessing in some cases. If needed, one could add:
     # if sys.platform == "win32":
     #     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))
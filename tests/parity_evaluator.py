@@ -0,0 +1,29 @@
+"""
+A small benchmark for tests that go through the API: asks whether numbers are
+even or odd. Listed under `evaluation.evaluator_modules`, so that distributed
+workers in other processes can load it too.
+"""
+from llm_benchmark.benchmark import BenchmarkEvaluator
+from llm_benchmark.registry import register_evaluator
+
+# The mock server answers the even questions with this rule and the rest "odd".
+ANSWER_RULE = "[02468] even or odd=even"
+
+@register_evaluator("parity")
+class ParityEvaluator(BenchmarkEvaluator):
+
+    @property
+    def benchmark_name(self):
+        return "parity"
+
+    def load_data(self):
+        return [{"number": number} for number in range(self.benchmark_params.get("sample_size", 40))]
+
+    def format_prompt(self, sample):
+        return [{"role": "user", "content": f"Is {sample['number']} even or odd?"}]
+
+    def process_response(self, response, sample):
+        # Multiples of 4 are "wrong", so that the score is neither 0 nor 1.
+        expected = "even" if sample["number"] % 2 == 0 and sample["number"] % 4 else "odd"
+        parsed = response.strip()
+        return {"correct": parsed == expected, "parsed_answer": parsed, "correct_answer": expected}
@@ -0,0 +1,138 @@
+import os
+import json
+import asyncio
+import argparse
+
+import main
+from llm_benchmark.benchmark import BenchmarkEvaluator, clear_shared_data
+from llm_benchmark.checkpoint import Checkpoint, latest_run_id, sample_key
+
+
+def test_truncated_last_line_is_dropped_before_appending(tmp_path):
+    path = tmp_path / "run" / "model__gsm8k.jsonl"
+    checkpoint = Checkpoint(str(path), batch_size=1)
+    checkpoint.record("a", {"correct": True})
+    checkpoint.close()
+    # A crash mid-write leaves half a line behind.
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "b", "result": {"corr')
+
+    resumed = Checkpoint(str(path), batch_size=1)
+    assert resumed.load() == {"a": {"correct": True}}
+    resumed.record("c", {"correct": False})
+    resumed.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["key"] for line in lines] == ["a", "c"]
+    assert Checkpoint(str(path)).load() == {"a": {"correct": True}, "c": {"correct": False}}
+
+
+def test_partial_line_spanning_chunks(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    path.write_text('{"key": "a", "result": {}}\n' + "x" * 100, encoding="utf-8")
+
+    checkpoint = Checkpoint(str(path))
+    checkpoint._drop_partial_line(chunk_size=7)
+    assert path.read_text(encoding="utf-8") == '{"key": "a", "result": {}}\n'
+
+    path.write_text("no newline at all", encoding="utf-8")
+    checkpoint._drop_partial_line(chunk_size=4)
+    assert path.read_text(encoding="utf-8") == ""
+
+
+def test_round_trip_keeps_unicode_and_the_latest_result(tmp_path):
+    path = str(tmp_path / "run" / "model__mmlu.jsonl")
+    checkpoint = Checkpoint(path, batch_size=3)
+    checkpoint.record("a", {"correct": True, "response": "ß → √2"})
+    checkpoint.record("b", {"correct": False, "telemetry": {"latency": 0.5}})
+    # Buffered until the batch is full or the checkpoint is closed.
+    assert Checkpoint(path).load() == {}
+    checkpoint.record("a", {"correct": False})
+    checkpoint.close()
+
+    assert Checkpoint(path).load() == {
+        "a": {"correct": False},
+        "b": {"correct": False, "telemetry": {"latency": 0.5}},
+    }
+
+
+def test_sample_key_is_stable_and_content_based():
+    assert sample_key({"question": "q", "answer": 1}) == sample_key({"answer": 1, "question": "q"})
+    assert sample_key({"question": "q", "answer": 1}) != sample_key({"question": "q", "answer": 2})
+
+
+def test_latest_run_id(tmp_path):
+    assert latest_run_id(str(tmp_path / "missing")) is None
+    for run_id, mtime in (("20240101_000000", 100), ("b", 300), ("a", 200)):
+        (tmp_path / run_id).mkdir()
+        os.utime(tmp_path / run_id, (mtime, mtime))
+    assert latest_run_id(str(tmp_path)) == "b"
+
+
+class CountingEvaluator(BenchmarkEvaluator):
+    """Answers even numbers correctly without calling an API, and can crash part-way."""
+
+    def __init__(self, model_config, benchmark_config, crash_after=None):
+        super().__init__(model_config, benchmark_config)
+        self.crash_after = crash_after
+        self.evaluated = []
+
+    @property
+    def benchmark_name(self):
+        return "counting"
+
+    def load_data(self):
+        return [{"number": number} for number in range(10)]
+
+    def format_prompt(self, sample):
+        return [{"role": "user", "content": str(sample["number"])}]
+
+    def process_response(self, response, sample):
+        return {"correct": response == "even"}
+
+    async def evaluate_sample(self, sample, index=None):
+        if self.crash_after is not None and len(self.evaluated) == self.crash_after:
+            raise RuntimeError("interrupted")
+        self.evaluated.append(sample["number"])
+        return self.process_response("even" if sample["number"] % 2 == 0 else "odd", sample)
+
+
+def evaluation_config(tmp_path, args):
+    config = {
+        "checkpoint": {"dir": str(tmp_path / "checkpoints"), "batch_size": 1},
+        "dataset_snapshots": {"enabled": False},
+        "results_store": {"enabled": False},
+        "run_index": {"enabled": False},
+        "cache": {"enabled": False},
+    }
+    main.configure_checkpoints(config, args)
+    return config
+
+
+def run(tmp_path, args, crash_after=None):
+    clear_shared_data()
+    evaluator = CountingEvaluator({"name": "test-model", "model_name": "test-model"}, evaluation_config(tmp_path, args), crash_after)
+    try:
+        return evaluator, asyncio.run(evaluator.run())
+    except RuntimeError:
+        return evaluator, None
+
+
+def test_resume_evaluates_only_the_missing_samples(tmp_path):
+    first, summary = run(tmp_path, argparse.Namespace(run_id="first", resume=False), crash_after=4)
+    assert summary is None and first.evaluated == [0, 1, 2, 3]
+
+    resumed, summary = run(tmp_path, argparse.Namespace(run_id=None, resume=True))
+    assert resumed.benchmark_config["checkpoint"]["run_id"] == "first"
+    assert resumed.evaluated == [4, 5, 6, 7, 8, 9]
+
+    fresh, expected = run(tmp_path, argparse.Namespace(run_id="fresh", resume=False))
+    assert fresh.evaluated == list(range(10))
+    assert (summary["score"], summary["total_samples"]) == (expected["score"], expected["total_samples"]) == (0.5, 10)
+
+
+def test_without_resume_a_run_id_starts_over(tmp_path):
+    run(tmp_path, argparse.Namespace(run_id="same", resume=False), crash_after=4)
+    again, summary = run(tmp_path, argparse.Namespace(run_id="same", resume=False))
+    assert again.evaluated == list(range(10))
+    assert summary["score"] == 0.5
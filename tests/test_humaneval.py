@@ -0,0 +1,27 @@
+from math import comb
+
+import pytest
+
+from llm_benchmark.evaluators.humaneval import estimate_pass_at_k
+
+
+@pytest.mark.parametrize("n, c, k", [(10, 3, 1), (10, 3, 5), (200, 17, 10), (200, 1, 100), (5, 4, 1)])
+def test_pass_at_k_matches_the_closed_form(n, c, k):
+    assert estimate_pass_at_k(n, c, k) == pytest.approx(1 - comb(n - c, k) / comb(n, k))
+
+
+def test_pass_at_k_edges():
+    assert estimate_pass_at_k(10, 0, 1) == 0.0
+    assert estimate_pass_at_k(10, 10, 10) == 1.0
+    # Fewer failures than k: every draw of k contains a passing sample.
+    assert estimate_pass_at_k(10, 8, 3) == 1.0
+    assert estimate_pass_at_k(1, 1, 1) == 1.0
+
+
+def test_pass_at_1_is_the_pass_rate():
+    assert estimate_pass_at_k(20, 7, 1) == pytest.approx(7 / 20)
+
+
+def test_pass_at_k_is_stable_for_large_n():
+    value = estimate_pass_at_k(1000, 1, 100)
+    assert value == pytest.approx(0.1)
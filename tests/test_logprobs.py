@@ -0,0 +1,40 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from llm_benchmark import logprobs
+from llm_benchmark.logprobs import CompletionsBatcher, split_evenly
+
+
+@pytest.mark.parametrize("total, parts", [(10, 3), (2, 5), (0, 4), (7, 1), (1001, 8)])
+def test_split_evenly_adds_up(total, parts):
+    split = split_evenly(total, parts)
+    assert len(split) == parts
+    assert sum(split) == total
+    assert max(split) - min(split) <= 1
+
+
+def test_batched_samples_are_charged_whole_tokens(monkeypatch):
+    async def create_completion(model_config, prompts, stats=None, **params):
+        stats.update(prompt_tokens=100, completion_tokens=3, latency=0.5)
+        return SimpleNamespace(choices=[
+            SimpleNamespace(index=index, logprobs=SimpleNamespace(top_logprobs=[{" A": -0.1, " B": -2.0}]))
+            for index in range(len(prompts))
+        ])
+
+    monkeypatch.setattr(logprobs, "_create_completion", create_completion)
+
+    async def run():
+        batcher = CompletionsBatcher({"name": "test-model"}, batch_size=3)
+        stats = [{} for _ in range(3)]
+        scores = await asyncio.gather(*(batcher.score(f"q{i}", ["A", "B"], stats[i]) for i in range(3)))
+        return batcher, scores, stats
+
+    batcher, scores, stats = asyncio.run(run())
+    assert batcher.batches_sent == 1
+    assert scores == [{"A": -0.1, "B": -2.0}] * 3
+    assert [s["prompt_tokens"] for s in stats] == [34, 33, 33]
+    assert [s["completion_tokens"] for s in stats] == [1, 1, 1]
+    assert all(isinstance(s["prompt_tokens"], int) for s in stats)
+    assert all(s["batch_size"] == 3 and s["latency"] == 0.5 for s in stats)
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from llm_benchmark.evaluators.math import MATHEvaluator, _symbolic_memo
+from llm_benchmark.math_answers import (
+    last_boxed_content,
+    latex_to_sympy,
+    normalize_answer,
+    strings_equivalent,
+    symbolic_equal,
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    (r"so the answer is \boxed{\frac{1}{2}}.", r"\frac{1}{2}"),
+    (r"\boxed{1} then \boxed{\sqrt{\frac{a}{b}}}", r"\sqrt{\frac{a}{b}}"),
+    (r"\boxed{\{1, 2\}}", r"\{1, 2\}"),
+    (r"\fbox{x^{2}}", "x^{2}"),
+    (r"$\boxed 5$", "5"),
+    (r"\boxed{\frac{1}{2}", None),
+    ("no box here", None),
+])
+def test_last_boxed_content(text, expected):
+    assert last_boxed_content(text) == expected
+
+
+@pytest.mark.parametrize("answer, expected", [
+    (r"\dfrac{1}{2}", r"\frac{1}{2}"),
+    (r"\tfrac12", r"\frac{1}{2}"),
+    ("3/4", r"\frac{3}{4}"),
+    (r"\left( 1, 2 \right)", "(1,2)"),
+    (r"x = 5", "5"),
+    (r"10\%", "10"),
+    (r"90^\circ", "90"),
+    (r"12\text{ cm}", "12"),
+    ("1,000", "1000"),
+    (".5", "0.5"),
+    (r"\sqrt2", r"\sqrt{2}"),
+    (r"\$4.50", "4.50"),
+])
+def test_normalize_answer(answer, expected):
+    assert normalize_answer(answer) == expected
+
+
+def test_strings_equivalent_compares_numbers():
+    assert strings_equivalent("0.5", "0.50")
+    assert not strings_equivalent("0.5", r"\frac{1}{2}")
+
+
+@pytest.mark.parametrize("a, b", [
+    (r"\frac{1}{2}", "0.5"),
+    (r"\frac{\sqrt{3}}{2}", r"\frac{\sqrt{3}}{2}"),
+    (r"2\sqrt{2}", r"\sqrt{8}"),
+    ("(1,2)", r"(\frac{2}{2},2)"),
+    ("[0,1)", r"[0,\frac{2}{2})"),
+    ("(-\\infty,3]", "(-\\infty,3]"),
+])
+def test_symbolic_equal(a, b):
+    assert symbolic_equal(a, b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("[1,2]", "(1,2)"),
+    ("[0,1)", "[0,1]"),
+    ("(1,2)", "1,2"),
+    ("(1,2)", "(1,2,3)"),
+    ("x+1", "x+2"),
+    ("__import__('os')", "0"),
+])
+def test_symbolic_not_equal(a, b):
+    assert not symbolic_equal(a, b)
+
+
+def test_frac_and_dfrac_are_equal_after_normalization():
+    assert normalize_answer(r"\dfrac{3}{4}") == normalize_answer(r"\frac34")
+    assert symbolic_equal(normalize_answer(r"\dfrac{6}{8}"), normalize_answer(r"\frac{3}{4}"))
+
+
+def _chr_encoded(code):
+    # Only letters, digits, '+' and parentheses, which the character filter lets through.
+    return "exec(" + "+".join(f"chr({ord(c)})" for c in code) + ")"
+
+
+@pytest.mark.parametrize("answer", [
+    _chr_encoded("open('pwned', 'w').write('x')"),
+    "__import__('os').system('touch pwned')",
+    "eval(chr(49))",
+    "Symbol(chr(120))",
+    "xy",
+])
+def test_code_in_answers_is_not_run(answer, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert latex_to_sympy(answer) is None
+    assert not symbolic_equal(answer, "0")
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("a, b", [
+    (r"\sin(\pi)", "0"),
+    (r"\ln(1)", r"\cos(0)-1"),
+    ("x^2", "x*x"),
+])
+def test_whitelisted_functions_still_parse(a, b):
+    assert symbolic_equal(a, b)
+
+
+def math_evaluator(**params):
+    return MATHEvaluator({"name": "test-model", "model_name": "test-model"}, {"math": dict(symbolic=True, **params)})
+
+
+def test_rescoring_checks_answers_in_a_sandbox(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _symbolic_memo.clear()
+    evaluator = math_evaluator()
+    try:
+        result = evaluator.process_response(r"\boxed{2\sqrt{2}}", {"reference_answer": r"\sqrt{8}"})
+        assert result["correct"] and result["equivalence"] == "symbolic"
+        worker = evaluator._symbolic_worker
+        assert worker is not None and worker.process.is_alive()
+
+        result = evaluator.process_response(r"\boxed{%s}" % _chr_encoded("open('pwned', 'w')"), {"reference_answer": "0"})
+        assert not result["correct"]
+        assert list(tmp_path.iterdir()) == []
+    finally:
+        asyncio.run(evaluator.teardown())
+    _symbolic_memo.clear()
+
+
+def test_rescoring_reports_timeouts_and_replaces_the_worker():
+    _symbolic_memo.clear()
+    # Too short even for the worker to import SymPy.
+    evaluator = math_evaluator(symbolic_timeout=0.001)
+    try:
+        result = evaluator.process_response(r"\boxed{2\sqrt{2}}", {"reference_answer": r"\sqrt{8}"})
+        assert not result["correct"]
+        assert evaluator.symbolic_checks["timeouts"] == 1
+        assert evaluator._symbolic_worker is None
+        assert (r"2\sqrt{2}", r"\sqrt{8}") not in _symbolic_memo
+    finally:
+        asyncio.run(evaluator.teardown())
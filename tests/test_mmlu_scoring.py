@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from llm_benchmark.benchmark import BenchmarkEvaluator
+from llm_benchmark.evaluators.mmlu import MMLUEvaluator, UNSUPPORTED_AFTER_FAILURES
+
+SAMPLE = {"question": "2 + 2 = ?", "choices": ["3", "4", "5", "6"], "answer": 1, "subject": "elementary_mathematics"}
+
+
+@pytest.fixture
+def evaluator(monkeypatch):
+    evaluator = MMLUEvaluator({"name": "test-model"}, {"cache": {"enabled": False}, "mmlu": {"scoring": "logprobs"}})
+    monkeypatch.setattr(evaluator, "get_prompt", lambda sample, index=None: [{"role": "user", "content": "q"}])
+
+    async def generate(self, sample, index=None):
+        return {"correct": True, "parsed_answer": "B"}
+
+    monkeypatch.setattr(BenchmarkEvaluator, "evaluate_sample", generate)
+    return evaluator
+
+
+def replay(evaluator, monkeypatch, responses):
+    """Answers logprob requests with `responses` in order (None is a failed request)."""
+    responses = iter(responses)
+
+    async def choice_logprobs(path, prompt_messages, candidates, telemetry):
+        return next(responses)
+
+    monkeypatch.setattr(evaluator, "_choice_logprobs", choice_logprobs)
+
+
+def evaluate(evaluator, count):
+    async def run():
+        return [await evaluator.evaluate_sample(SAMPLE) for _ in range(count)]
+    return asyncio.run(run())
+
+
+def test_failed_request_falls_back_for_that_sample_only(evaluator, monkeypatch):
+    scores = {"A": -3.0, "B": -0.1}
+    replay(evaluator, monkeypatch, [scores, None, scores, None, scores])
+
+    results = evaluate(evaluator, 5)
+
+    assert [r.get("scoring") for r in results] == ["logprobs", None, "logprobs", None, "logprobs"]
+    assert evaluator.logprob_paths() == ["chat"]
+    assert evaluator.scoring_counts["logprobs"] == 3
+    assert evaluator.scoring_counts["fallbacks"] == 2
+    metrics = evaluator.summary_metrics(results)
+    assert metrics["Logprob-scored Samples"] == 3
+    assert metrics["Generation Fallbacks"] == 2
+    assert metrics["Failed Logprob Requests"] == 2
+
+
+def test_endpoint_without_logprobs_is_dropped(evaluator, monkeypatch):
+    replay(evaluator, monkeypatch, [None] * UNSUPPORTED_AFTER_FAILURES)
+
+    results = evaluate(evaluator, UNSUPPORTED_AFTER_FAILURES + 3)
+
+    assert evaluator.logprob_paths() == []
+    assert all(r.get("scoring") is None for r in results)
+    assert evaluator.scoring_counts["failed_requests"] == UNSUPPORTED_AFTER_FAILURES
+    assert evaluator.scoring_counts["fallbacks"] == UNSUPPORTED_AFTER_FAILURES + 3
@@ -0,0 +1,53 @@
+import pytest
+
+from llm_benchmark.run_index import RunIndex, compare_entries, describe_flips
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = RunIndex(str(tmp_path / "runs.sqlite"))
+    yield index
+    index.close()
+
+
+def test_record_and_get_round_trip(index):
+    keys = [f"k{i}" for i in range(12)]
+    correct = [i % 3 == 0 for i in range(12)]
+    index.record("r1", "model", "gsm8k", keys, correct, score=4 / 12, metrics={"Accuracy": 0.33}, created=1.0)
+
+    entry = index.get("r1", "model", "gsm8k")
+    assert entry["evaluated"] == 12 and entry["correct"] == 4
+    assert entry["evaluated_bits"] == (1 << 12) - 1
+    assert entry["correct_bits"] == sum(1 << i for i in range(12) if i % 3 == 0)
+    assert entry["metrics"] == {"Accuracy": 0.33}
+    assert index.get("r2", "model", "gsm8k") is None
+
+
+def test_runs_over_different_subsets_are_paired_by_sample(index):
+    # The baseline evaluated k0..k5; the candidate k3..k8, in another order.
+    index.record("base", "model", "mmlu", ["k0", "k1", "k2", "k3", "k4", "k5"], [True] * 6, created=1.0)
+    index.record("cand", "model", "mmlu", ["k8", "k7", "k6", "k5", "k4", "k3"], [True, True, True, False, True, False], created=2.0)
+
+    assert index.previous_run("cand", "model", "mmlu") == "base"
+    comparison = compare_entries(index.get("base", "model", "mmlu"), index.get("cand", "model", "mmlu"))
+    assert comparison["paired"] == 3
+    assert comparison["baseline_score"] == 1.0
+    assert comparison["candidate_score"] == pytest.approx(1 / 3)
+    assert (comparison["regressions"], comparison["improvements"]) == (2, 0)
+    assert comparison["p_value"] == pytest.approx(0.5)
+    assert comparison["verdict"] == "no significant change"
+
+    describe_flips(index, "mmlu", comparison, limit=10, dataset_index={"k3": 5, "k5": 3})
+    assert comparison["regressed"] == [{"index": 5, "sample_key": "k3"}, {"index": 3, "sample_key": "k5"}]
+    assert comparison["improved"] == []
+
+
+def test_significant_regression_verdict(index):
+    keys = [f"k{i}" for i in range(40)]
+    index.record("base", "model", "gsm8k", keys, [True] * 40, created=1.0)
+    index.record("cand", "model", "gsm8k", keys, [i >= 10 for i in range(40)], created=2.0)
+
+    comparison = compare_entries(index.get("base", "model", "gsm8k"), index.get("cand", "model", "gsm8k"))
+    assert comparison["regressions"] == 10
+    assert comparison["delta"] == pytest.approx(-0.25)
+    assert comparison["verdict"] == "regression"
@@ -0,0 +1,74 @@
+import asyncio
+import multiprocessing
+
+from llm_benchmark.sandbox import MAX_FILE_SIZE_MB, SandboxPool, SandboxWorker
+
+
+def run_programs(programs, **options):
+    """Runs `programs` one after another in a one-worker pool; returns their (passed, error) results."""
+    async def run():
+        pool = SandboxPool(size=1, timeout=5.0, **options)
+        await pool.start()
+        try:
+            return [await pool.run(program) for program in programs]
+        finally:
+            await pool.close()
+    return asyncio.run(run())
+
+
+def test_programs_pass_and_fail():
+    results = run_programs(["assert 1 + 1 == 2", "assert 1 + 1 == 3", "while True: pass"])
+    assert results == [(True, None), (False, None), (False, "Timeout")]
+
+
+def test_rebinding_builtins_does_not_leak():
+    results = run_programs([
+        "__builtins__['len'] = lambda x: 0",
+        "assert len([1]) == 1",
+        "import builtins\nbuiltins.sorted = lambda x: []",
+        "assert sorted([2, 1]) == [1, 2]",
+    ])
+    assert results == [(True, None)] * 4
+
+
+def test_failed_program_recycles_worker():
+    results = run_programs([
+        "import math\nmath.pi = 3\nassert False",
+        "import math\nassert math.pi != 3",
+        "while True: pass",
+        "assert 2 + 2 == 4",
+    ])
+    assert results == [(False, None), (True, None), (False, "Timeout"), (True, None)]
+
+
+def test_cancelled_task_does_not_hand_its_reply_to_the_next():
+    async def run():
+        # With one executor thread per worker, the thread of a cancelled task is
+        # still running it while the next two tasks take both workers.
+        pool = SandboxPool(size=2, timeout=5.0)
+        await pool.start()
+        try:
+            slow = asyncio.ensure_future(pool.run("import time\ntime.sleep(0.5)"))
+            await asyncio.sleep(0.2)
+            slow.cancel()
+            return await asyncio.gather(pool.run("assert False"), pool.run("assert False"))
+        finally:
+            await pool.close()
+
+    assert asyncio.run(run()) == [(False, None), (False, None)]
+
+
+def test_cpu_limit_kills_a_worker_nobody_times_out():
+    worker = SandboxWorker(multiprocessing.get_context("spawn"), 1024, cpu_limit=1)
+    try:
+        passed, error = worker.execute("while True: pass", timeout=30.0)
+    finally:
+        worker.kill()
+    assert not passed and error.startswith("Process exited")
+
+
+def test_large_files_cannot_be_written(tmp_path):
+    path = tmp_path / "large"
+    program = f"open({str(path)!r}, 'wb').write(bytes({MAX_FILE_SIZE_MB + 1} * 1024 * 1024))"
+    assert run_programs([program]) == [(False, None)]
+    assert path.stat().st_size <= MAX_FILE_SIZE_MB * 1024 * 1024
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+
+from llm_benchmark.scheduler import WorkQueue, scheduler_settings
+
+
+def make_queue(concurrency=1, **settings):
+    return WorkQueue(scheduler_settings({"scheduler": settings}), concurrency)
+
+
+def jobs(results):
+    for result in results:
+        async def job(result=result):
+            await asyncio.sleep(0)
+            return result
+        yield job
+
+
+def test_worker_crash_fails_the_benchmark_instead_of_hanging():
+    async def run():
+        queue = make_queue(concurrency=1)
+        # A result that is not a dict breaks the queue's own bookkeeping, outside the job.
+        broken = queue.run("broken", jobs(["not a result"]), 10, 10)
+        healthy = queue.run("healthy", jobs([{}, {}]), 10, 20)
+        return await asyncio.wait_for(asyncio.gather(broken, healthy, return_exceptions=True), 5)
+
+    broken, healthy = asyncio.run(run())
+    assert isinstance(broken, AttributeError)
+    assert healthy is None
+
+
+def test_crash_between_jobs_fails_every_running_benchmark():
+    async def run():
+        queue = make_queue(concurrency=2, policy="fair", weights={"a": "heavy"})
+        runs = [queue.run(name, jobs([{}]), 10, 10) for name in ("a", "b")]
+        return await asyncio.wait_for(asyncio.gather(*runs, return_exceptions=True), 5)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(run()))
+
+
+def test_failing_job_fails_only_its_benchmark():
+    async def run():
+        queue = make_queue(concurrency=2)
+
+        async def fail():
+            raise RuntimeError("endpoint down")
+
+        failing = queue.run("failing", iter([fail]), 10, 10)
+        other = queue.run("other", jobs([{}, {}, {}]), 10, 10)
+        return await asyncio.wait_for(asyncio.gather(failing, other, return_exceptions=True), 5)
+
+    failing, other = asyncio.run(run())
+    assert isinstance(failing, RuntimeError)
+    assert other is None
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_all_jobs_run(concurrency):
+    async def run():
+        queue = make_queue(concurrency=concurrency)
+        await asyncio.wait_for(asyncio.gather(*(queue.run(name, jobs([{}] * 4), 10, 10) for name in "abc")), 5)
+        return queue.stats()
+
+    assert sorted(entry["samples"] for entry in asyncio.run(run())) == [4, 4, 4]
+
+
+def execution_order(settings, benchmarks, samples=3):
+    """
+    Runs `benchmarks` (name -> expected completion tokens) on one worker and
+    returns the names of the benchmarks in the order their jobs ran.
+    """
+    order = []
+
+    def logged_jobs(name):
+        for _ in range(samples):
+            async def job(name=name):
+                order.append(name)
+                await asyncio.sleep(0)
+                return {}
+            yield job
+
+    async def run():
+        queue = make_queue(concurrency=1, **settings)
+        runs = [queue.run(name, logged_jobs(name), 0, tokens) for name, tokens in benchmarks.items()]
+        await asyncio.wait_for(asyncio.gather(*runs), 5)
+
+    asyncio.run(run())
+    return order
+
+
+def test_sjf_runs_the_cheapest_benchmark_first():
+    order = execution_order({"policy": "sjf"}, {"math": 600, "mmlu": 1, "gsm8k": 200})
+    assert order == ["mmlu"] * 3 + ["gsm8k"] * 3 + ["math"] * 3
+
+
+def test_sjf_counts_prompt_tokens():
+    async def run():
+        queue = make_queue(concurrency=1, prompt_token_weight=0.5)
+        order = []
+
+        def logged_jobs(name):
+            async def job():
+                order.append(name)
+                return {}
+            yield job
+
+        # 1000 prompt tokens at weight 0.5 outweigh 100 extra completion tokens.
+        await asyncio.gather(
+            queue.run("long_prompt", logged_jobs("long_prompt"), 1000, 100),
+            queue.run("long_answer", logged_jobs("long_answer"), 0, 200),
+        )
+        return order
+
+    assert asyncio.run(run()) == ["long_answer", "long_prompt"]
+
+
+def test_fair_shares_by_weight():
+    order = execution_order({"policy": "fair"}, {"a": 100, "b": 100}, samples=4)
+    assert order[:4] == ["a", "b", "a", "b"]
+    order = execution_order({"policy": "fair", "weights": {"a": 3}}, {"a": 100, "b": 100}, samples=6)
+    assert order[:4].count("a") == 3
+
+
+def test_deadline_runs_the_earliest_deadline_first():
+    order = execution_order({"policy": "deadline", "deadlines": {"math": 60, "gsm8k": 600}}, {"mmlu": 1, "gsm8k": 200, "math": 600})
+    # Benchmarks without a deadline go last, cheapest first among equals.
+    assert order == ["math"] * 3 + ["gsm8k"] * 3 + ["mmlu"] * 3
+
+
+def test_max_in_flight_caps_a_benchmark():
+    async def run():
+        queue = make_queue(concurrency=4)
+        in_flight = peak = 0
+
+        def capped_jobs():
+            for _ in range(8):
+                async def job():
+                    nonlocal in_flight, peak
+                    in_flight += 1
+                    peak = max(peak, in_flight)
+                    await asyncio.sleep(0.01)
+                    in_flight -= 1
+                    return {}
+                yield job
+
+        await asyncio.wait_for(queue.run("capped", capped_jobs(), 0, 10, max_in_flight=2), 5)
+        return peak
+
+    assert asyncio.run(run()) == 2
+
+
+def test_observed_usage_refines_the_estimate():
+    async def run():
+        queue = make_queue(concurrency=1)
+        reported = {"telemetry": {"prompt_tokens": 10, "completion_tokens": 1000}}
+        await queue.run("gsm8k", jobs([reported] * 5), 10, 100)
+        return queue.stats()[0]
+
+    stats = asyncio.run(run())
+    # Five observations weigh as much as the prior (PRIOR_WEIGHT = 5).
+    assert stats["completion_tokens"] == pytest.approx(550)
+    assert stats["samples"] == 5
+
+
+def test_unknown_policy_falls_back_to_sjf():
+    assert scheduler_settings({"scheduler": {"policy": "lifo"}})["policy"] == "sjf"
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from datasets import Dataset
+
+from llm_benchmark import benchmark
+from llm_benchmark.benchmark import BenchmarkEvaluator
+from llm_benchmark.snapshots import REVISIONS_FILE
+
+
+class SquaresEvaluator(BenchmarkEvaluator):
+    """Loads a small dataset of squares, failing when it is told the network is down."""
+
+    dataset_path = "example/squares"
+
+    def __init__(self, model_config, benchmark_config, online=True):
+        super().__init__(model_config, benchmark_config)
+        self.online = online
+        self.loads = 0
+
+    @property
+    def benchmark_name(self):
+        return "squares"
+
+    def load_data(self):
+        if not self.online:
+            raise ConnectionError("the Hub is unreachable")
+        self.loads += 1
+        self.few_shot_pool = [1, 4]
+        return Dataset.from_dict({"number": [2, 3], "square": [4, 9]})
+
+    def format_prompt(self, sample):
+        return [{"role": "user", "content": str(sample["number"])}]
+
+    def process_response(self, response, sample):
+        return {"correct": response == str(sample["square"])}
+
+
+def make_evaluator(tmp_path, **kwargs):
+    config = {"dataset_snapshots": {"dir": str(tmp_path / "datasets")}, "cache": {"enabled": False}}
+    return SquaresEvaluator({"name": "test-model", "model_name": "test-model"}, config, **kwargs)
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    commits = {"example/squares": "commit-1"}
+    monkeypatch.setattr(benchmark, "resolve_dataset_commit", lambda path: commits.get(path))
+    return commits
+
+
+def test_snapshot_is_opened_with_the_hub_unreachable(tmp_path, hub):
+    first = make_evaluator(tmp_path)
+    assert first.load_prepared_data()["square"] == [4, 9]
+    assert first.loads == 1
+    revisions = json.loads((tmp_path / "datasets" / REVISIONS_FILE).read_text(encoding="utf-8"))
+    assert revisions == {"example/squares": "commit-1"}
+
+    hub.clear()
+    offline = make_evaluator(tmp_path, online=False)
+    assert offline.load_prepared_data()["square"] == [4, 9]
+    assert offline.few_shot_pool == [1, 4]
+
+
+def test_offline_data_is_not_snapshotted_under_the_last_known_commit(tmp_path, hub):
+    make_evaluator(tmp_path).load_prepared_data()
+
+    hub["example/squares"] = "commit-2"
+    updated = make_evaluator(tmp_path)
+    updated.load_prepared_data()
+    assert updated.loads == 1
+
+    hub.clear()
+    (tmp_path / "datasets" / REVISIONS_FILE).write_text(json.dumps({"example/squares": "commit-3"}), encoding="utf-8")
+    offline = make_evaluator(tmp_path)
+    offline.load_prepared_data()
+    assert offline.loads == 1
+    assert len(list((tmp_path / "datasets" / "squares").iterdir())) == 2
@@ -0,0 +1,59 @@
+import math
+
+import pytest
+
+from llm_benchmark.stats import bernstein_interval, grouped_accuracy, mcnemar_test, wilson_interval
+
+
+def test_wilson_interval_known_values():
+    low, high = wilson_interval(5, 10)
+    assert low == pytest.approx(0.2366, abs=1e-4)
+    assert high == pytest.approx(0.7634, abs=1e-4)
+    low, high = wilson_interval(81, 100)
+    assert low == pytest.approx(0.7222, abs=1e-4)
+    assert high == pytest.approx(0.8749, abs=1e-4)
+
+
+def test_wilson_interval_edges():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(0, 10)
+    assert low == 0.0 and high == pytest.approx(0.2775, abs=1e-4)
+    low, high = wilson_interval(10, 10)
+    assert high == 1.0 and low == pytest.approx(0.7225, abs=1e-4)
+
+
+def test_wilson_interval_narrows_with_confidence_and_samples():
+    assert wilson_interval(50, 100, confidence=0.99)[0] < wilson_interval(50, 100)[0]
+    assert wilson_interval(500, 1000)[0] > wilson_interval(50, 100)[0]
+
+
+def test_bernstein_interval_is_wider_than_wilson():
+    assert bernstein_interval(1, 1) == (0.0, 1.0)
+    wilson, bernstein = wilson_interval(40, 100), bernstein_interval(40, 100)
+    assert bernstein[0] <= wilson[0] and bernstein[1] >= wilson[1]
+
+
+def test_grouped_accuracy():
+    rows = grouped_accuracy(["b", "a", "b", "b"], [{"correct": True}, {"correct": False}, {"correct": True}, {}])
+    assert [(r["group"], r["correct"], r["total"]) for r in rows] == [("a", 0, 1), ("b", 2, 3)]
+    assert rows[1]["accuracy"] == pytest.approx(2 / 3)
+    assert rows[1]["ci_low"] < rows[1]["accuracy"] < rows[1]["ci_high"]
+
+
+@pytest.mark.parametrize("regressions, improvements, expected", [
+    (0, 0, 1.0),
+    (0, 6, 2 / 64),
+    (6, 0, 2 / 64),
+    (3, 3, 1.0),
+    (1, 9, 2 * 11 / 1024),
+])
+def test_mcnemar_exact(regressions, improvements, expected):
+    assert mcnemar_test(regressions, improvements) == pytest.approx(expected)
+
+
+def test_mcnemar_chi_square_for_many_discordant_pairs():
+    chi_square = (abs(600 - 500) - 1) ** 2 / 1100
+    assert mcnemar_test(600, 500) == pytest.approx(math.erfc(math.sqrt(chi_square / 2)))
+    assert mcnemar_test(600, 500) == pytest.approx(0.00284, abs=1e-4)
+    # The approximation continues the exact test smoothly at the threshold.
+    assert mcnemar_test(480, 520) == pytest.approx(mcnemar_test(481, 520), rel=0.1)